@@ -1,46 +1,44 @@
-from logging.config import fileConfig
+"""Alembic environment wired to the application's models and database.
+
+The URL comes from ``DATABASE_URL`` (same default as the app) and
+autogenerate compares against ``Base.metadata`` with every model imported::
+
+    alembic upgrade head
+    alembic revision --autogenerate -m "..."
 
-from sqlalchemy import engine_from_config
-from sqlalchemy import pool
+Tables are still created by ``init_db()`` on startup; migrations carry the
+changes to tables that already exist.  Databases created before the first
+revision are marked with ``alembic stamp 0001_baseline``.
+
+The schema capability registry (:mod:`app.core.schema`) is filled when the
+app starts, so restart a running server after ``alembic upgrade``.
+"""
+import asyncio
+import sys
+from logging.config import fileConfig
+from pathlib import Path
 
 from alembic import context
 
-# this is the Alembic Config object, which provides
-# access to the values within the .ini file in use.
+# the application package lives in backend/ (imported as ``app``)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from app.core.database import DATABASE_URL, Base, engine  # noqa: E402
+from app.core.schema import schema  # noqa: E402
+import app.models  # noqa: E402,F401 – registers every table on Base.metadata
+
 config = context.config
 
-# Interpret the config file for Python logging.
-# This line sets up loggers basically.
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-# add your model's MetaData object here
-# for 'autogenerate' support
-# from myapp import mymodel
-# target_metadata = mymodel.Base.metadata
-target_metadata = None
-
-# other values from the config, defined by the needs of env.py,
-# can be acquired:
-# my_important_option = config.get_main_option("my_important_option")
-# ... etc.
+target_metadata = Base.metadata
 
 
 def run_migrations_offline() -> None:
-    """Run migrations in 'offline' mode.
-
-    This configures the context with just a URL
-    and not an Engine, though an Engine is acceptable
-    here as well.  By skipping the Engine creation
-    we don't even need a DBAPI to be available.
-
-    Calls to context.execute() here emit the given string to the
-    script output.
-
-    """
-    url = config.get_main_option("sqlalchemy.url")
+    """Emit the migration SQL for ``DATABASE_URL`` without connecting."""
     context.configure(
-        url=url,
+        url=DATABASE_URL,
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
@@ -50,29 +48,29 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
-def run_migrations_online() -> None:
-    """Run migrations in 'online' mode.
-
-    In this scenario we need to create an Engine
-    and associate a connection with the context.
-
-    """
-    connectable = engine_from_config(
-        config.get_section(config.config_ini_section, {}),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
+def _run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite needs table rebuilds for most ALTERs
+        render_as_batch=connection.dialect.name == "sqlite",
     )
 
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
+    with context.begin_transaction():
+        context.run_migrations()
+    # migrations run in-process (scripts, tests) see the new layout at once;
+    # a separately running server must be restarted to pick it up
+    schema.refresh(connection)
+
 
-        with context.begin_transaction():
-            context.run_migrations()
+async def run_migrations_online() -> None:
+    """Run the migrations on the application's (async) engine."""
+    async with engine.connect() as connection:
+        await connection.run_sync(_run_migrations)
+    await engine.dispose()
 
 
 if context.is_offline_mode():
     run_migrations_offline()
 else:
-    run_migrations_online()
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,69 @@
+"""Composite KPI indexes for per-company reads
+
+Revision ID: 0002_kpi_composite_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-17 00:00:00
+
+``(company_id, metric, as_of DESC) INCLUDE (value)`` serves the sparkline,
+series, rollup and export reads; ``(company_id, as_of DESC)`` the
+per-company count / latest-update lookups.  On PostgreSQL the indexes are
+built ``CONCURRENTLY`` so writers are not blocked; run this before
+deploying the matching models, otherwise ``init_db`` builds them with a
+plain ``CREATE INDEX`` on startup.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_kpi_composite_indexes"
+down_revision: Union[str, Sequence[str], None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# frozen copy of the ``app.services.kpi_partitions`` check
+_PARTITIONED = sa.text(
+    "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+    "WHERE c.relname = 'kpi' AND c.relnamespace = to_regnamespace(current_schema())"
+)
+
+_INDEXES = (
+    ("ix_kpi_company_metric_as_of", ["company_id", "metric", sa.text("as_of DESC")], ["value"]),
+    ("ix_kpi_company_as_of", ["company_id", sa.text("as_of DESC")], None),
+)
+
+
+def _concurrently() -> bool:
+    # partitioned tables (see 0003) cannot build indexes concurrently
+    bind = op.get_bind()
+    return (
+        bind.dialect.name == "postgresql"
+        and bind.execute(_PARTITIONED).first() is None
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    postgresql = _concurrently()
+    with op.get_context().autocommit_block():
+        for name, columns, include in _INDEXES:
+            op.create_index(
+                name, "kpi", columns,
+                if_not_exists=True,
+                postgresql_concurrently=postgresql,
+                postgresql_include=include or [],
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    postgresql = _concurrently()
+    with op.get_context().autocommit_block():
+        for name, _, _ in _INDEXES:
+            op.drop_index(
+                name, table_name="kpi",
+                if_exists=True,
+                postgresql_concurrently=postgresql,
+            )
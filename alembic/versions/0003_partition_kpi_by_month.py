@@ -0,0 +1,133 @@
+"""Range-partition kpi by month on PostgreSQL
+
+Revision ID: 0003_partition_kpi_by_month
+Revises: 0002_kpi_composite_indexes
+Create Date: 2026-10-17 00:00:00
+
+Rebuilds ``kpi`` as ``PARTITION BY RANGE (as_of)`` with primary key
+``(id, as_of)``, creates a partition per month from the oldest row through
+three months ahead plus ``kpi_default``, and copies the rows over; from then
+on ``app.services.kpi_partitions`` keeps the partitions current.  The copy
+rewrites the whole table: run it in a maintenance window.  Databases
+created by ``init_db`` after this revision are partitioned already and are
+left alone; SQLite is never partitioned.
+
+The indexes and the partition DDL are spelled out as they stood at this
+revision rather than taken from ``app.models`` / ``app.services``: the
+unique upsert key only arrives in 0004, after its duplicates are removed.
+"""
+import datetime as dt
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_partition_kpi_by_month"
+down_revision: Union[str, Sequence[str], None] = "0002_kpi_composite_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# ``KPI_PARTITIONS_AHEAD`` and the catalog check of ``app.services.kpi_partitions``
+_AHEAD = 3
+_PARTITIONED = sa.text(
+    "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+    "WHERE c.relname = 'kpi' AND c.relnamespace = to_regnamespace(current_schema())"
+)
+
+_INDEXES = (
+    ("ix_kpi_as_of", ["as_of"], None),
+    ("ix_kpi_company_metric_as_of", ["company_id", "metric", sa.text("as_of DESC")], ["value"]),
+    ("ix_kpi_company_as_of", ["company_id", sa.text("as_of DESC")], None),
+)
+
+
+def _is_partitioned(bind) -> bool:
+    return bind.dialect.name == "postgresql" and bind.execute(_PARTITIONED).first() is not None
+
+
+def _month_start(ts: dt.datetime) -> dt.date:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(dt.timezone.utc)
+    return dt.date(ts.year, ts.month, 1)
+
+
+def _add_months(month: dt.date, n: int) -> dt.date:
+    index = month.year * 12 + month.month - 1 + n
+    return dt.date(index // 12, index % 12 + 1, 1)
+
+
+def _create_partitions(first: Optional[dt.date]) -> None:
+    # the new table is empty, so no rows sit in the default partition yet
+    current = _month_start(dt.datetime.now(dt.timezone.utc))
+    month = min(first or current, current)
+    last = _add_months(current, _AHEAD)
+    while month <= last:
+        following = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS kpi_y{month.year:04d}m{month.month:02d} "
+            f"PARTITION OF kpi FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+            f"TO ('{following.isoformat()} 00:00:00+00')"
+        )
+        month = following
+    op.execute("CREATE TABLE IF NOT EXISTS kpi_default PARTITION OF kpi DEFAULT")
+
+
+def _rename_indexes(bind, table: str, suffix: str) -> None:
+    names = bind.execute(
+        sa.text("SELECT indexname FROM pg_indexes WHERE tablename = :t AND schemaname = current_schema()"),
+        {"t": table},
+    ).scalars().all()
+    for name in names:
+        op.execute(f'ALTER INDEX "{name}" RENAME TO "{name[:63 - len(suffix)]}{suffix}"')
+
+
+def _create_indexes() -> None:
+    for name, columns, include in _INDEXES:
+        op.create_index(
+            name, "kpi", columns,
+            if_not_exists=True,
+            postgresql_include=include or [],
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or _is_partitioned(bind):
+        return
+
+    op.execute("ALTER TABLE kpi RENAME TO kpi_unpartitioned")
+    _rename_indexes(bind, "kpi_unpartitioned", "_unpart")
+    op.execute(
+        "CREATE TABLE kpi (LIKE kpi_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (as_of)"
+    )
+    op.execute("ALTER TABLE kpi ADD PRIMARY KEY (id, as_of)")
+    op.execute(
+        "ALTER TABLE kpi ADD FOREIGN KEY (company_id) REFERENCES company (id)"
+    )
+    _create_indexes()
+
+    oldest = bind.execute(sa.text("SELECT min(as_of) FROM kpi_unpartitioned")).scalar()
+    _create_partitions(_month_start(oldest) if oldest else None)
+    op.execute("INSERT INTO kpi SELECT * FROM kpi_unpartitioned")
+    op.execute("DROP TABLE kpi_unpartitioned")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if not _is_partitioned(bind):
+        return
+
+    op.execute("CREATE TABLE kpi_unpartitioned (LIKE kpi INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO kpi_unpartitioned SELECT * FROM kpi")
+    op.execute("DROP TABLE kpi CASCADE")
+    op.execute("ALTER TABLE kpi_unpartitioned RENAME TO kpi")
+    op.execute("ALTER TABLE kpi ADD PRIMARY KEY (id)")
+    op.execute(
+        "ALTER TABLE kpi ADD FOREIGN KEY (company_id) REFERENCES company (id)"
+    )
+    _create_indexes()
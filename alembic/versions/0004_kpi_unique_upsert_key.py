@@ -0,0 +1,71 @@
+"""Unique (company_id, metric, as_of) on kpi for batched upserts
+
+Revision ID: 0004_kpi_unique_upsert_key
+Revises: 0003_partition_kpi_by_month
+Create Date: 2026-10-17 00:00:00
+
+Replaces ``ix_kpi_company_metric_as_of`` with the unique
+``uq_kpi_company_metric_as_of`` (same columns, order and ``INCLUDE``) that
+``INSERT … ON CONFLICT`` in ``app.services.kpi_upsert`` targets.  Duplicate
+rows are removed first, keeping one per key; if any were found,
+``kpi_latest`` and the rollups are emptied, and ``init_db`` rebuilds them
+from the remaining rows on the next start (the live rebuild helpers are not
+called from here: they follow the current models, not this revision).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_kpi_unique_upsert_key"
+down_revision: Union[str, Sequence[str], None] = "0003_partition_kpi_by_month"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# derived from kpi; refilled by init_db's backfill when empty
+_DERIVED = ("kpi_latest", "kpi_rollup_day", "kpi_rollup_week", "kpi_rollup_month")
+
+_DEDUPE = {
+    "postgresql": (
+        "DELETE FROM kpi a USING kpi b "
+        "WHERE a.company_id = b.company_id AND a.metric = b.metric "
+        "AND a.as_of = b.as_of AND a.id < b.id"
+    ),
+    "sqlite": (
+        "DELETE FROM kpi WHERE rowid NOT IN "
+        "(SELECT max(rowid) FROM kpi GROUP BY company_id, metric, as_of)"
+    ),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    removed = bind.execute(sa.text(_DEDUPE[bind.dialect.name])).rowcount
+    if removed:
+        inspector = sa.inspect(bind)
+        for table in _DERIVED:
+            if inspector.has_table(table):
+                op.execute(f"DELETE FROM {table}")
+
+    op.create_index(
+        "uq_kpi_company_metric_as_of", "kpi",
+        ["company_id", "metric", sa.text("as_of DESC")],
+        unique=True,
+        if_not_exists=True,
+        postgresql_include=["value"],
+    )
+    op.drop_index("ix_kpi_company_metric_as_of", table_name="kpi", if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        "ix_kpi_company_metric_as_of", "kpi",
+        ["company_id", "metric", sa.text("as_of DESC")],
+        if_not_exists=True,
+        postgresql_include=["value"],
+    )
+    op.drop_index("uq_kpi_company_metric_as_of", table_name="kpi", if_exists=True)
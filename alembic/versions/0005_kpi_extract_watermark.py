@@ -0,0 +1,40 @@
+"""Per-source extraction watermarks of the KPI ETL
+
+Revision ID: 0005_kpi_extract_watermark
+Revises: 0004_kpi_unique_upsert_key
+Create Date: 2026-10-17 00:00:00
+
+Adds ``kpi_extract_watermark`` (see ``app.services.kpi_watermark``).  It
+starts empty, so the first ETL run after the upgrade is a full extraction.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_kpi_extract_watermark"
+down_revision: Union[str, Sequence[str], None] = "0004_kpi_unique_upsert_key"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "kpi_extract_watermark",
+        sa.Column("source", sa.String(64), primary_key=True),
+        sa.Column("as_of", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("rows", sa.Integer, nullable=False, server_default="0"),
+        sa.Column(
+            "updated_at", sa.DateTime(timezone=True), nullable=False,
+            server_default=sa.func.now(),
+        ),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("kpi_extract_watermark", if_exists=True)
@@ -0,0 +1,50 @@
+"""Full-text search column on news (PostgreSQL)
+
+Revision ID: 0006_news_search_vector
+Revises: 0005_kpi_extract_watermark
+Create Date: 2026-10-17 00:00:00
+
+Adds the generated ``search_vector tsvector`` column (title weighted ``A``,
+description ``B``) and its GIN index that ``app.services.news_search``
+ranks with.  Adding a stored generated column rewrites ``news``: run it in
+a maintenance window.  The index is built ``CONCURRENTLY``.  SQLite keeps
+its FTS5 table, created by ``init_db``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_news_search_vector"
+down_revision: Union[str, Sequence[str], None] = "0005_kpi_extract_watermark"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(
+        """
+        ALTER TABLE news ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_news_search_vector "
+            "ON news USING GIN (search_vector)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_news_search_vector")
+    op.execute("ALTER TABLE news DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,178 @@
+"""Structured intel columns on news
+
+Revision ID: 0007_news_structured_columns
+Revises: 0006_news_search_vector
+Create Date: 2026-10-17 00:00:00
+
+Adds ``impact_level``, ``opportunity_risk``, ``sectors_affected`` and
+``geo_regions`` (JSONB arrays on PostgreSQL, with GIN indexes) plus the
+B-tree indexes ``/dashboard/news`` filters with, then backfills rows stored
+before the columns existed: from the model answer kept in ``raw_data``,
+else from the title tags and the formatted description.  Only rows whose
+structured columns are all NULL are touched, in keyset batches by ``id``.
+
+The parsing is a frozen copy of ``app.services.news_structure`` as of this
+revision; databases upgraded by ``init_db`` alone get the same columns and
+backfill from there.
+"""
+import re
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_news_structured_columns"
+down_revision: Union[str, Sequence[str], None] = "0006_news_search_vector"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_BATCH = 1000
+
+_IMPACT_LEVELS = ("critical", "high", "medium")
+_OPPORTUNITY_RISK = ("opportunity", "risk", "both")
+
+_DESCRIPTION_FIELDS = {
+    "impact_level": re.compile(r"\*\*Impact Level\*\*:\s*(\w+)"),
+    "opportunity_risk": re.compile(r"\*\*Type\*\*:\s*(\w+)"),
+    "sectors_affected": re.compile(r"\*\*Sectors\*\*:\s*([^\n]+)"),
+    "geo_regions": re.compile(r"\*\*Regions\*\*:\s*([^\n]+)"),
+}
+
+
+def _array_type(dialect_name: str):
+    return postgresql.JSONB() if dialect_name == "postgresql" else sa.JSON()
+
+
+def _choice(value: Any, allowed: Sequence[str]) -> Optional[str]:
+    value = str(value or "").strip().lower()
+    return value if value in allowed else None
+
+
+def _slugs(values: Any) -> Optional[List[str]]:
+    if isinstance(values, str):
+        values = values.split(",")
+    if not isinstance(values, (list, tuple)):
+        return None
+    slugs = [re.sub(r"[\s-]+", "_", str(v).strip().lower()) for v in values]
+    return [s for s in slugs if s] or None
+
+
+def _fields(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "impact_level": _choice(item.get("impact_level"), _IMPACT_LEVELS),
+        "opportunity_risk": _choice(item.get("opportunity_risk"), _OPPORTUNITY_RISK),
+        "sectors_affected": _slugs(item.get("sectors_affected")),
+        "geo_regions": _slugs(item.get("geo_regions")),
+    }
+
+
+def _recover(title: str, description: Optional[str], raw: Any) -> Dict[str, Any]:
+    fields = _fields(raw if isinstance(raw, dict) else {})
+    found = {}
+    for field, pattern in _DESCRIPTION_FIELDS.items():
+        match = pattern.search(description or "")
+        if match:
+            found[field] = match.group(1)
+    for field, value in _fields(found).items():
+        if fields[field] is None:
+            fields[field] = value
+
+    if fields["impact_level"] is None:
+        fields["impact_level"] = next(
+            (level for level in _IMPACT_LEVELS if f"[{level.upper()}]" in title), None
+        )
+    if fields["opportunity_risk"] is None:
+        if "[OPPORTUNITY]" in title:
+            fields["opportunity_risk"] = "opportunity"
+        elif "[RISK]" in title:
+            fields["opportunity_risk"] = "risk"
+    return fields
+
+
+def _backfill(bind) -> None:
+    array = _array_type(bind.dialect.name)
+    news = sa.table(
+        "news",
+        sa.column("id"),
+        sa.column("title", sa.String),
+        sa.column("description", sa.Text),
+        sa.column("raw_data", sa.JSON),
+        sa.column("impact_level", sa.String),
+        sa.column("opportunity_risk", sa.String),
+        sa.column("sectors_affected", array),
+        sa.column("geo_regions", array),
+    )
+    pending = sa.select(news.c.id, news.c.title, news.c.description, news.c.raw_data).where(
+        news.c.impact_level.is_(None),
+        news.c.opportunity_risk.is_(None),
+        news.c.sectors_affected.is_(None),
+        news.c.geo_regions.is_(None),
+    )
+    update = (
+        sa.update(news)
+        .where(news.c.id == sa.bindparam("row_id"))
+        .values({
+            name: sa.bindparam(name, type_=news.c[name].type)
+            for name in ("impact_level", "opportunity_risk", "sectors_affected", "geo_regions")
+        })
+    )
+    after = None
+    while True:
+        stmt = pending if after is None else pending.where(news.c.id > after)
+        rows = bind.execute(stmt.order_by(news.c.id).limit(_BATCH)).all()
+        if not rows:
+            return
+        params = []
+        for row_id, title, description, raw in rows:
+            fields = _recover(title or "", description, raw)
+            if any(v is not None for v in fields.values()):
+                params.append({"row_id": row_id, **fields})
+        if params:
+            bind.execute(update, params)
+        after = rows[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    existing = {c["name"] for c in sa.inspect(bind).get_columns("news")}
+    for name, type_ in (
+        ("impact_level", sa.String(16)),
+        ("opportunity_risk", sa.String(16)),
+        ("sectors_affected", _array_type(bind.dialect.name)),
+        ("geo_regions", _array_type(bind.dialect.name)),
+    ):
+        if name not in existing:
+            op.add_column("news", sa.Column(name, type_, nullable=True))
+
+    op.create_index(
+        "ix_news_impact_level_published_at", "news", ["impact_level", "published_at"],
+        if_not_exists=True,
+    )
+    op.create_index("ix_news_opportunity_risk", "news", ["opportunity_risk"], if_not_exists=True)
+    if bind.dialect.name == "postgresql":
+        for name in ("sectors_affected", "geo_regions"):
+            op.create_index(
+                f"ix_news_{name}", "news", [name],
+                if_not_exists=True,
+                postgresql_using="gin",
+            )
+
+    _backfill(bind)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in (
+        "ix_news_geo_regions",
+        "ix_news_sectors_affected",
+        "ix_news_opportunity_risk",
+        "ix_news_impact_level_published_at",
+    ):
+        op.drop_index(name, table_name="news", if_exists=True)
+    with op.batch_alter_table("news") as batch:
+        for name in ("geo_regions", "sectors_affected", "opportunity_risk", "impact_level"):
+            batch.drop_column(name)
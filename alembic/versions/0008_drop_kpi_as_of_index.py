@@ -0,0 +1,30 @@
+"""Drop the redundant single-column kpi.as_of index
+
+Revision ID: 0008_drop_kpi_as_of_index
+Revises: 0007_news_structured_columns
+Create Date: 2026-10-17 00:00:00
+
+``ix_kpi_as_of`` is redundant with the primary key ``(id, as_of)`` and
+``ix_kpi_company_as_of``: readers filter on ``company_id`` first, so the
+index only added write cost.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_drop_kpi_as_of_index"
+down_revision: Union[str, Sequence[str], None] = "0007_news_structured_columns"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index("ix_kpi_as_of", table_name="kpi", if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_kpi_as_of", "kpi", ["as_of"], if_not_exists=True)
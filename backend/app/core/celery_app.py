@@ -8,7 +8,12 @@ celery_app = Celery(
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
     include=[
+        "app.services.kpi_archive",
         "app.services.kpi_etl",
+        "app.services.kpi_latest",
+        "app.services.kpi_partitions",
+        "app.services.kpi_rollup",
+        "app.services.news_structure",
         "app.workers.internal_analyser",
         "app.workers.external_fetcher",
     ],
@@ -29,6 +34,16 @@ celery_app.conf.beat_schedule = {
         "schedule": crontab(minute=0, hour="*"),
         "options": {"queue": "default"},
     },
+    "maintain-kpi-partitions": {
+        "task": "app.services.kpi_partitions.maintain",
+        "schedule": crontab(minute=15, hour=0),
+        "options": {"queue": "default"},
+    },
+    "archive-old-kpis": {
+        "task": "app.services.kpi_archive.archive",
+        "schedule": crontab(minute=30, hour=1, day_of_week="sun"),
+        "options": {"queue": "default"},
+    },
     "fetch-external-news": {
         "task": "app.workers.external_fetcher.fetch",
         "schedule": 900,  # every 15 min
@@ -9,13 +9,16 @@ Exposes
 - ``Base``: declarative base for your ORM models
 - ``get_db``: FastAPI dependency – yields one session per request
 - ``init_db``: create tables at startup (must be run *after* all models are imported)
+  and fill the schema capability registry (:mod:`app.core.schema`)
 - ``shutdown``: dispose the engine cleanly on application shutdown
+- ``dialect_insert``: ``INSERT`` construct supporting ``ON CONFLICT`` upserts
 """
 from __future__ import annotations
 
 import os
 from typing import AsyncGenerator
 
+from sqlalchemy import Table
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -65,10 +68,31 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         yield session  # FastAPI handles teardown
 
 
+def dialect_insert(table: Table, dialect_name: str):
+    """Return a dialect-specific ``INSERT`` with ``on_conflict_do_*`` support.
+
+    Both supported backends (PostgreSQL in production, SQLite for local
+    development) implement ``INSERT … ON CONFLICT``; the generic
+    :func:`sqlalchemy.insert` does not expose it.
+    """
+
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:  # pragma: no cover - unsupported backend
+        raise NotImplementedError(f"Upserts not supported on {dialect_name!r}")
+    return insert(table)
+
+
 # ---------------------------------------------------------------------------
 # Startup / Shutdown helpers
 # ---------------------------------------------------------------------------
 
+# ``news`` columns added after the table shipped; created by ``init_db`` (and
+# by revision 0007_news_structured_columns for Alembic-managed databases)
+_NEWS_STRUCTURED_COLUMNS = ("impact_level", "opportunity_risk", "sectors_affected", "geo_regions")
+
 
 async def init_db() -> None:
     """Create all tables.
@@ -82,7 +106,7 @@ async def init_db() -> None:
     """
 
     # Import after engine definition to avoid circulars & ensure registration
-    from app.models import Company, Kpi, News  # noqa: F401 – needed for side‑effects
+    from app.models import Company, Kpi, KpiLatest, KpiRollupDay, News, NewsSourceCount  # noqa: F401 – needed for side‑effects
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -90,6 +114,8 @@ async def init_db() -> None:
         # Ensure critical columns exist (handles older databases without migrations)
         from sqlalchemy import inspect, text
 
+        from app.core.schema import schema
+
         def _check_columns(sync_conn):
             inspector = inspect(sync_conn)
             kpi_columns = [c["name"] for c in inspector.get_columns("kpi")]
@@ -113,7 +139,57 @@ async def init_db() -> None:
             if "name" not in company_columns:
                 sync_conn.execute(text("ALTER TABLE company ADD COLUMN name VARCHAR(256)"))
 
-        await conn.run_sync(_check_columns)
+            # Structured intel columns on ``news`` (one-off backfill below)
+            news_columns = {c["name"] for c in inspector.get_columns("news")}
+            added_news_columns = [
+                column
+                for column in News.__table__.columns
+                if column.name in _NEWS_STRUCTURED_COLUMNS
+                and column.name not in news_columns
+            ]
+            for column in added_news_columns:
+                ddl_type = column.type.compile(dialect=sync_conn.dialect)
+                sync_conn.execute(
+                    text(f"ALTER TABLE news ADD COLUMN {column.name} {ddl_type}")
+                )
+
+            # Indexes declared on models that predate their tables' creation
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(sync_conn, checkfirst=True)
+
+            # Monthly ``kpi`` partitions (PostgreSQL only; no-op otherwise)
+            from app.services.kpi_partitions import ensure_partitions
+
+            ensure_partitions(sync_conn)
+
+            # Full-text search structure for ``/dashboard/news?search=``
+            from app.services.news_search import ensure_search_index
+
+            ensure_search_index(sync_conn)
+
+            # Record the final column layout so request handlers never have
+            # to introspect the catalog themselves.
+            schema.refresh(sync_conn)
+            return bool(added_news_columns)
+
+        backfill_news = await conn.run_sync(_check_columns)
+
+        # One-off backfill of the ``kpi_latest`` materialisation, the KPI
+        # rollups and the news counters for databases that predate them;
+        # afterwards every writer maintains them.
+        from app.services import kpi_latest, kpi_rollup, news_counters
+
+        await conn.run_sync(kpi_latest.backfill_if_empty)
+        await conn.run_sync(kpi_rollup.backfill_if_empty)
+        await conn.run_sync(news_counters.backfill_if_empty)
+
+    if backfill_news:
+        # batched, one commit per batch, outside the DDL transaction
+        from app.services.news_structure import backfill_structured_columns
+
+        async with engine.connect() as conn:
+            await conn.run_sync(backfill_structured_columns, commit=True)
 
 async def shutdown() -> None:
     """Dispose the engine and close all pools."""
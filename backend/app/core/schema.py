@@ -0,0 +1,97 @@
+"""backend/app/core/schema.py
+===============================
+Schema capability registry.
+
+Older databases may miss some nullable ``kpi`` columns (``target``,
+``type``, ``description``).  Instead of asking the catalog on every request,
+:func:`app.core.database.init_db` inspects the schema once and stores the
+result here.  ``alembic/env.py`` refreshes it after migrating, which only
+reaches the registry of the process running Alembic: a server that was
+already up keeps its startup view, so restart it after ``alembic upgrade``.
+
+The registry also caches statements that depend on those capabilities so
+the request path neither introspects nor rebuilds SELECTs.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Nullable KPI columns whose presence depends on the database's age
+_OPTIONAL_KPI_COLUMNS = ("target", "type", "unit", "description")
+
+
+class SchemaCapabilities:
+    """Column presence per table plus statements compiled against it."""
+
+    def __init__(self) -> None:
+        self._columns: Dict[str, FrozenSet[str]] = {}
+        self._statements: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    # ------------------------------------------------------------------ #
+    # Population
+    # ------------------------------------------------------------------ #
+    def refresh(self, sync_conn) -> None:
+        """Re-inspect all tables via a *synchronous* connection."""
+        insp = inspect(sync_conn)
+        columns = {
+            table: frozenset(c["name"] for c in insp.get_columns(table))
+            for table in insp.get_table_names()
+        }
+        with self._lock:
+            self._columns = columns
+            self._statements = {}
+            self.loaded = True
+        logger.info("Schema registry refreshed (%d tables)", len(columns))
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        """Populate lazily when ``init_db`` has not run (tests, scripts)."""
+        if not self.loaded:
+            await db.run_sync(lambda s: self.refresh(s.connection()))
+
+    # ------------------------------------------------------------------ #
+    # Lookups
+    # ------------------------------------------------------------------ #
+    def has_column(self, table: str, column: str) -> bool:
+        return column in self._columns.get(table, frozenset())
+
+    def has_table(self, table: str) -> bool:
+        return table in self._columns
+
+    @property
+    def kpi_optional_columns(self) -> Tuple:
+        """``Kpi`` attributes for the optional columns present in ``kpi``."""
+        from app.models import Kpi
+
+        return self.cached(
+            "kpi_optional_columns",
+            lambda: tuple(
+                getattr(Kpi, name)
+                for name in _OPTIONAL_KPI_COLUMNS
+                if self.has_column("kpi", name)
+            ),
+        )
+
+    def cached(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        """Return ``build()`` memoised until the next :meth:`refresh`."""
+        try:
+            return self._statements[key]
+        except KeyError:
+            value = build()
+            with self._lock:
+                self._statements.setdefault(key, value)
+            return value
+
+
+# ---------------------------------------------------------------------- #
+# Export singleton                                                       #
+# ---------------------------------------------------------------------- #
+schema = SchemaCapabilities()
@@ -25,6 +25,66 @@ class Settings(BaseSettings):
     # ------------------------------------------------------------------ #
     NEWS_API_KEY: str | None = None
 
+    # ------------------------------------------------------------------ #
+    # Dashboard sparklines
+    # ------------------------------------------------------------------ #
+    SPARKLINE_POINTS: int = 24            # points per tile after LTTB
+    SPARKLINE_MAX_RAW_POINTS: int = 2000  # newest raw rows read per metric
+    SPARKLINE_CACHE_SIZE: int = 10_000    # (company, metric, watermark) entries
+
+    # ------------------------------------------------------------------ #
+    # Dashboard response cache (Redis)
+    # ------------------------------------------------------------------ #
+    DASHBOARD_CACHE_ENABLED: bool = True
+    DASHBOARD_CACHE_TTL: int = 300        # safety net if a version bump is lost
+    DASHBOARD_STATS_CACHE_TTL: int = 15   # /stats?exact=true embeds live WebSocket data
+
+    PORTFOLIO_MAX_COMPANIES: int = 100    # company_ids per /dashboard/portfolio call
+    SERIES_MAX_BUCKETS: int = 1000        # buckets per metric in /dashboard/kpis/series
+    SERIES_MAX_METRICS: int = 20          # metrics per /dashboard/kpis/series call
+
+    JSON_FAST: bool = False               # opt in: orjson for route payloads when installed
+    COMPRESS_MIN_SIZE: int = 1024         # gzip / brotli responses from this many bytes
+
+    EXPORT_BATCH_SIZE: int = 10_000       # rows fetched per cursor batch in /dashboard/kpis/export
+    EXPORT_ROW_GROUP_SIZE: int = 250_000  # rows per Parquet row group in exports
+
+    # ------------------------------------------------------------------ #
+    # KPI partitions (PostgreSQL) and read windows
+    # ------------------------------------------------------------------ #
+    KPI_PARTITIONS_AHEAD: int = 3         # monthly partitions created ahead of time
+    KPI_RETENTION_MONTHS: int = 0         # drop/detach raw months older than this; 0 = keep
+    KPI_RETENTION_MODE: str = "detach"    # "detach" (keep the table) or "drop"
+    KPI_QUERY_LOOKBACK_DAYS: int = 400    # as_of bound of "newest N rows" reads (partition pruning)
+    KPI_UPSERT_CHUNK_SIZE: int = 5_000    # rows per INSERT … ON CONFLICT batch in kpi_etl
+    KPI_EXTRACT_OVERLAP_MINUTES: int = 60 # re-read window behind the watermark for late rows
+    KPI_EXTRACT_CONCURRENCY: int = 8      # companies extracted in parallel, across all workers
+    KPI_EXTRACT_PER_DSN: int = 2          # concurrent queries per warehouse (all workers) / pooled connections
+    KPI_EXTRACT_IDLE_SECONDS: int = 5400  # close pooled warehouse connections idle this long
+    KPI_EXTRACT_BATCH_SIZE: int = 20_000  # rows per cleaned warehouse batch streamed to the upsert
+    KPI_EXTRACT_QUEUE_SIZE: int = 4       # batches buffered between extraction and upsert
+    KPI_SYNC_MAX_RETRIES: int = 2         # retries of one company's sync subtask
+    KPI_SYNC_RETRY_DELAY: int = 60        # seconds before the first retry (doubles each time)
+    KPI_SYNC_SOFT_TIME_LIMIT: int = 900   # seconds per company before SoftTimeLimitExceeded
+    KPI_SYNC_TIME_LIMIT: int = 960        # hard kill of a stuck company subtask
+    KPI_SYNC_PROGRESS_TTL: int = 86_400   # seconds sync progress stays queryable
+    KPI_ARCHIVE_AFTER_DAYS: int = 0       # move raw rows older than this to Parquet; 0 = never
+    KPI_ARCHIVE_DIR: str = "./data/kpi-archive"
+
+    # ------------------------------------------------------------------ #
+    # Tenant warehouse engines (services/warehouse.py)
+    # ------------------------------------------------------------------ #
+    WAREHOUSE_ENGINE_CACHE_SIZE: int = 32     # async engines kept (LRU)
+    WAREHOUSE_ENGINE_IDLE_SECONDS: int = 600  # dispose engines unused this long
+    WAREHOUSE_POOL_SIZE: int = 2              # pooled connections per DSN …
+    WAREHOUSE_MAX_OVERFLOW: int = 2           # … plus this many on bursts
+    WAREHOUSE_POOL_TIMEOUT: int = 30          # seconds to wait for a free connection
+
+    # ------------------------------------------------------------------ #
+    # Dashboard stats snapshot (served by /dashboard/stats)
+    # ------------------------------------------------------------------ #
+    STATS_SNAPSHOT_INTERVAL: int = 30     # seconds between background refreshes
+
     # ------------------------------------------------------------------ #
     # JWT / Auth  ❗ (new)
     # ------------------------------------------------------------------ #
@@ -30,6 +30,9 @@ from starlette.websockets import WebSocketDisconnect, WebSocketState
 from .core.database import init_db, shutdown
 from .core.settings import settings
 from .routers import alerts, ask_ai, auth, dashboard, company, ingest_file
+from .services.stats_snapshot import stats_snapshot
+from .services.warehouse import engines as warehouse_engines
+from .utils.compression import CompressionMiddleware
 
 # --------------------------------------------------------------------------- #
 # Logging
@@ -59,6 +62,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --------------------------------------------------------------------------- #
+# Compression  (brotli if installed, else gzip; small bodies left as-is)
+# --------------------------------------------------------------------------- #
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESS_MIN_SIZE)
+
 # --------------------------------------------------------------------------- #
 # Routers
 # --------------------------------------------------------------------------- #
@@ -171,11 +179,15 @@ async def _startup() -> None:
         importlib.import_module(f"{_models.__name__}.{mod}")
 
     await init_db()
+    stats_snapshot.start()
+    warehouse_engines.start()
     logger.info("🚀  FastAPI ready – database initialised")
 
 
 @app.on_event("shutdown")
 async def _shutdown() -> None:
+    await stats_snapshot.stop()
+    await warehouse_engines.stop()
     await shutdown()
     await settings.redis_client.close()
     logger.info("👋  Server shutdown complete")
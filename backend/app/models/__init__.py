@@ -2,13 +2,22 @@
 
 from .company import Company
 from .kpi import Kpi, KpiType
-from .news import News
+from .kpi_latest import KpiLatest
+from .kpi_rollup import KpiRollupDay, KpiRollupMonth, KpiRollupWeek
+from .kpi_watermark import KpiExtractWatermark
+from .news import News, NewsSourceCount
 from .user import User
 
 __all__ = [
     "Company",
     "Kpi",
     "KpiType",
+    "KpiLatest",
+    "KpiRollupDay",
+    "KpiRollupWeek",
+    "KpiRollupMonth",
+    "KpiExtractWatermark",
     "News",
+    "NewsSourceCount",
     "User",
 ]
\ No newline at end of file
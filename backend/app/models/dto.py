@@ -1,4 +1,6 @@
 from datetime import datetime
+from uuid import UUID
+
 from pydantic import BaseModel, Field
 
 
@@ -10,6 +12,36 @@ class KPITile(BaseModel):
     spark: list[float] = Field(default_factory=list)
 
 
+class NewsItem(BaseModel):
+    id: UUID
+    title: str
+    url: str
+    source: str
+    published_at: datetime
+    description: str
+    relevance: float | None = Field(None, description="Search rank (higher is better); only with `search`")
+    snippet: str | None = Field(None, description="Highlighted match; only with `search`")
+    impact_level: str | None = None
+    opportunity_type: str | None = None
+    sectors_affected: list[str] | None = None
+    geo_regions: list[str] | None = None
+
+
+class NewsPage(BaseModel):
+    items: list[NewsItem]
+    count: int
+    total_count: int | None = Field(
+        description="Items matching the filters; `null` unless the only filter is `source` "
+                    "(totals come from per-source counters, not a scan)",
+    )
+    limit: int
+    next_cursor: str | None = Field(
+        description="Pass as `cursor` for the next page; `null` on the last page and for `search`",
+    )
+    sources: dict[str, int] = Field(description="Item count per source (all items)")
+    timestamp: datetime
+
+
 class Alert(BaseModel):
     id: int
     ts: datetime
@@ -19,9 +51,6 @@ class Alert(BaseModel):
     suggested_action: str | None = None
 
 
-from uuid import UUID
-
-
 class AskAIRequest(BaseModel):
     query: str
     company_id: UUID | None = None
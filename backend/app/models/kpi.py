@@ -4,7 +4,7 @@ import enum
 import uuid
 import datetime as dt
 
-from sqlalchemy import Column, String, Float, DateTime, Text, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, String, Float, DateTime, Text, ForeignKey, Index, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -26,9 +26,26 @@ class Kpi(Base):
     metric = Column(String(100), nullable=False)
     value = Column(Float, nullable=False)
     target = Column(Float, nullable=True)
-    as_of = Column(DateTime(timezone=True), nullable=False, index=True)
+    # part of the key: PostgreSQL range-partitions ``kpi`` on it (monthly)
+    as_of = Column(DateTime(timezone=True), primary_key=True, nullable=False)
     type = Column(SQLEnum(KpiType), nullable=False)
     unit = Column(String(20), nullable=True)
     description = Column(Text, nullable=True)
 
-    company = relationship("Company", backref="kpis")
\ No newline at end of file
+    company = relationship("Company", backref="kpis")
+
+    # Hot reads filter on company (+ metric) and walk ``as_of`` newest first;
+    # ``value`` is included so history reads are index-only on PostgreSQL.
+    # The first index is also the upsert key (one value per metric and time).
+    # Existing databases get these through the Alembic migrations.
+    __table_args__ = (
+        Index(
+            "uq_kpi_company_metric_as_of",
+            company_id, metric, as_of.desc(),
+            unique=True,
+            postgresql_include=["value"],
+        ),
+        Index("ix_kpi_company_as_of", company_id, as_of.desc()),
+        # partitions are managed by app.services.kpi_partitions
+        {"postgresql_partition_by": "RANGE (as_of)"},
+    )
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlalchemy import Column, String, Float, DateTime, Text, ForeignKey, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import UUID
+
+from ..core.database import Base
+from .kpi import KpiType
+
+
+class KpiLatest(Base):
+    """Current and previous value of every KPI metric, one row per metric.
+
+    Maintained incrementally by every writer of ``kpi`` (see
+    :mod:`app.services.kpi_latest`) so the dashboard reads O(metrics) rows
+    regardless of how much history a tenant has.
+    """
+
+    __tablename__ = "kpi_latest"
+
+    company_id = Column(UUID(as_uuid=True), ForeignKey("company.id"), primary_key=True)
+    metric = Column(String(100), primary_key=True)
+    value = Column(Float, nullable=False)
+    as_of = Column(DateTime(timezone=True), nullable=False)
+    prev_value = Column(Float, nullable=True)
+    prev_as_of = Column(DateTime(timezone=True), nullable=True)
+    target = Column(Float, nullable=True)
+    type = Column(SQLEnum(KpiType), nullable=True)
+    unit = Column(String(20), nullable=True)
+    description = Column(Text, nullable=True)
+    updated_at = Column(
+        DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False
+    )
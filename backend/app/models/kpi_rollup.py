@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlalchemy import Column, String, Float, DateTime, Integer, ForeignKey, PrimaryKeyConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import declared_attr
+
+from ..core.database import Base
+
+
+class _KpiRollup:
+    """Per-bucket aggregates of one KPI metric.
+
+    ``bucket`` is the naive UTC start of the bucket (weeks start Monday).
+    Rows are recomputed for the buckets a writer touches (see
+    :mod:`app.services.kpi_rollup`).
+    """
+
+    @declared_attr
+    def __table_args__(cls):
+        # (company_id, metric, bucket) order serves the range reads
+        return (PrimaryKeyConstraint("company_id", "metric", "bucket"),)
+
+    @declared_attr
+    def company_id(cls):
+        return Column(UUID(as_uuid=True), ForeignKey("company.id"), nullable=False)
+
+    metric = Column(String(100), nullable=False)
+    bucket = Column(DateTime(timezone=False), nullable=False)
+    count = Column(Integer, nullable=False)
+    sum = Column(Float, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+    last_value = Column(Float, nullable=False)
+    last_as_of = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False
+    )
+
+
+class KpiRollupDay(_KpiRollup, Base):
+    __tablename__ = "kpi_rollup_day"
+
+
+class KpiRollupWeek(_KpiRollup, Base):
+    __tablename__ = "kpi_rollup_week"
+
+
+class KpiRollupMonth(_KpiRollup, Base):
+    __tablename__ = "kpi_rollup_month"
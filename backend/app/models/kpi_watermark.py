@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlalchemy import Column, String, DateTime, Integer
+
+from ..core.database import Base
+
+
+class KpiExtractWatermark(Base):
+    """Newest warehouse ``as_of`` loaded so far, one row per extraction source.
+
+    ``source`` is the company id for tenants with their own ``snowflake_dsn``
+    and ``"*"`` for the shared ``SNOWFLAKE_DSN``.  Written in the same
+    transaction as the rows it covers (see :mod:`app.services.kpi_watermark`).
+    """
+
+    __tablename__ = "kpi_extract_watermark"
+
+    source = Column(String(64), primary_key=True)
+    as_of = Column(DateTime(timezone=True), nullable=False)
+    rows = Column(Integer, nullable=False, default=0)   # rows pulled by the last run
+    updated_at = Column(
+        DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False
+    )
@@ -3,15 +3,31 @@ from __future__ import annotations
 import uuid
 import datetime as dt
 
-from sqlalchemy import Column, String, Text, DateTime, Float, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Text, DateTime, Float, JSON, BigInteger, Index
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 
 from ..core.database import Base
 
+# JSON arrays; JSONB on PostgreSQL so ``@>`` containment can use a GIN index
+# (``none_as_null`` keeps missing values SQL NULL rather than JSON ``null``)
+JSONArray = JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql")
+
 class News(Base):
     """Financial news articles with metadata."""
 
     __tablename__ = "news"
+    __table_args__ = (
+        # keyset pagination: ORDER BY published_at DESC, id DESC
+        Index("ix_news_published_at_id", "published_at", "id"),
+        # ``impact_level = ? ORDER BY published_at DESC``
+        Index("ix_news_impact_level_published_at", "impact_level", "published_at"),
+        Index(
+            "ix_news_sectors_affected", "sectors_affected", postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_news_geo_regions", "geo_regions", postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = Column(String(255), nullable=False)
@@ -23,3 +39,24 @@ class News(Base):
     sentiment = Column(Float, nullable=True)
     relevance_score = Column(Float, nullable=True)
     raw_data = Column(JSON, nullable=True)
+    # Structured intel fields (see ``app.services.news_structure``)
+    impact_level = Column(String(16), nullable=True)
+    opportunity_risk = Column(String(16), nullable=True, index=True)
+    sectors_affected = Column(JSONArray, nullable=True)
+    geo_regions = Column(JSONArray, nullable=True)
+
+
+class NewsSourceCount(Base):
+    """Per-source article counter maintained by the news writers.
+
+    Serves the ``sources`` facet and unfiltered totals of ``/dashboard/news``
+    without a ``GROUP BY`` over the whole ``news`` table.
+    """
+
+    __tablename__ = "news_source_count"
+
+    source = Column(String(100), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(
+        DateTime(timezone=True), default=dt.datetime.utcnow, nullable=False
+    )
@@ -1,162 +1,145 @@
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status, Query, HTTPException
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import and_, func, select, or_
-from typing import Optional, List, Dict, Any
+from sqlalchemy import and_, func, select, or_, tuple_
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timedelta, timezone
+import base64
+import binascii
 import logging
-from sqlalchemy import inspect
-from sqlalchemy.orm import load_only
 from uuid import UUID
 
-from app.core.database import get_db
-from app.models import Kpi, News, Company
-from app.models.dto import KPITile
+import redis
+
+from app.core.database import AsyncSessionLocal, get_db
+from app.core.schema import schema
+from app.core.settings import settings
+from app.models import Kpi, KpiLatest, KpiRollupMonth, News, Company
+from app.models.dto import KPITile, NewsPage
 from app.services.ai import ask_ai_sync, get_task_status
+from app.services import kpi_sync
+from app.services.dashboard_cache import NEWS_SCOPE, cache_stats, cached_json, encode
+from app.services.kpi_archive import archive_batches
+from app.services.kpi_export import COLUMNS, FORMATS, export_statement, stream_export
+from app.services.kpi_series import bucket_ceil, bucket_count, finest_bucket, load_series
+from app.services.kpi_snapshot import load_portfolio_snapshot, load_snapshot
+from app.services.news_counters import load_source_counts
+from app.services.news_search import ranked_search
+from app.services.news_structure import array_contains
+from app.services.sparkline import load_portfolio_sparklines, load_sparklines
+from app.services.stats_snapshot import exact_counts, stats_snapshot
+from app.services.warehouse import engines as warehouse_engines
 from app.utils.broadcaster import manager
+from app.utils.serialization import row_converter
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
-async def _has_target_column(db: AsyncSession) -> bool:
-    """Return True if the KPI table has a ``target`` column."""
-
-    def check(sync_session):
-        """Check if the ``kpi`` table has a ``target`` column using the
-        synchronous connection bound to the session."""
-
-        connection = sync_session.connection()
-        insp = inspect(connection)
-        return "target" in [c["name"] for c in insp.get_columns("kpi")]
-
-    return await db.run_sync(check)
-
-async def _has_type_column(db: AsyncSession) -> bool:
-    """Return True if the KPI table has a ``type`` column."""
-
-    def check(sync_session):
-        """Check if the ``kpi`` table has a ``type`` column using the
-        synchronous connection bound to the session."""
-
-        connection = sync_session.connection()
-        insp = inspect(connection)
-        return "type" in [c["name"] for c in insp.get_columns("kpi")]
-
-    return await db.run_sync(check)
-
-
-async def _has_description_column(db: AsyncSession) -> bool:
-    """Return True if the KPI table has a ``description`` column."""
-
-    def check(sync_session):
-        """Check if the ``kpi`` table has a ``description`` column using the
-        synchronous connection bound to the session."""
-
-        connection = sync_session.connection()
-        insp = inspect(connection)
-        return "description" in [c["name"] for c in insp.get_columns("kpi")]
-
-    return await db.run_sync(check)
-
-
+# row -> dict copies for the hot list payloads; datetimes/UUIDs are left to
+# the response encoder (``dashboard_cache.encode``)
+_kpi_item = row_converter(metric="metric", value="value", as_of="as_of")
+_news_item = row_converter(
+    id="id", title="title", url="url", source="source",
+    published_at="published_at", description="description",
+)
 
 @router.get("/", response_model=List[KPITile])
 async def dashboard_summary(
+    request: Request,
     company_id: UUID = Query(..., description="Company ID"),
     db: AsyncSession = Depends(get_db),
 ):
     """Return latest KPI snapshot in a simple format."""
 
-    subq = (
-        select(Kpi.metric, func.max(Kpi.as_of).label("latest"))
-        .where(Kpi.company_id == company_id)
-        .group_by(Kpi.metric)
-        .subquery()
+    return await cached_json(
+        request, "summary", company_id, {},
+        lambda: _summary_tiles(db, company_id),
+        watermark=lambda: _kpi_watermark(db, company_id),
     )
 
-    has_target = await _has_target_column(db)
-    try:
-        has_type = await _has_type_column(db)
-    except Exception:  # pragma: no cover - defensive fallback
-        logger.warning("Failed to detect 'type' column, assuming absent")
-        has_type = False
-    try:
-        has_description = await _has_description_column(db)
-    except Exception:  # pragma: no cover - defensive fallback
-        logger.warning("Failed to detect 'description' column, assuming absent")
-        has_description = False
-
 
-
-    stmt = select(Kpi).join(
-        subq, (Kpi.metric == subq.c.metric) & (Kpi.as_of == subq.c.latest)
-    )
-    if not (has_target and has_type):
-        columns = [
-            Kpi.id,
-            Kpi.company_id,
-            Kpi.metric,
-            Kpi.value,
-            Kpi.as_of,
-        ]
-        if has_target:
-            columns.append(Kpi.target)
-        if has_type:
-            columns.append(Kpi.type)
-
-        columns.append(Kpi.unit)
-        if has_description:
-            columns.append(Kpi.description)
-
-        stmt = stmt.options(load_only(*columns))
-    result = await db.execute(stmt)
-    rows = result.scalars().all()
-
-    tiles = []
-    for r in rows:
-        prev_stmt = (
-            select(Kpi)
-            .where(
-                Kpi.company_id == company_id,
-                Kpi.metric == r.metric,
-                Kpi.as_of < r.as_of,
+async def _kpi_watermark(db: AsyncSession, company_id: UUID) -> str:
+    """Cheap change marker for a company's KPIs (used when Redis is down)."""
+    latest, count = (
+        await db.execute(
+            select(func.max(KpiLatest.updated_at), func.count()).where(
+                KpiLatest.company_id == company_id
             )
-            .order_by(Kpi.as_of.desc())
-            .limit(1)
         )
-        if not (has_target and has_type):
-            columns = [
-                Kpi.id,
-                Kpi.company_id,
-                Kpi.metric,
-                Kpi.value,
-                Kpi.as_of,
-            ]
-            if has_target:
-                columns.append(Kpi.target)
-            if has_type:
-                columns.append(Kpi.type)
+    ).one()
+    return f"{latest}:{count}"
+
+
+async def _summary_tiles(db: AsyncSession, company_id: UUID) -> List[KPITile]:
+    snapshot = await load_snapshot(db, company_id)
+    sparks = await load_sparklines(db, company_id, snapshot)
+    return [
+        KPITile(
+            label=s.metric,
+            value=s.value,
+            delta_pct=s.delta_pct,
+            spark=sparks.get(s.metric, []),
+        )
+        for s in snapshot
+    ]
 
-            columns.append(Kpi.unit)
-            if has_description:
-                columns.append(Kpi.description)
+@router.get("/portfolio")
+async def portfolio_summary(
+    company_ids: List[UUID] = Query(..., description="Company IDs (repeat the parameter)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Dashboard tiles of many companies in one call.
 
-            prev_stmt = prev_stmt.options(load_only(*columns))
-        prev_result = await db.execute(prev_stmt)
-        prev = prev_result.scalars().first()
+    Latest/previous values for every company come from a single
+    ``kpi_latest`` query and sparklines from a single history query; the
+    response is streamed company by company as
+    ``{"companies": [{"company_id", "name", "tiles": [KPITile, ...]}, ...]}``.
+    Unknown IDs are listed under ``"missing"``.
+    """
+    company_ids = list(dict.fromkeys(company_ids))
+    if len(company_ids) > settings.PORTFOLIO_MAX_COMPANIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.PORTFOLIO_MAX_COMPANIES} companies per request",
+        )
 
-        delta = 0.0
-        if prev and prev.value:
-            delta = ((r.value - prev.value) / prev.value) * 100
-        tiles.append({"label": r.metric, "value": r.value, "delta_pct": round(delta, 2)})
+    names = dict(
+        (await db.execute(
+            select(Company.id, Company.name).where(Company.id.in_(company_ids))
+        )).all()
+    )
+    known = [cid for cid in company_ids if cid in names]
+    snapshots = await load_portfolio_snapshot(db, known)
+    sparks = await load_portfolio_sparklines(db, snapshots)
+
+    # all database work is done; the body is serialised while it streams
+    def _body():
+        yield b'{"companies":['
+        for i, cid in enumerate(known):
+            tiles = [
+                KPITile(
+                    label=s.metric,
+                    value=s.value,
+                    delta_pct=s.delta_pct,
+                    spark=sparks[cid].get(s.metric, []),
+                )
+                for s in snapshots[cid]
+            ]
+            yield (b"," if i else b"") + encode(
+                {"company_id": cid, "name": names[cid], "tiles": tiles}
+            )
+        missing = [cid for cid in company_ids if cid not in names]
+        yield b'],"missing":' + encode(missing) + b"}"
 
-    return tiles
+    return StreamingResponse(_body(), media_type="application/json")
 
 # ─────────── REST endpoints ───────────
 
 @router.get("/kpis/latest")
 async def latest_kpis(
+    request: Request,
     company_id: UUID,
     limit: Optional[int] = Query(50, description="Maximum number of KPIs to return"),
     metrics: Optional[List[str]] = Query(None, description="Filter by specific metric names"),
@@ -164,108 +147,59 @@ async def latest_kpis(
 ):
     """
     Get latest KPI values for a company.
-    
+
+    Returns one entry per metric – its newest value with the value recorded
+    just before it – newest first; ``limit`` caps the number of metrics.
+    (Before the ``kpi_latest`` snapshot this returned the newest ``limit``
+    raw rows, so a metric could appear several times.)
+
     Enhanced with:
     - Metric filtering
     - Configurable limit
     - Value change calculation
     - Data validation
+    - Redis response cache (invalidated by KPI writers)
+    - ETag / If-None-Match support (304 when nothing changed)
     """
+    return await cached_json(
+        request, "kpis-latest", company_id,
+        {"limit": limit, "metrics": sorted(metrics or [])},
+        lambda: _latest_kpis_payload(db, company_id, limit, metrics),
+        watermark=lambda: _kpi_watermark(db, company_id),
+    )
+
+
+async def _latest_kpis_payload(
+    db: AsyncSession,
+    company_id: UUID,
+    limit: Optional[int],
+    metrics: Optional[List[str]],
+) -> Dict[str, Any]:
     # Validate company exists
     company = await db.scalar(select(Company).where(Company.id == company_id))
     if not company:
         raise HTTPException(status_code=404, detail=f"Company {company_id} not found")
     
-    has_target = await _has_target_column(db)
-    has_type = await _has_type_column(db)
-
-
-    has_description = await _has_description_column(db)
-
-    # Build query
-    stmt = select(Kpi).where(Kpi.company_id == company_id)
-    if not (has_target and has_type):
-        columns = [
-            Kpi.id,
-            Kpi.company_id,
-            Kpi.metric,
-            Kpi.value,
-            Kpi.as_of,
-        ]
-        if has_target:
-            columns.append(Kpi.target)
-        if has_type:
-            columns.append(Kpi.type)
-
-        columns.append(Kpi.unit)
-        if has_description:
-            columns.append(Kpi.description)
-        stmt = stmt.options(load_only(*columns)) 
-    # Apply metric filter if provided
-    if metrics:
-        stmt = stmt.where(Kpi.metric.in_(metrics))
-    
-    # Get latest KPIs
-    result = await db.execute(
-        stmt.order_by(Kpi.as_of.desc()).limit(limit)
-
+    # Latest + previous value for every metric in one query
+    snapshot = await load_snapshot(
+        db,
+        company_id,
+        metrics=metrics,
+        limit=limit,
     )
-    latest_kpis = result.scalars().all()
 
-    
-    # Get previous values for change calculation
     kpi_data = []
-    for kpi in latest_kpis:
-        # Find previous value for this metric
-        prev_stmt = (
-            select(Kpi)
-            .where(
-                and_(
-                    Kpi.company_id == company_id,
-                    Kpi.metric == kpi.metric,
-                    Kpi.as_of < kpi.as_of,
-                )
-            )
-            .order_by(Kpi.as_of.desc())
-            .limit(1)
-        )
-        if not (has_target and has_type):
-            columns = [
-                Kpi.id,
-                Kpi.company_id,
-                Kpi.metric,
-                Kpi.value,
-                Kpi.as_of,
-            ]
-            if has_target:
-                columns.append(Kpi.target)
-            if has_type:
-                columns.append(Kpi.type)
-
-            columns.append(Kpi.unit)
-            if has_description:
-                columns.append(Kpi.description)
-
-            prev_stmt = prev_stmt.options(load_only(*columns))
-
-        prev_result = await db.execute(prev_stmt)
-        previous = prev_result.scalars().first()
-        
-        kpi_info = {
-            "metric": kpi.metric,
-            "value": kpi.value,
-            "as_of": kpi.as_of.isoformat() if hasattr(kpi.as_of, 'isoformat') else str(kpi.as_of),
-            "data_type": _infer_data_type(kpi.value)
-        }
+    for kpi in snapshot:
+        kpi_info = _kpi_item(kpi)
+        kpi_info["data_type"] = _infer_data_type(kpi.value)
         
         # Calculate change if previous value exists
-        if previous and isinstance(kpi.value, (int, float)) and isinstance(previous.value, (int, float)):
-            if previous.value != 0:
-                change_pct = ((kpi.value - previous.value) / previous.value) * 100
-                kpi_info["change_percentage"] = round(change_pct, 2)
-                kpi_info["change_value"] = kpi.value - previous.value
-                kpi_info["previous_value"] = previous.value
-                kpi_info["previous_as_of"] = previous.as_of.isoformat() if hasattr(previous.as_of, 'isoformat') else str(previous.as_of)
+        if kpi.prev_value is not None and isinstance(kpi.value, (int, float)) and isinstance(kpi.prev_value, (int, float)):
+            if kpi.prev_value != 0:
+                kpi_info["change_percentage"] = kpi.delta_pct
+                kpi_info["change_value"] = kpi.value - kpi.prev_value
+                kpi_info["previous_value"] = kpi.prev_value
+                kpi_info["previous_as_of"] = kpi.prev_as_of
         
         kpi_data.append(kpi_info)
     
@@ -278,6 +212,141 @@ async def latest_kpis(
     }
 
 
+@router.get("/kpis/series")
+async def kpi_series(
+    request: Request,
+    company_id: UUID,
+    metrics: List[str] = Query(..., description="Metric names (repeat the parameter)"),
+    start: Optional[datetime] = Query(None, description="Range start (inclusive); default: 30 days before `end`"),
+    end: Optional[datetime] = Query(None, description="Range end (exclusive); default: the bucket boundary after now"),
+    bucket: Optional[str] = Query(None, pattern="^(hour|day|week|month)$", description="Bucket width; default: finest that fits the bucket cap"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Bucketed KPI history for charts.
+    
+    Aggregated in the database per bucket (UTC, weeks start Monday) and
+    returned columnar: ``series[metric] = {"t", "min", "max", "avg",
+    "last", "count"}``.  At most ``SERIES_MAX_BUCKETS`` buckets per metric
+    are returned, however many raw points the range holds.
+    """
+    if end:
+        end = _as_utc(end)
+    else:
+        # not now(): a boundary keeps the cache key and ETag stable between
+        # polls, and writers bump the version when new points arrive
+        end = bucket_ceil(datetime.now(timezone.utc), bucket or "hour").replace(tzinfo=timezone.utc)
+    start = _as_utc(start) if start else end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="`start` must be before `end`")
+    metrics = list(dict.fromkeys(metrics))
+    if len(metrics) > settings.SERIES_MAX_METRICS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.SERIES_MAX_METRICS} metrics per request",
+        )
+
+    if bucket is None:
+        bucket = finest_bucket(start, end, settings.SERIES_MAX_BUCKETS)
+    if bucket is None or bucket_count(start, end, bucket) > settings.SERIES_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range too long for `{bucket or 'month'}` buckets "
+                   f"(max {settings.SERIES_MAX_BUCKETS}); use a coarser bucket or a shorter range",
+        )
+
+    return await cached_json(
+        request, "kpis-series", company_id,
+        {"metrics": metrics, "start": start, "end": end, "bucket": bucket},
+        lambda: _kpi_series_payload(db, company_id, metrics, start, end, bucket),
+        watermark=lambda: _kpi_watermark(db, company_id),
+    )
+
+
+@router.get("/kpis/export")
+async def export_kpis(
+    company_id: UUID,
+    format: str = Query("csv", pattern="^(csv|parquet|arrow)$", description="csv, parquet or arrow (IPC stream)"),
+    metrics: Optional[List[str]] = Query(None, description="Metric names (repeat the parameter); default: all"),
+    start: Optional[datetime] = Query(None, description="Range start (inclusive)"),
+    end: Optional[datetime] = Query(None, description="Range end (exclusive)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Full raw KPI history of a company as a file download.
+
+    Rows are read from a server-side cursor and encoded batch by batch while
+    the response streams, so memory use does not grow with the row count.
+    """
+    start = _as_utc(start) if start else None
+    end = _as_utc(end) if end else None
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="`start` must be before `end`")
+    if await db.get(Company, company_id) is None:
+        raise HTTPException(status_code=404, detail="Company not found")
+    if format != "csv":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail=f"`{format}` export requires pyarrow")
+
+    stmt = export_statement(company_id, metrics, start, end)
+    archived = archive_batches(company_id, COLUMNS, metrics, start, end)
+
+    # the request session is closed before the body streams; use our own
+    async def _body():
+        async with AsyncSessionLocal() as session:
+            async for chunk in stream_export(session, stmt, format, archived):
+                yield chunk
+
+    media_type, extension = FORMATS[format]
+    return StreamingResponse(
+        _body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="kpis-{company_id}.{extension}"'},
+    )
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+async def _kpi_series_payload(
+    db: AsyncSession,
+    company_id: UUID,
+    metrics: List[str],
+    start: datetime,
+    end: datetime,
+    bucket: str,
+) -> Dict[str, Any]:
+    return {
+        "company_id": str(company_id),
+        "bucket": bucket,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "series": await load_series(db, company_id, metrics, start, end, bucket),
+    }
+
+
+@router.get("/kpis/sync/{sync_id}")
+async def kpi_sync_progress(sync_id: str):
+    """Progress of a fanned-out KPI sync; ``latest`` for the newest one.
+
+    ``total`` sources, how many are ``done`` / ``failed`` so far, the row
+    counts loaded and the per-source ``errors``.
+    """
+    try:
+        progress = await kpi_sync.load_progress(sync_id)
+    except redis.RedisError as exc:
+        logger.warning("KPI sync progress unavailable: %s", exc)
+        raise HTTPException(status_code=503, detail="Sync progress unavailable")
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Sync not found")
+    return progress
+
+
 @router.post("/ai/recommendation", status_code=status.HTTP_202_ACCEPTED)
 async def ai_recommendation(
     company_id: UUID,
@@ -358,13 +427,18 @@ async def get_ai_status(company_id: UUID):
     }
 
 
-@router.get("/news")
+@router.get("/news", response_model=NewsPage)
 async def latest_news(
+    request: Request,
     limit: int = Query(20, ge=1, le=100, description="Number of news items to return"),
     source: Optional[str] = Query(None, description="Filter by news source"),
     hours: Optional[int] = Query(None, ge=1, le=168, description="Get news from last N hours"),
-    search: Optional[str] = Query(None, description="Search in title and description"),
-    impact_level: Optional[str] = Query(None, regex="^(critical|high|medium)$", description="Filter by impact level"),
+    search: Optional[str] = Query(None, description="Full-text search in title and description (prefix match, ranked)"),
+    impact_level: Optional[str] = Query(None, pattern="^(critical|high|medium)$", description="Filter by impact level"),
+    opportunity_risk: Optional[str] = Query(None, pattern="^(opportunity|risk|both)$", description="Filter by opportunity/risk classification"),
+    sector: Optional[str] = Query(None, description="Only items affecting this sector, e.g. `financial_services`"),
+    region: Optional[str] = Query(None, description="Only items affecting this region, e.g. `europe`"),
+    cursor: Optional[str] = Query(None, description="Opaque `next_cursor` of the previous page; not combinable with `search`"),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -373,102 +447,243 @@ async def latest_news(
     Enhanced with:
     - Source filtering
     - Time-based filtering
-    - Search functionality
-    - Impact level filtering
-    - Pagination support
+    - Ranked full-text search with highlighted ``snippet``s
+    - Impact level, opportunity/risk, sector and region filtering
+    - Keyset pagination on ``(published_at, id)`` via ``cursor``
+    - ETag / If-None-Match support (304 when nothing changed)
+
+    Search results are the best ``limit`` matches, a single page: ``cursor``
+    is rejected with ``search``.  ``total_count`` is ``null`` unless the
+    only filter is ``source``.
     """
+    if cursor and search:
+        raise HTTPException(
+            status_code=400,
+            detail="`cursor` cannot be combined with `search` (ranked results are a single page)",
+        )
+    try:
+        after = _decode_news_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    since = None
+    if hours:
+        # a whole-minute cutoff is part of the cache key: the ETag stays
+        # stable between polls, and moves on as items age out of the window
+        since = datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(hours=hours)
+
+    return await cached_json(
+        request, "news", NEWS_SCOPE,
+        {
+            "limit": limit, "source": source, "since": since,
+            "search": search, "impact_level": impact_level,
+            "opportunity_risk": opportunity_risk, "sector": sector, "region": region,
+            "cursor": cursor,
+        },
+        lambda: _news_payload(
+            db, limit, source, since, search, impact_level, after,
+            opportunity_risk=opportunity_risk, sector=sector, region=region,
+        ),
+        watermark=lambda: _news_watermark(db),
+    )
+
+
+def _encode_news_cursor(published_at: datetime, news_id: UUID) -> str:
+    raw = f"{published_at.isoformat()}|{news_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_news_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        published_at, news_id = raw.split("|", 1)
+        return datetime.fromisoformat(published_at), UUID(news_id)
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError("malformed cursor") from exc
+
+
+async def _news_watermark(db: AsyncSession) -> str:
+    latest, count = (
+        await db.execute(select(func.max(News.published_at), func.count(News.id)))
+    ).one()
+    return f"{latest}:{count}"
+
+
+async def _news_payload(
+    db: AsyncSession,
+    limit: int,
+    source: Optional[str],
+    since: Optional[datetime],
+    search: Optional[str],
+    impact_level: Optional[str],
+    after: Optional[Tuple[datetime, UUID]] = None,
+    *,
+    opportunity_risk: Optional[str] = None,
+    sector: Optional[str] = None,
+    region: Optional[str] = None,
+) -> Dict[str, Any]:
+    dialect_name = db.get_bind().dialect.name
     stmt = select(News)
     
     # Apply filters
     if source:
         stmt = stmt.where(News.source == source)
     
-    if hours:
-        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
-        stmt = stmt.where(News.published_at >= cutoff_time)
+    if since:
+        stmt = stmt.where(News.published_at >= since)
     
+    # Structured intel columns (indexed; JSON arrays via GIN on PostgreSQL)
+    if impact_level:
+        stmt = stmt.where(News.impact_level == impact_level)
+    if opportunity_risk:
+        stmt = stmt.where(News.opportunity_risk == opportunity_risk)
+    if sector:
+        stmt = stmt.where(array_contains(News.sectors_affected, sector, dialect_name))
+    if region:
+        stmt = stmt.where(array_contains(News.geo_regions, region, dialect_name))
+    
+    # Facet + totals come from the maintained counters; an exact total is
+    # only available when no filter other than ``source`` is applied.
+    sources_summary = await load_source_counts(db)
+    total_count = None
+    if not (since or search or impact_level or opportunity_risk or sector or region):
+        total_count = (
+            sources_summary.get(source, 0) if source else sum(sources_summary.values())
+        )
+
+    # Full-text search returns the best ``limit`` matches by relevance (no
+    # cursor); without an index it falls back to the ILIKE scan below.
+    ranked = None
     if search:
-        search_pattern = f"%{search}%"
-        stmt = stmt.where(
-            or_(
-                News.title.ilike(search_pattern),
-                News.description.ilike(search_pattern),
+        await schema.ensure_loaded(db)
+        ranked = ranked_search(stmt, search, dialect_name)
+        if ranked is None:
+            search_pattern = f"%{search}%"
+            stmt = stmt.where(
+                or_(
+                    News.title.ilike(search_pattern),
+                    News.description.ilike(search_pattern),
+                )
             )
+
+    next_cursor = None
+    if ranked is not None:
+        rows = (await db.execute(ranked.limit(limit))).all()
+    else:
+        # Keyset pagination: one indexed range scan, one extra row to detect more
+        if after:
+            stmt = stmt.where(tuple_(News.published_at, News.id) < tuple_(*after))
+        result = await db.execute(
+            stmt.order_by(News.published_at.desc(), News.id.desc()).limit(limit + 1)
         )
-    
-    if impact_level:
-        # Filter by impact level in title (for AI-generated news)
-        if impact_level == "critical":
-            stmt = stmt.where(News.title.contains("[CRITICAL]"))
-        elif impact_level == "high":
-            stmt = stmt.where(News.title.contains("[HIGH]"))
-        elif impact_level == "medium":
-            stmt = stmt.where(News.title.contains("[MEDIUM]"))
-    
-    count_stmt = select(func.count()).select_from(stmt.subquery())
-    total_count = await db.scalar(count_stmt)
-    
-    # Apply ordering and limit
-    result = await db.execute(
-        stmt.order_by(News.published_at.desc()).limit(limit)
-    )
-    news_items = result.scalars().all()
+        rows = [(n, None, None) for n in result.scalars().all()]
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1][0]
+            next_cursor = _encode_news_cursor(last.published_at, last.id)
     
     # Format response
     formatted_news = []
-    for n in news_items:
-        news_data = {
-            "id": n.id,
-            "title": n.title,
-            "url": n.url or "",
-            "source": n.source,
-            "published_at": n.published_at.isoformat() if hasattr(n.published_at, 'isoformat') else str(n.published_at),
-            "description": n.description or ""
-        }
+    for n, relevance, snippet in rows:
+        news_data = _news_item(n)
+        news_data["url"] = news_data["url"] or ""
+        news_data["description"] = news_data["description"] or ""
+        if ranked is not None:
+            news_data["relevance"] = float(relevance)
+            news_data["snippet"] = snippet
         
-        # Extract impact level and type from AI-generated news
-        if n.source == "OpenAI":
-            if "[CRITICAL]" in n.title:
-                news_data["impact_level"] = "critical"
-            elif "[HIGH]" in n.title:
-                news_data["impact_level"] = "high"
-            elif "[MEDIUM]" in n.title:
-                news_data["impact_level"] = "medium"
-            
-            if "[OPPORTUNITY]" in n.title:
-                news_data["opportunity_type"] = "opportunity"
-            elif "[RISK]" in n.title:
-                news_data["opportunity_type"] = "risk"
+        if n.impact_level:
+            news_data["impact_level"] = n.impact_level
+        if n.opportunity_risk:
+            news_data["opportunity_type"] = n.opportunity_risk
+        if n.sectors_affected:
+            news_data["sectors_affected"] = n.sectors_affected
+        if n.geo_regions:
+            news_data["geo_regions"] = n.geo_regions
         
         formatted_news.append(news_data)
     
-    # Get news sources summary
-    sources_stmt = select(News.source, func.count(News.id).label("count")).group_by(News.source)
-    sources_summary = (await db.execute(sources_stmt)).all()
-    
     return {
         "items": formatted_news,
         "count": len(formatted_news),
         "total_count": total_count,
         "limit": limit,
-        "sources": {source: count for source, count in sources_summary},
+        "next_cursor": next_cursor,
+        "sources": sources_summary,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
 
 
 @router.get("/stats")
 async def get_dashboard_stats(
+    request: Request,
     company_id: Optional[UUID] = None,
+    exact: bool = Query(False, description="Exact counts and per-client WebSocket detail (full scans)"),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Get dashboard statistics and system health.
     
-    New endpoint for monitoring dashboard usage and health.
+    Served from a snapshot refreshed in the background (approximate
+    counts, aggregated WebSocket metrics); ``exact=true`` computes
+    everything on the spot.  ``company_stats.total_kpis`` comes from the
+    monthly rollup here, so it also counts archived rows.
     """
+    if exact:
+        return await cached_json(
+            request, "stats", None, {"company_id": company_id},
+            lambda: _exact_dashboard_stats(db, company_id),
+            ttl=settings.DASHBOARD_STATS_CACHE_TTL,
+            etag=False,  # embeds live WebSocket figures
+        )
+
+    snapshot = await stats_snapshot.get()
+    stats = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "approximate": True,
+        "snapshot": {
+            "generated_at": snapshot["generated_at"],
+            "age_seconds": snapshot["age_seconds"],
+        },
+        "websocket": snapshot["websocket"],
+        "cache": cache_stats(),
+        "warehouse_engines": warehouse_engines.stats(),
+        "database": {"global_stats": snapshot["global_stats"]},
+    }
+    if company_id:
+        stats["database"]["company_stats"] = await _company_stats(db, company_id)
+    return stats
+
+
+async def _company_stats(db: AsyncSession, company_id: UUID) -> Dict[str, Any]:
+    # primary-key range reads of kpi_latest and the monthly rollup (one row
+    # per metric / per metric-month) instead of counting raw kpi rows
+    metrics, latest_kpi = (
+        await db.execute(
+            select(func.count(), func.max(KpiLatest.as_of)).where(
+                KpiLatest.company_id == company_id
+            )
+        )
+    ).one()
+    total_kpis = await db.scalar(
+        select(func.coalesce(func.sum(KpiRollupMonth.count), 0)).where(
+            KpiRollupMonth.company_id == company_id
+        )
+    )
+    return {
+        "company_id": str(company_id),
+        "total_kpis": total_kpis,
+        "metrics": metrics,
+        "latest_kpi_update": latest_kpi.isoformat() if latest_kpi else None,
+    }
+
+
+async def _exact_dashboard_stats(db: AsyncSession, company_id: Optional[UUID]) -> Dict[str, Any]:
     stats = {
         "timestamp": datetime.now(timezone.utc).isoformat(),
+        "approximate": False,
         "websocket": manager.get_stats(),
+        "cache": cache_stats(),
+        "warehouse_engines": warehouse_engines.stats(),
         "database": {}
     }
     
@@ -489,22 +704,7 @@ async def get_dashboard_stats(
         }
     
     # Global statistics
-
-    total_companies = await db.scalar(select(func.count(Company.id)))
-    total_kpis = await db.scalar(select(func.count(Kpi.id)))
-    total_news = await db.scalar(select(func.count(News.id)))
-    recent_news = await db.scalar(
-        select(func.count(News.id)).where(
-            News.published_at >= datetime.now(timezone.utc) - timedelta(hours=24)
-        )
-    )
-    
-    stats["database"]["global_stats"] = {
-        "total_companies": total_companies,
-        "total_kpis": total_kpis,
-        "total_news": total_news,
-        "news_last_24h": recent_news
-    }
+    stats["database"]["global_stats"] = await exact_counts(db)
     
     return stats
 
@@ -7,7 +7,12 @@ from sqlalchemy import select
 
 from ..core.database import get_db
 from ..models.company import Company
-from ..models.kpi import Kpi, KpiType
+from ..models.kpi import KpiType
+from ..services import kpi_events
+from ..services.dashboard_cache import bump_version
+from ..services.kpi_latest import apply_kpi_writes
+from ..services.kpi_rollup import apply_rollup_writes
+from ..services.kpi_upsert import upsert_kpis
 from .auth import current_user_id
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
@@ -41,15 +46,24 @@ async def ingest_file(
         raise HTTPException(status_code=404, detail="Company not found")
 
     now = dt.datetime.utcnow()
-    for _, row in df.iterrows():
-        await db.execute(
-            Kpi.__table__.insert().values(
-                company_id=company_id,
-                metric=row.label,
-                value=row.value,
-                as_of=now,
-                type=KpiType.OPERATIONAL,
-            )
+    rows = [
+        dict(
+            company_id=company_id,
+            metric=label,
+            value=value,
+            as_of=now,
+            type=KpiType.OPERATIONAL,
         )
+        for label, value in zip(df["label"], df["value"])
+    ]
+    # one batched upsert; a label repeated in the file keeps its last value
+    result = await db.run_sync(lambda s: upsert_kpis(s.connection(), rows))
+
+    # same transaction: keep ``kpi_latest`` and the rollups in step with the raw rows
+    await db.run_sync(lambda s: apply_kpi_writes(s.connection(), result.changed))
+    await db.run_sync(lambda s: apply_rollup_writes(s.connection(), result.changed))
     await db.commit()
+    await bump_version([company_id])
+    # live tiles of connected dashboards
+    await kpi_events.publish(kpi_events.collect({}, result.changed))
     return {"rows": len(df)}
@@ -0,0 +1,204 @@
+"""
+Per-company dashboard response cache in Redis with versioned keys.
+
+KPI data only changes when a writer (``kpi_etl.run``, ``/ingest/file``)
+commits, so readers cache the serialised JSON bytes under a key that embeds
+the company's *data version*.  Writers bump that version after commit and
+every older entry simply stops being addressed (and expires via TTL).
+
+The same version doubles as the response ``ETag``: a poll carrying a
+matching ``If-None-Match`` gets a ``304`` without touching the database,
+serialising or transferring the body.
+
+Keys
+----
+- ``dashboard-cache:version:<scope>``  – write timestamp (ns), scope = company
+  id, ``news`` or ``global`` (bumped by every writer, used by cross-company
+  routes).  Timestamps rather than counters keep ETags unique even if Redis
+  is flushed.
+- ``dashboard-cache:<route>:<scope>:v<version>:<params-digest>`` – JSON bytes
+
+Send ``X-Cache-Bypass: 1`` to skip the cache; every response carries an
+``X-Cache`` header (``HIT`` / ``MISS`` / ``BYPASS``).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Mapping, Optional
+from uuid import UUID
+
+import redis
+import redis.asyncio as aioredis
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.core.settings import settings
+from app.utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = "dashboard-cache"
+GLOBAL_SCOPE = "global"
+NEWS_SCOPE = "news"
+BYPASS_HEADER = "X-Cache-Bypass"
+
+# bytes in / bytes out – cached bodies are returned verbatim
+_aredis = aioredis.from_url(settings.REDIS_URL)
+# Celery writers are synchronous
+_redis = redis.Redis.from_url(settings.REDIS_URL)
+
+_stats: Dict[str, int] = {
+    "hits": 0, "misses": 0, "not_modified": 0, "bypass": 0, "errors": 0,
+}
+
+
+def _version_key(scope: Any) -> str:
+    return f"{_PREFIX}:version:{scope}"
+
+
+def _digest(params: Mapping[str, Any]) -> str:
+    return hashlib.sha1(
+        json.dumps(jsonable_encoder(params), sort_keys=True).encode()
+    ).hexdigest()[:16]
+
+
+def _entry_key(route: str, scope: Any, version: str, digest: str) -> str:
+    return f"{_PREFIX}:{route}:{scope}:v{version}:{digest}"
+
+
+def _etag(seed: str) -> str:
+    return 'W/"%s"' % hashlib.sha1(seed.encode()).hexdigest()[:20]
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip() for t in header.split(",")}
+    # weak comparison: W/"x" and "x" match
+    return "*" in tags or etag in tags or etag[2:] in tags
+
+
+def encode(payload: Any) -> bytes:
+    """Serialise a route payload to compact JSON bytes (orjson when available)."""
+    return dumps(payload)
+
+
+# --------------------------------------------------------------------------- #
+# Writers
+# --------------------------------------------------------------------------- #
+def _scopes(company_ids: Iterable[Any], extra: Iterable[str]) -> set:
+    return {str(cid) for cid in company_ids} | set(extra) | {GLOBAL_SCOPE}
+
+
+def bump_version_sync(company_ids: Iterable[Any] = (), scopes: Iterable[str] = ()) -> None:
+    """Invalidate cached responses of ``company_ids`` (call *after* commit).
+
+    ``scopes`` names additional non-company scopes, e.g. :data:`NEWS_SCOPE`.
+    """
+    version = time.time_ns()
+    try:
+        pipe = _redis.pipeline(transaction=False)
+        for scope in _scopes(company_ids, scopes):
+            pipe.set(_version_key(scope), version)
+        pipe.execute()
+    except redis.RedisError as exc:
+        logger.warning("Dashboard cache version bump failed: %s", exc)
+
+
+async def bump_version(company_ids: Iterable[Any] = (), scopes: Iterable[str] = ()) -> None:
+    """Async twin of :func:`bump_version_sync` for request handlers."""
+    version = time.time_ns()
+    try:
+        pipe = _aredis.pipeline(transaction=False)
+        for scope in _scopes(company_ids, scopes):
+            pipe.set(_version_key(scope), version)
+        await pipe.execute()
+    except redis.RedisError as exc:
+        logger.warning("Dashboard cache version bump failed: %s", exc)
+
+
+# --------------------------------------------------------------------------- #
+# Readers
+# --------------------------------------------------------------------------- #
+async def cached_json(
+    request: Request,
+    route: str,
+    scope: Optional[UUID | str],
+    params: Mapping[str, Any],
+    build: Callable[[], Awaitable[Any]],
+    *,
+    ttl: Optional[int] = None,
+    watermark: Optional[Callable[[], Awaitable[Any]]] = None,
+    etag: bool = True,
+) -> Response:
+    """Serve ``route`` from cache or run ``build()`` and store its JSON.
+
+    ``scope`` selects the data version (company id, :data:`NEWS_SCOPE`, or
+    ``None`` for the global version).  With ``etag`` enabled the version is
+    also sent as a weak ``ETag`` and a matching ``If-None-Match`` short-cuts
+    to ``304``.  When Redis is unreachable, ``watermark()`` – a cheap DB
+    query such as ``max(as_of)`` plus a row count – stands in for the
+    version.  Exceptions raised by ``build`` (e.g. 404s) propagate and
+    nothing is cached.
+    """
+    scope = str(scope) if scope is not None else GLOBAL_SCOPE
+
+    if not settings.DASHBOARD_CACHE_ENABLED or request.headers.get(BYPASS_HEADER):
+        _stats["bypass"] += 1
+        return _response(encode(await build()), "BYPASS")
+
+    digest = _digest(params)
+    key = tag = body = None
+    try:
+        version = (await _aredis.get(_version_key(scope)) or b"0").decode()
+        key = _entry_key(route, scope, version, digest)
+        tag = _etag(key) if etag else None
+        if tag and _not_modified(request, tag):
+            _stats["not_modified"] += 1
+            return _response(None, "HIT", tag)
+        body = await _aredis.get(key)
+    except redis.RedisError as exc:
+        logger.warning("Dashboard cache read failed: %s", exc)
+        _stats["errors"] += 1
+        if etag and watermark is not None:
+            tag = _etag(f"{route}:{scope}:{await watermark()}:{digest}")
+            if _not_modified(request, tag):
+                _stats["not_modified"] += 1
+                return _response(None, "HIT", tag)
+
+    if body is not None:
+        _stats["hits"] += 1
+        return _response(body, "HIT", tag)
+
+    _stats["misses"] += 1
+    body = encode(await build())
+    if key is not None:
+        try:
+            await _aredis.set(key, body, ex=ttl or settings.DASHBOARD_CACHE_TTL)
+        except redis.RedisError as exc:
+            logger.warning("Dashboard cache write failed: %s", exc)
+            _stats["errors"] += 1
+    return _response(body, "MISS", tag)
+
+
+def _response(body: Optional[bytes], status: str, etag: Optional[str] = None) -> Response:
+    headers = {"X-Cache": status}
+    if etag:
+        # let browsers keep the body but always revalidate
+        headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+    if body is None:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of this process."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_ratio": round(_stats["hits"] / lookups, 4) if lookups else None,
+    }
@@ -0,0 +1,467 @@
+"""
+Cold-tier archive of raw KPI rows in Parquet.
+
+:func:`archive_old` (Celery task ``app.services.kpi_archive.archive``) moves
+``kpi`` rows older than ``KPI_ARCHIVE_AFTER_DAYS`` out of the database, per
+company, into hive-partitioned files under ``KPI_ARCHIVE_DIR``::
+
+    company_id=<uuid>/year=2023/month=04/part-<run>.parquet
+
+Each run adds one file per company-month (sorted by ``as_of``).  The rows
+are locked as they are read, and only the rows actually written are
+deleted from ``kpi`` once their files are complete – a row a concurrent
+writer inserts below the cutoff in the meantime stays in ``kpi``.  The files
+are removed again if that delete does not commit.  Before the commit, the
+run's cutoff is recorded in ``company_id=<uuid>/_archived_before``
+(:func:`archived_before`, put back if the commit fails): the warehouse
+still has those rows, and the ETL drops them (:func:`drop_archived`)
+instead of upserting them back into ``kpi``, whose unique key cannot see
+the archived copies.
+
+Readers scan the archive with ``pyarrow.dataset`` over a memory-mapped
+local filesystem, projecting only the columns they need and pushing the
+``metric`` / ``as_of`` predicates (and the matching ``year``/``month``
+directories) down into the scan:
+
+- :func:`archive_batches` feeds ``/dashboard/kpis/export`` (archived rows
+  first, then the hot table);
+- :func:`archive_series` is merged into raw-bucket ``/dashboard/kpis/series``
+  reads and into every rollup recompute, so day/week/month buckets keep
+  covering archived rows even when a late write lands in an archived
+  bucket;
+- :func:`archive_batches` also tops up sparklines whose hot history is
+  shorter than ``SPARKLINE_MAX_RAW_POINTS``;
+- :func:`archived_companies`, :func:`archive_spans` and :func:`archive_latest`
+  let ``rebuild_rollups`` / ``rebuild_latest`` rebuild from hot and
+  archived rows alike.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery_app
+from app.core.database import get_engine
+from app.core.settings import settings
+from app.models import Kpi, KpiType
+
+logger = logging.getLogger(__name__)
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.string()),
+        ("metric", pa.string()),
+        ("as_of", pa.timestamp("us", tz="UTC")),
+        ("value", pa.float64()),
+        ("target", pa.float64()),
+        ("type", pa.string()),
+        ("unit", pa.string()),
+        ("description", pa.string()),
+    ])
+
+
+def archive_root() -> Path:
+    return Path(settings.KPI_ARCHIVE_DIR).resolve()
+
+
+def company_dir(company_id: UUID) -> Path:
+    return archive_root() / f"company_id={company_id}"
+
+
+def _utc(ts: dt.datetime) -> dt.datetime:
+    # SQLite hands back naive datetimes; they are stored as UTC
+    return ts.replace(tzinfo=dt.timezone.utc) if ts.tzinfo is None else ts.astimezone(dt.timezone.utc)
+
+
+# --------------------------------------------------------------------------- #
+# Writing
+# --------------------------------------------------------------------------- #
+class _MonthWriter:
+    """Parquet file of one company-month, renamed into place on close."""
+
+    def __init__(self, company_id: UUID, month: Tuple[int, int], run: str) -> None:
+        import pyarrow.parquet as pq
+
+        year, mon = month
+        directory = company_dir(company_id) / f"year={year}" / f"month={mon:02d}"
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"part-{run}.parquet"
+        self._tmp = directory / f".part-{run}.parquet.tmp"
+        self._writer = pq.ParquetWriter(str(self._tmp), _schema(), compression="zstd")
+
+    def write(self, rows: List[tuple]) -> None:
+        import pyarrow as pa
+
+        schema = _schema()
+        columns = list(zip(*rows))
+        self._writer.write_batch(pa.RecordBatch.from_arrays(
+            [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+            schema=schema,
+        ))
+
+    def close(self) -> Path:
+        self._writer.close()
+        os.replace(self._tmp, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        self._writer.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+def archive_company(
+    conn: Connection, company_id: UUID, cutoff: dt.datetime
+) -> Tuple[int, List[Path]]:
+    """Move the company's ``kpi`` rows older than ``cutoff`` into the archive.
+
+    Returns the row count and the files written.  The caller commits; if
+    that fails it must :func:`discard` the files.
+    """
+    stmt = (
+        select(Kpi.id, Kpi.metric, Kpi.as_of, Kpi.value, Kpi.target, Kpi.type, Kpi.unit, Kpi.description)
+        .where(Kpi.company_id == company_id, Kpi.as_of < cutoff)
+        .order_by(Kpi.as_of)
+        # concurrent updates of these rows wait for the delete below
+        .with_for_update()
+        .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    )
+    run = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+    written: List[Path] = []
+    writer: Optional[_MonthWriter] = None
+    month: Optional[Tuple[int, int]] = None
+    ids: List[Any] = []
+    try:
+        for partition in conn.execute(stmt).partitions():
+            pending: List[tuple] = []
+            for id_, metric, as_of, value, target, kpi_type, unit, description in partition:
+                as_of = _utc(as_of)
+                if (as_of.year, as_of.month) != month:
+                    if pending:
+                        writer.write(pending)
+                        pending = []
+                    if writer is not None:
+                        written.append(writer.close())
+                    month = (as_of.year, as_of.month)
+                    writer = _MonthWriter(company_id, month, run)
+                pending.append((
+                    str(id_), metric, as_of, value, target,
+                    kpi_type.value if kpi_type is not None else None, unit, description,
+                ))
+            if pending:
+                writer.write(pending)
+            ids.extend(row[0] for row in partition)
+        if writer is not None:
+            written.append(writer.close())
+            writer = None
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        discard(written)
+        raise
+
+    table = Kpi.__table__
+    for i in range(0, len(ids), settings.EXPORT_BATCH_SIZE):
+        conn.execute(
+            delete(table).where(
+                table.c.company_id == company_id,
+                table.c.as_of < cutoff,
+                table.c.id.in_(ids[i:i + settings.EXPORT_BATCH_SIZE]),
+            )
+        )
+    return len(ids), written
+
+
+def discard(paths: Sequence[Path]) -> None:
+    for path in paths:
+        Path(path).unlink(missing_ok=True)
+
+
+def archive_old(now: Optional[dt.datetime] = None) -> int:
+    """Archive every company's rows older than ``KPI_ARCHIVE_AFTER_DAYS``."""
+    if settings.KPI_ARCHIVE_AFTER_DAYS <= 0:
+        return 0
+    cutoff = (now or dt.datetime.now(dt.timezone.utc)) - dt.timedelta(
+        days=settings.KPI_ARCHIVE_AFTER_DAYS
+    )
+    engine = get_engine()
+    with Session(engine) as session:
+        company_ids = session.execute(
+            select(Kpi.company_id).where(Kpi.as_of < cutoff).distinct()
+        ).scalars().all()
+
+    total = 0
+    for company_id in company_ids:
+        with Session(engine) as session:
+            count, paths = archive_company(session.connection(), company_id, cutoff)
+            previous = archived_before(company_id)
+            try:
+                mark_archived(company_id, cutoff)
+                session.commit()
+            except BaseException:
+                _write_mark(company_id, previous)
+                discard(paths)
+                raise
+        logger.info("Archived %d KPI rows of %s into %d files", count, company_id, len(paths))
+        total += count
+    return total
+
+
+def _marker(company_id: UUID) -> Path:
+    # leading underscore: skipped by pyarrow dataset discovery
+    return company_dir(company_id) / "_archived_before"
+
+
+def mark_archived(company_id: UUID, cutoff: dt.datetime) -> None:
+    """Record that the company's rows before ``cutoff`` live in the archive.
+
+    The mark only ever moves forward.
+    """
+    cutoff = _utc(cutoff)
+    current = archived_before(company_id)
+    if current is None or current < cutoff:
+        _write_mark(company_id, cutoff)
+
+
+def _write_mark(company_id: UUID, cutoff: Optional[dt.datetime]) -> None:
+    path = _marker(company_id)
+    if cutoff is None:
+        path.unlink(missing_ok=True)
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(cutoff.isoformat())
+    os.replace(tmp, path)
+
+
+@celery_app.task(name="app.services.kpi_archive.archive")
+def archive() -> int:
+    """Move raw KPI rows past ``KPI_ARCHIVE_AFTER_DAYS`` into the Parquet archive."""
+    return archive_old()
+
+
+# --------------------------------------------------------------------------- #
+# Reading
+# --------------------------------------------------------------------------- #
+def has_archive(company_id: UUID) -> bool:
+    return company_dir(company_id).is_dir()
+
+
+def archived_before(company_id: UUID) -> Optional[dt.datetime]:
+    """Cutoff of the company's last archive run, if any."""
+    try:
+        return dt.datetime.fromisoformat(_marker(company_id).read_text().strip())
+    except FileNotFoundError:
+        return None
+
+
+def drop_archived(
+    rows: Sequence[Mapping[str, Any]], marks: Dict[str, Optional[dt.datetime]]
+) -> List[Mapping[str, Any]]:
+    """``rows`` without those older than their company's archive mark.
+
+    ``marks`` caches :func:`archived_before` per company id across calls.
+    """
+    kept = []
+    for row in rows:
+        cid = str(row["company_id"])
+        if cid not in marks:
+            marks[cid] = archived_before(UUID(cid))
+        mark = marks[cid]
+        if mark is None or _utc(row["as_of"]) >= mark:
+            kept.append(row)
+    return kept
+
+
+def archived_companies() -> List[UUID]:
+    """Companies with an archive directory."""
+    root = archive_root()
+    if not root.is_dir():
+        return []
+    return [
+        UUID(path.name.split("=", 1)[1])
+        for path in root.iterdir()
+        if path.is_dir() and path.name.startswith("company_id=")
+    ]
+
+
+def _month_bound(field_year, field_month, ts: dt.datetime, op: str):
+    year, month = ts.year, ts.month
+    if op == ">=":
+        return (field_year > year) | ((field_year == year) & (field_month >= month))
+    return (field_year < year) | ((field_year == year) & (field_month <= month))
+
+
+def _filter(
+    metrics: Optional[Sequence[str]],
+    start: Optional[dt.datetime],
+    end: Optional[dt.datetime],
+):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    ts_type = pa.timestamp("us", tz="UTC")
+    expr = None
+
+    def _and(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+
+    if metrics:
+        _and(ds.field("metric").isin(list(metrics)))
+    year, month = ds.field("year"), ds.field("month")
+    if start is not None:
+        start = _utc(start)
+        _and(_month_bound(year, month, start, ">="))
+        _and(ds.field("as_of") >= pa.scalar(start, type=ts_type))
+    if end is not None:
+        end = _utc(end)
+        _and(_month_bound(year, month, end, "<="))
+        _and(ds.field("as_of") < pa.scalar(end, type=ts_type))
+    return expr
+
+
+def scanner(
+    company_id: UUID,
+    columns: Sequence[str],
+    metrics: Optional[Sequence[str]] = None,
+    start: Optional[dt.datetime] = None,
+    end: Optional[dt.datetime] = None,
+    batch_size: Optional[int] = None,
+):
+    """Memory-mapped, projected and filtered scanner over one company's archive.
+
+    Returns ``None`` when the company has nothing archived.
+    """
+    if not has_archive(company_id):
+        return None
+    import pyarrow.dataset as ds
+    from pyarrow.fs import LocalFileSystem
+
+    dataset = ds.dataset(
+        str(company_dir(company_id)),
+        format="parquet",
+        partitioning="hive",
+        filesystem=LocalFileSystem(use_mmap=True),
+        exclude_invalid_files=True,
+    )
+    return dataset.scanner(
+        columns=list(columns),
+        filter=_filter(metrics, start, end),
+        batch_size=batch_size or settings.EXPORT_BATCH_SIZE,
+    )
+
+
+def archive_batches(
+    company_id: UUID,
+    columns: Sequence[str],
+    metrics: Optional[Sequence[str]] = None,
+    start: Optional[dt.datetime] = None,
+    end: Optional[dt.datetime] = None,
+) -> Iterator[List[tuple]]:
+    """Archived rows as lists of ``columns`` tuples, one list per scan batch."""
+    scan = scanner(company_id, columns, metrics, start, end)
+    if scan is None:
+        return
+    for batch in scan.to_batches():
+        if batch.num_rows:
+            yield list(zip(*(batch.column(c).to_pylist() for c in columns)))
+
+
+def archive_series(
+    company_id: UUID,
+    metrics: Sequence[str],
+    start: dt.datetime,
+    end: dt.datetime,
+    bucket: str,
+) -> List[Dict[str, Any]]:
+    """Per ``(metric, bucket)`` aggregates of archived rows, shaped like
+    :func:`app.services.kpi_series.series_statement` rows (buckets naive UTC)."""
+    scan = scanner(company_id, ("metric", "as_of", "value"), metrics, start, end)
+    if scan is None:
+        return []
+    import pyarrow.compute as pc
+
+    table = scan.to_table()
+    if not table.num_rows:
+        return []
+    table = table.append_column(
+        "bucket",
+        pc.floor_temporal(table["as_of"], unit=bucket, week_starts_monday=True),
+    ).sort_by([("as_of", "ascending")])
+    grouped = table.group_by(["metric", "bucket"], use_threads=False).aggregate([
+        ("value", "min"), ("value", "max"), ("value", "sum"),
+        ("value", "count"), ("value", "last"), ("as_of", "max"),
+    ])
+    rows = []
+    for r in grouped.to_pylist():
+        rows.append({
+            "metric": r["metric"],
+            "bucket": r["bucket"].replace(tzinfo=None),
+            "min": r["value_min"],
+            "max": r["value_max"],
+            "sum": r["value_sum"],
+            "count": r["value_count"],
+            "avg": r["value_sum"] / r["value_count"],
+            "last": r["value_last"],
+            "last_as_of": r["as_of_max"],
+        })
+    return rows
+
+
+def archive_spans(company_id: UUID) -> List[Tuple[str, dt.datetime, dt.datetime]]:
+    """``(metric, oldest as_of, newest as_of)`` of each archived metric."""
+    scan = scanner(company_id, ("metric", "as_of"))
+    if scan is None:
+        return []
+    table = scan.to_table()
+    if not table.num_rows:
+        return []
+    grouped = table.group_by("metric", use_threads=False).aggregate(
+        [("as_of", "min"), ("as_of", "max")]
+    )
+    return [(r["metric"], r["as_of_min"], r["as_of_max"]) for r in grouped.to_pylist()]
+
+
+_LATEST_COLUMNS = ("metric", "as_of", "value", "target", "type", "unit", "description")
+
+
+def archive_latest(company_id: UUID) -> Dict[str, List[Dict[str, Any]]]:
+    """Newest two archived points per metric, newest first, with the
+    descriptive columns (``kpi_latest`` candidates)."""
+    scan = scanner(company_id, _LATEST_COLUMNS)
+    if scan is None:
+        return {}
+    import numpy as np
+    import pyarrow as pa
+
+    top: Dict[str, List[Dict[str, Any]]] = {}
+    for batch in scan.to_batches():
+        if not batch.num_rows:
+            continue
+        table = pa.Table.from_batches([batch]).sort_by(
+            [("metric", "ascending"), ("as_of", "descending")]
+        )
+        # first two rows of every metric run in the sorted batch
+        metric = np.asarray(table["metric"].to_pylist(), dtype=object)
+        first = np.flatnonzero(np.r_[True, metric[1:] != metric[:-1]])
+        second = first + 1
+        second = second[(second < len(metric)) & ~np.isin(second, first)]
+        for row in table.take(np.sort(np.r_[first, second])).to_pylist():
+            if row["type"] is not None:
+                row["type"] = KpiType(row["type"])
+            points = top.setdefault(row["metric"], [])
+            points.append(row)
+            points.sort(key=lambda p: p["as_of"], reverse=True)
+            del points[2:]
+    return top
@@ -1,49 +1,181 @@
 """
 Hourly ETL: pull fresh metrics from Snowflake (or another warehouse)
 and upsert into the local Postgres database.
+
+The beat task :func:`run` fans out as a Celery chord: one
+:func:`sync_source` subtask per extraction source (a company's own
+``snowflake_dsn``, or one company's rows in the shared ``SNOWFLAKE_DSN``)
+on the ``default`` queue, each with its own retries and time limits, and a
+:func:`finalize` callback aggregating the stats.  A slow or failing tenant
+therefore only delays itself, and a large sync spreads over every worker
+while warehouse concurrency stays capped across them (see
+:mod:`app.services.snowflake_connector`).  Progress is kept in Redis (see
+:mod:`app.services.kpi_sync`)::
+
+    celery -A app.core.celery_app call app.services.kpi_etl.run --kwargs='{"full_resync": true}'
+
+Each source only extracts rows past its watermark (see
+:mod:`app.services.kpi_watermark`); ``full_resync`` re-reads everything.
+Rows the Parquet archive already holds are dropped before the upsert (see
+:func:`app.services.kpi_archive.drop_archived`), so they are not counted
+twice by readers that merge archive and hot table.
+Warehouse batches are upserted as they arrive, so memory stays bounded
+whatever the extract size; each source is loaded in one transaction.
 """
-from sqlalchemy.orm import Session
-from sqlalchemy import select, insert, update
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+from celery import chord, group
+from sqlalchemy.orm import Session
 
 from app.core.celery_app import celery_app
 from app.core.database import get_engine
-from app.models import Kpi 
-from app.services.snowflake_connector import query_kpis  # your own helper
+from app.core.settings import settings
+from app.services import kpi_events, kpi_sync
+from app.services.kpi_archive import drop_archived
+from app.services.dashboard_cache import bump_version_sync
+from app.services.kpi_latest import apply_kpi_writes
+from app.services.kpi_rollup import apply_rollup_writes
+from app.services.kpi_upsert import UpsertResult, upsert_kpis
+from app.services.kpi_watermark import advance_watermarks, extract_from, observe
+from app.services.snowflake_connector import extraction_sources, stream_kpis  # your own helper
 
+logger = logging.getLogger(__name__)
 
-@celery_app.task(name="app.services.kpi_etl.run")
-def run() -> int:
+_COUNTS = ("rows", "inserted", "updated", "unchanged")
+
+
+class ExtractError(RuntimeError):
+    """The warehouse query of a source failed."""
+
+
+def load(only: Optional[Sequence[str]] = None, full_resync: bool = False) -> Dict[str, Any]:
     """
-    Return the number of KPI rows written.
+    Upsert the warehouse rows newer than each source's watermark in batches
+    and return the inserted / updated / unchanged counts with the achieved
+    throughput.  Loads every source, or those in ``only``, in this process;
+    ``full_resync`` ignores the watermarks.
     """
+    started = time.perf_counter()
     engine = get_engine()
+    since = {}
+    if not full_resync:
+        with engine.connect() as conn:
+            since = extract_from(conn)
+
+    total = UpsertResult()
+    timings = []
+    newest: Dict[str, Tuple[Any, int]] = {}
+    changes: Dict[Any, Dict[str, Any]] = {}
+    marks: Dict[str, Any] = {}
+    archived = 0
     with Session(engine) as session:
-        rows = query_kpis()  # List[dict]
-        inserted = 0
-        for r in rows:
-            existing_id = session.execute(
-                select(Kpi.id).filter_by(
-                    company_id=r["company_id"], metric=r["metric"], as_of=r["as_of"]
-                )
-            ).scalar_one_or_none()
-
-            if existing_id:
-                session.execute(
-                    update(Kpi)
-                    .where(Kpi.id == existing_id)
-                    .values(value=r["value"])
-                )
-            else:
-                session.execute(
-                    insert(Kpi.__table__).values(
-                        company_id=r["company_id"],
-                        metric=r["metric"],
-                        value=r["value"],
-                        as_of=r["as_of"],
-                    )
-                )
-            inserted += 1
+        conn = session.connection()
+        # sources in parallel; one timing entry per source
+        for source, batch in stream_kpis(since, timings, only):
+            records = batch.to_dict("records")
+            rows = drop_archived(records, marks)
+            archived += len(records) - len(rows)
+            result = upsert_kpis(conn, rows)
+            # keep the dashboard's latest/previous materialisation and the
+            # rollups of the touched buckets in step (unchanged rows touch nothing)
+            apply_kpi_writes(conn, result.changed)
+            apply_rollup_writes(conn, result.changed)
+            total.add(result)
+            kpi_events.collect(changes, result.changed)
+            observe(newest, source, batch["as_of"].max(), len(batch))
 
+        # moves only if the rows above commit, and not for failed sources
+        failed = {t["source"] for t in timings if "error" in t}
+        watermarks = advance_watermarks(
+            conn, {s: mark for s, mark in newest.items() if s not in failed}
+        )
         session.commit()
-    return inserted
+
+    # cached dashboard responses of the touched companies are now stale,
+    # and their live tiles need the new values
+    if changes:
+        bump_version_sync(changes)
+        kpi_events.publish_sync(changes)
+    summary = {
+        **total.summary(),
+        "elapsed": round(time.perf_counter() - started, 3),
+        "full_resync": full_resync,
+        "archived": archived,
+        "sources": len(watermarks),
+        "failed": len(failed),
+    }
+    logger.info("KPI ETL: %s", summary)
+    return {**summary, "extract": timings}
+
+
+@celery_app.task(name="app.services.kpi_etl.run")
+def run(full_resync: bool = False) -> Dict[str, Any]:
+    """Fan the sync out: one :func:`sync_source` per source, then :func:`finalize`."""
+    sources = [source for source, _, _ in extraction_sources()]
+    sync_id = kpi_sync.new_sync_id()
+    kpi_sync.start(sync_id, len(sources), full_resync)
+    if sources:
+        chord(
+            group(
+                sync_source.s(sync_id, source, full_resync).set(queue="default")
+                for source in sources
+            ),
+            finalize.s(sync_id).set(queue="default"),
+        ).apply_async()
+    logger.info("KPI sync %s: %d sources", sync_id, len(sources))
+    return {"sync_id": sync_id, "sources": len(sources)}
+
+
+@celery_app.task(
+    name="app.services.kpi_etl.sync_source",
+    bind=True,
+    soft_time_limit=settings.KPI_SYNC_SOFT_TIME_LIMIT,
+    time_limit=settings.KPI_SYNC_TIME_LIMIT,
+)
+def sync_source(self, sync_id: str, source: str, full_resync: bool = False) -> Dict[str, Any]:
+    """Load one source; retried with backoff, then reported as failed.
+
+    Never raises once retries are exhausted, so the chord callback always
+    runs and one tenant cannot fail the whole sync.
+    """
+    try:
+        summary = load([source], full_resync)
+        errors = [t["error"] for t in summary["extract"] if "error" in t]
+        if errors:
+            raise ExtractError(errors[0])
+    except Exception as exc:
+        retries = self.request.retries
+        if retries < settings.KPI_SYNC_MAX_RETRIES:
+            raise self.retry(
+                exc=exc,
+                countdown=settings.KPI_SYNC_RETRY_DELAY * 2 ** retries,
+                max_retries=settings.KPI_SYNC_MAX_RETRIES,
+            )
+        logger.exception("KPI sync of %s failed after %d retries", source, retries)
+        summary = {"source": source, "error": repr(exc), "retries": retries}
+    else:
+        summary = {"source": source, **summary}
+    kpi_sync.record(sync_id, summary)
+    return summary
+
+
+@celery_app.task(name="app.services.kpi_etl.finalize")
+def finalize(results: List[Dict[str, Any]], sync_id: str) -> Dict[str, Any]:
+    """Chord callback: aggregate the per-source stats of sync ``sync_id``."""
+    loaded = [r for r in results if "error" not in r]
+    summary: Dict[str, Any] = {name: sum(r[name] for r in loaded) for name in _COUNTS}
+    summary.update(
+        sync_id=sync_id,
+        sources=len(results),
+        failed=[{"source": r["source"], "error": r["error"]} for r in results if "error" in r],
+        slowest=max(
+            ({"source": r["source"], "elapsed": r["elapsed"]} for r in loaded),
+            key=lambda r: r["elapsed"],
+            default=None,
+        ),
+    )
+    kpi_sync.finish(sync_id)
+    logger.info("KPI sync %s done: %s", sync_id, summary)
+    return summary
@@ -0,0 +1,91 @@
+"""
+"kpi-changed" events for live dashboard tiles.
+
+Every KPI writer publishes one compact event per touched company on the
+``kpi-changed`` Redis channel *after* it commits::
+
+    {"type": "kpi-changed", "company_id": "…", "metrics": ["churn", "revenue"],
+     "as_of": "2024-06-01T00:00:00+00:00"}
+
+``as_of`` is the newest timestamp written, i.e. the company's new
+watermark.  :class:`app.utils.broadcaster.ConnectionManager` listens on the
+channel and pushes the recomputed tiles of those metrics to the company's
+WebSocket subscribers, so dashboards do not need to poll.
+
+Publishing is best effort: a Redis outage is logged and never fails a write.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Mapping
+from uuid import UUID
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+KPI_CHANNEL = "kpi-changed"
+
+_aredis = aioredis.from_url(settings.REDIS_URL)
+# Celery writers are synchronous
+_redis = redis.Redis.from_url(settings.REDIS_URL)
+
+
+def _utc(ts: dt.datetime) -> dt.datetime:
+    return ts.replace(tzinfo=dt.timezone.utc) if ts.tzinfo is None else ts.astimezone(dt.timezone.utc)
+
+
+def collect(changes: Dict[UUID, Dict[str, Any]], rows: Iterable[Mapping]) -> Dict[UUID, Dict[str, Any]]:
+    """Fold written rows (``company_id``, ``metric``, ``as_of``) into
+    ``{company_id: {"metrics": set, "as_of": newest}}``."""
+    for r in rows:
+        cid = r["company_id"] if isinstance(r["company_id"], UUID) else UUID(str(r["company_id"]))
+        as_of = _utc(r["as_of"])
+        change = changes.setdefault(cid, {"metrics": set(), "as_of": as_of})
+        change["metrics"].add(r["metric"])
+        change["as_of"] = max(change["as_of"], as_of)
+    return changes
+
+
+def events(changes: Mapping[UUID, Mapping[str, Any]]) -> List[str]:
+    """Serialised events of :func:`collect` output, one per company."""
+    return [
+        json.dumps({
+            "type": KPI_CHANNEL,
+            "company_id": str(cid),
+            "metrics": sorted(change["metrics"]),
+            "as_of": change["as_of"].isoformat(),
+        })
+        for cid, change in changes.items()
+    ]
+
+
+def publish_sync(changes: Mapping[UUID, Mapping[str, Any]]) -> None:
+    """Publish the events of ``changes`` (call *after* commit)."""
+    if not changes:
+        return
+    try:
+        pipe = _redis.pipeline(transaction=False)
+        for event in events(changes):
+            pipe.publish(KPI_CHANNEL, event)
+        pipe.execute()
+    except redis.RedisError as exc:
+        logger.warning("KPI change event publish failed: %s", exc)
+
+
+async def publish(changes: Mapping[UUID, Mapping[str, Any]]) -> None:
+    """Async twin of :func:`publish_sync` for request handlers."""
+    if not changes:
+        return
+    try:
+        pipe = _aredis.pipeline(transaction=False)
+        for event in events(changes):
+            pipe.publish(KPI_CHANNEL, event)
+        await pipe.execute()
+    except redis.RedisError as exc:
+        logger.warning("KPI change event publish failed: %s", exc)
@@ -0,0 +1,218 @@
+"""
+Streaming export of a company's raw KPI history.
+
+Rows come from a server-side cursor (``AsyncSession.stream`` with
+``yield_per``) in batches of ``EXPORT_BATCH_SIZE`` and are encoded batch by
+batch, so memory stays flat however many rows are exported:
+
+- ``csv``     – header plus one line per row
+- ``parquet`` – a row group is flushed every ``EXPORT_ROW_GROUP_SIZE`` rows
+- ``arrow``   – Arrow IPC stream, one record batch per cursor batch
+
+Encoded bytes are handed to the caller as soon as the encoder emits them.
+Rows moved to the Parquet archive (:mod:`app.services.kpi_archive`) are
+exported first, followed by the rows still in ``kpi``.
+"""
+from __future__ import annotations
+
+import asyncio
+import csv
+import datetime as dt
+import io
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.settings import settings
+from app.models import Kpi
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+COLUMNS = ("metric", "as_of", "value", "target", "type", "unit")
+
+
+def export_statement(
+    company_id: UUID,
+    metrics: Optional[Sequence[str]],
+    start: Optional[dt.datetime],
+    end: Optional[dt.datetime],
+):
+    stmt = (
+        select(Kpi.metric, Kpi.as_of, Kpi.value, Kpi.target, Kpi.type, Kpi.unit)
+        .where(Kpi.company_id == company_id)
+        .order_by(Kpi.metric, Kpi.as_of)
+        .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    )
+    if metrics:
+        stmt = stmt.where(Kpi.metric.in_(metrics))
+    if start is not None:
+        stmt = stmt.where(Kpi.as_of >= start)
+    if end is not None:
+        stmt = stmt.where(Kpi.as_of < end)
+    return stmt
+
+
+async def _batches(db: AsyncSession, stmt) -> AsyncIterator[List[tuple]]:
+    result = await db.stream(stmt)
+    async for partition in result.partitions():
+        yield [
+            (metric, as_of, value, target, kpi_type.value if kpi_type else None, unit)
+            for metric, as_of, value, target, kpi_type, unit in partition
+        ]
+
+
+# --------------------------------------------------------------------------- #
+# Encoders
+# --------------------------------------------------------------------------- #
+class _Sink(io.RawIOBase):
+    """Write-only file object whose contents are drained after each write."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _iso_utc(ts: dt.datetime) -> str:
+    # SQLite hands back naive datetimes; they are stored as UTC
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=dt.timezone.utc)
+    return ts.astimezone(dt.timezone.utc).isoformat()
+
+
+def _csv_encoder() -> Callable[[Optional[List[tuple]]], bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+
+    def encode(rows: Optional[List[tuple]]) -> bytes:
+        if rows:
+            writer.writerows(
+                (m, _iso_utc(ts), v, t, k, u) for m, ts, v, t, k, u in rows
+            )
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    return encode
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("metric", pa.string()),
+        ("as_of", pa.timestamp("us", tz="UTC")),
+        ("value", pa.float64()),
+        ("target", pa.float64()),
+        ("type", pa.string()),
+        ("unit", pa.string()),
+    ])
+
+
+def _record_batch(schema, rows: List[tuple]):
+    import pyarrow as pa
+
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def _arrow_encoder() -> Callable[[Optional[List[tuple]]], bytes]:
+    import pyarrow as pa
+
+    schema, sink = _arrow_schema(), _Sink()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def encode(rows: Optional[List[tuple]]) -> bytes:
+        if rows:
+            writer.write_batch(_record_batch(schema, rows))
+        else:
+            writer.close()
+        return sink.drain()
+
+    return encode
+
+
+def _parquet_encoder() -> Callable[[Optional[List[tuple]]], bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema, sink = _arrow_schema(), _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    pending: List = []
+    pending_rows = 0
+
+    def flush() -> None:
+        nonlocal pending, pending_rows
+        if pending:
+            writer.write_table(pa.Table.from_batches(pending, schema=schema))
+            pending, pending_rows = [], 0
+
+    def encode(rows: Optional[List[tuple]]) -> bytes:
+        nonlocal pending_rows
+        if rows:
+            pending.append(_record_batch(schema, rows))
+            pending_rows += len(rows)
+            if pending_rows >= settings.EXPORT_ROW_GROUP_SIZE:
+                flush()
+        else:
+            flush()
+            writer.close()
+        return sink.drain()
+
+    return encode
+
+
+_ENCODERS = {"csv": _csv_encoder, "parquet": _parquet_encoder, "arrow": _arrow_encoder}
+
+
+async def stream_export(
+    db: AsyncSession,
+    stmt,
+    fmt: str,
+    archived: Optional[Iterator[List[tuple]]] = None,
+) -> AsyncIterator[bytes]:
+    """Yield the encoded export of ``stmt`` in format ``fmt``.
+
+    Batches from ``archived`` (cold-tier rows, see
+    :func:`app.services.kpi_archive.archive_batches`) are written first.
+    ``encode(rows)`` consumes one batch; ``encode(None)`` finishes the file.
+    """
+    encode = _ENCODERS[fmt]()
+    if archived is not None:
+        # Parquet scans block; keep them off the event loop
+        while (rows := await asyncio.to_thread(next, archived, None)) is not None:
+            chunk = encode(rows)
+            if chunk:
+                yield chunk
+    async for rows in _batches(db, stmt):
+        chunk = encode(rows)
+        if chunk:
+            yield chunk
+    tail = encode(None)
+    if tail:
+        yield tail
@@ -0,0 +1,222 @@
+"""
+Incremental maintenance of the ``kpi_latest`` materialisation.
+
+Every writer of ``kpi`` calls :func:`apply_kpi_writes` with the rows it just
+wrote, inside the same transaction.  The new top-two per metric can only be
+among the stored latest/previous pair and the freshly written rows, so the
+update touches O(metrics written) rows no matter how long the history is.
+
+:func:`rebuild_latest` recomputes the table from raw history, hot and
+archived (backfill after upgrades or manual repair).  Trigger it with::
+
+    celery -A app.core.celery_app call app.services.kpi_latest.rebuild
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import bindparam, delete, func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery_app
+from app.core.database import dialect_insert, get_engine
+from app.core.schema import schema
+from app.models import Kpi, KpiLatest
+from app.services.kpi_archive import archive_latest, archived_companies
+
+logger = logging.getLogger(__name__)
+
+# Descriptive columns carried along with the latest value
+_CARRY = ("target", "type", "unit", "description")
+
+_table = KpiLatest.__table__
+
+
+def _as_uuid(value: Any) -> UUID:
+    return value if isinstance(value, UUID) else UUID(str(value))
+
+
+def _sort_key(ts: Any) -> dt.datetime:
+    """Comparable naive-UTC datetime (mixes pandas/aware/naive inputs)."""
+    if hasattr(ts, "to_pydatetime"):
+        ts = ts.to_pydatetime()
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def ranked_latest_statement(optional_columns: Sequence = ()):
+    """Latest/previous value per metric of ``:company_id`` straight from ``kpi``.
+
+    ``ROW_NUMBER`` over ``(company_id, metric) ORDER BY as_of DESC`` picks the
+    latest row; ``LEAD`` over the same descending window is the chronological
+    ``LAG`` – i.e. the previous value – so both come back in one pass.
+    """
+    window = {
+        "partition_by": (Kpi.company_id, Kpi.metric),
+        "order_by": Kpi.as_of.desc(),
+    }
+    ranked = (
+        select(
+            Kpi.company_id,
+            Kpi.metric,
+            Kpi.value,
+            Kpi.as_of,
+            *optional_columns,
+            func.row_number().over(**window).label("rn"),
+            func.lead(Kpi.value, type_=Kpi.value.type).over(**window).label("prev_value"),
+            func.lead(Kpi.as_of, type_=Kpi.as_of.type).over(**window).label("prev_as_of"),
+        )
+        .where(Kpi.company_id == bindparam("company_id"))
+        .subquery("ranked")
+    )
+    return select(ranked).where(ranked.c.rn == 1)
+
+
+def _latest_row(company_id: UUID, metric: str, latest: Mapping, prev: Optional[Mapping]) -> Dict:
+    return {
+        "company_id": company_id,
+        "metric": metric,
+        "value": latest["value"],
+        "as_of": latest["as_of"],
+        "prev_value": prev["value"] if prev else None,
+        "prev_as_of": prev["as_of"] if prev else None,
+        **{c: latest.get(c) for c in _CARRY},
+        "updated_at": dt.datetime.utcnow(),
+    }
+
+
+def _upsert(conn: Connection, rows: List[Dict]) -> None:
+    if not rows:
+        return
+    stmt = dialect_insert(_table, conn.dialect.name)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_table.c.company_id, _table.c.metric],
+        set_={
+            c.name: stmt.excluded[c.name]
+            for c in _table.columns
+            if not c.primary_key
+        },
+    )
+    conn.execute(stmt, rows)
+
+
+def apply_kpi_writes(conn: Connection, rows: Iterable[Mapping]) -> int:
+    """Fold freshly written ``kpi`` rows into ``kpi_latest``.
+
+    ``rows`` need ``company_id``, ``metric``, ``value`` and ``as_of``; the
+    optional ``target``/``type``/``unit``/``description`` are carried over
+    when present.  Must run on the writer's connection *before* it commits.
+    Returns the number of metrics updated.
+    """
+    written: Dict[Tuple[UUID, str], Dict[dt.datetime, Dict]] = defaultdict(dict)
+    for r in rows:
+        key = (_as_uuid(r["company_id"]), r["metric"])
+        point = {k: v for k, v in r.items() if v is not None and (k in _CARRY or k in ("value", "as_of"))}
+        bucket = written[key]
+        ts = _sort_key(r["as_of"])
+        bucket[ts] = {**bucket.get(ts, {}), **point}
+    if not written:
+        return 0
+
+    metrics_by_company: Dict[UUID, List[str]] = defaultdict(list)
+    for company_id, metric in written:
+        metrics_by_company[company_id].append(metric)
+
+    current: Dict[Tuple[UUID, str], Mapping] = {}
+    for company_id, metrics in metrics_by_company.items():
+        result = conn.execute(
+            select(_table).where(
+                _table.c.company_id == company_id, _table.c.metric.in_(metrics)
+            )
+        )
+        for row in result.mappings():
+            current[(row["company_id"], row["metric"])] = row
+
+    upserts = []
+    for key, points in written.items():
+        candidates: Dict[dt.datetime, Dict] = {}
+        stored = current.get(key)
+        if stored is not None:
+            candidates[_sort_key(stored["as_of"])] = {
+                "value": stored["value"],
+                "as_of": stored["as_of"],
+                **{c: stored[c] for c in _CARRY},
+            }
+            if stored["prev_as_of"] is not None:
+                candidates[_sort_key(stored["prev_as_of"])] = {
+                    "value": stored["prev_value"],
+                    "as_of": stored["prev_as_of"],
+                }
+        for ts, point in points.items():
+            candidates[ts] = {**candidates.get(ts, {}), **point}
+
+        top = sorted(candidates.items(), key=lambda kv: kv[0], reverse=True)[:2]
+        prev = top[1][1] if len(top) > 1 else None
+        upserts.append(_latest_row(key[0], key[1], top[0][1], prev))
+
+    _upsert(conn, upserts)
+    return len(upserts)
+
+
+def rebuild_latest(conn: Connection, company_id: Optional[UUID] = None) -> int:
+    """Recompute ``kpi_latest`` from raw ``kpi`` history.
+
+    Rebuilds a single company when ``company_id`` is given, otherwise all of
+    them.  Archived points compete with the hot ones, so metrics whose
+    newest rows were archived keep their latest/previous pair.  Returns the
+    number of metrics written.
+    """
+    if not schema.loaded:
+        schema.refresh(conn)
+
+    if company_id is not None:
+        company_ids = [_as_uuid(company_id)]
+    else:
+        company_ids = set(conn.execute(select(Kpi.company_id).distinct()).scalars())
+        company_ids = sorted(company_ids | set(archived_companies()), key=str)
+
+    stmt = ranked_latest_statement(schema.kpi_optional_columns)
+    total = 0
+    for cid in company_ids:
+        conn.execute(delete(_table).where(_table.c.company_id == cid))
+        candidates: Dict[str, List[Mapping]] = archive_latest(cid)
+        for r in conn.execute(stmt, {"company_id": cid}).mappings():
+            points = candidates.setdefault(r["metric"], [])
+            points.append(r)
+            if r["prev_as_of"] is not None:
+                points.append({"value": r["prev_value"], "as_of": r["prev_as_of"]})
+        rows = []
+        for metric, points in candidates.items():
+            top = sorted(points, key=lambda p: _sort_key(p["as_of"]), reverse=True)[:2]
+            rows.append(_latest_row(cid, metric, top[0], top[1] if len(top) > 1 else None))
+        _upsert(conn, rows)
+        total += len(rows)
+    return total
+
+
+def backfill_if_empty(conn: Connection) -> int:
+    """Populate ``kpi_latest`` once for databases created before it existed."""
+    if conn.execute(select(_table.c.metric).limit(1)).first() is not None:
+        return 0
+    if conn.execute(select(Kpi.id).limit(1)).first() is None:
+        return 0
+    written = rebuild_latest(conn)
+    logger.info("Backfilled kpi_latest with %d metrics", written)
+    return written
+
+
+@celery_app.task(name="app.services.kpi_latest.rebuild")
+def rebuild(company_id: Optional[str] = None) -> int:
+    """Rebuild ``kpi_latest`` for one company (or all) and return the row count."""
+    with Session(get_engine()) as session:
+        written = rebuild_latest(
+            session.connection(), UUID(company_id) if company_id else None
+        )
+        session.commit()
+    return written
@@ -0,0 +1,183 @@
+"""
+Monthly range partitions of ``kpi`` on PostgreSQL.
+
+``kpi`` is declared ``PARTITION BY RANGE (as_of)``; every month lives in
+``kpi_yYYYYmMM`` and a ``kpi_default`` partition catches rows outside the
+created range (e.g. an old backfill).  :func:`maintain` runs daily from
+Celery beat:
+
+- creates the partitions of the current month and ``KPI_PARTITIONS_AHEAD``
+  months ahead, so writers never land in the default partition;
+- applies ``KPI_RETENTION_MONTHS`` (``0`` keeps everything): whole monthly
+  partitions past the cutoff are detached (``KPI_RETENTION_MODE=detach``,
+  the table is kept for archiving) or dropped – no row-by-row ``DELETE``,
+  except for the few expired rows in ``kpi_default``.
+
+Readers bound ``as_of`` so the planner prunes untouched months.  Rollups and
+``kpi_latest`` are left alone, so charts keep their aggregated history.
+
+SQLite keeps a plain table; everything here is a no-op there::
+
+    celery -A app.core.celery_app call app.services.kpi_partitions.maintain
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery_app
+from app.core.database import get_engine
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION = "kpi_default"
+_NAME = re.compile(r"^kpi_y(\d{4})m(\d{2})$")
+
+_PARTITIONED = text(
+    "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+    "WHERE c.relname = 'kpi' AND c.relnamespace = to_regnamespace(current_schema())"
+)
+_PARTITIONS = text(
+    "SELECT c.relname FROM pg_inherits i "
+    "JOIN pg_class c ON c.oid = i.inhrelid "
+    "JOIN pg_class p ON p.oid = i.inhparent "
+    "WHERE p.relname = 'kpi' AND p.relnamespace = to_regnamespace(current_schema())"
+)
+
+
+def month_start(ts: dt.datetime) -> dt.date:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(dt.timezone.utc)
+    return dt.date(ts.year, ts.month, 1)
+
+
+def add_months(month: dt.date, n: int) -> dt.date:
+    index = month.year * 12 + month.month - 1 + n
+    return dt.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: dt.date) -> str:
+    return f"kpi_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(_PARTITIONED).first() is not None
+
+
+def existing_partitions(conn: Connection) -> Dict[dt.date, str]:
+    """``{month: partition name}`` of the monthly partitions attached to ``kpi``."""
+    months = {}
+    for (name,) in conn.execute(_PARTITIONS):
+        match = _NAME.match(name)
+        if match:
+            months[dt.date(int(match[1]), int(match[2]), 1)] = name
+    return months
+
+
+def create_partition(conn: Connection, month: dt.date) -> str:
+    """Create the partition of ``month``, moving its rows out of the default one."""
+    name = partition_name(month)
+    bounds = (
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+        f"TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+    window = {
+        "lo": dt.datetime.combine(month, dt.time(), dt.timezone.utc),
+        "hi": dt.datetime.combine(add_months(month, 1), dt.time(), dt.timezone.utc),
+    }
+    has_default = conn.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION}
+    ).scalar()
+    if not has_default or conn.execute(
+        text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE as_of >= :lo AND as_of < :hi LIMIT 1"),
+        window,
+    ).first() is None:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF kpi {bounds}"))
+        return name
+
+    # a partition cannot be created over rows sitting in the default one
+    conn.execute(text(f"CREATE TABLE {name} (LIKE kpi INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE as_of >= :lo AND as_of < :hi RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), window)
+    conn.execute(text(f"ALTER TABLE kpi ATTACH PARTITION {name} {bounds}"))
+    return name
+
+
+def ensure_partitions(
+    conn: Connection,
+    first: Optional[dt.date] = None,
+    now: Optional[dt.datetime] = None,
+) -> List[str]:
+    """Create missing monthly partitions from ``first`` (default: this month)
+    through ``KPI_PARTITIONS_AHEAD`` months ahead, plus the default partition.
+
+    Returns the names created.  No-op unless ``kpi`` is partitioned.
+    """
+    if not is_partitioned(conn):
+        return []
+    current = month_start(now or dt.datetime.now(dt.timezone.utc))
+    month = min(first or current, current)
+    last = add_months(current, settings.KPI_PARTITIONS_AHEAD)
+    have = existing_partitions(conn)
+
+    created = []
+    while month <= last:
+        if month not in have:
+            created.append(create_partition(conn, month))
+        month = add_months(month, 1)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF kpi DEFAULT"))
+    if created:
+        logger.info("Created KPI partitions: %s", ", ".join(created))
+    return created
+
+
+def apply_retention(conn: Connection, now: Optional[dt.datetime] = None) -> List[str]:
+    """Detach or drop the monthly partitions entirely older than the retention.
+
+    Returns the partitions removed from ``kpi``.
+    """
+    months = settings.KPI_RETENTION_MONTHS
+    if months <= 0 or not is_partitioned(conn):
+        return []
+    cutoff = add_months(month_start(now or dt.datetime.now(dt.timezone.utc)), -months)
+
+    removed = []
+    for month, name in sorted(existing_partitions(conn).items()):
+        if add_months(month, 1) > cutoff:
+            break
+        conn.execute(text(f"ALTER TABLE kpi DETACH PARTITION {name}"))
+        if settings.KPI_RETENTION_MODE == "drop":
+            conn.execute(text(f"DROP TABLE {name}"))
+        removed.append(name)
+    conn.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE as_of < :cutoff"),
+        {"cutoff": dt.datetime.combine(cutoff, dt.time(), dt.timezone.utc)},
+    )
+    if removed:
+        logger.info(
+            "KPI retention (%s): %s", settings.KPI_RETENTION_MODE, ", ".join(removed)
+        )
+    return removed
+
+
+@celery_app.task(name="app.services.kpi_partitions.maintain")
+def maintain() -> Dict[str, List[str]]:
+    """Create upcoming KPI partitions and apply the retention policy."""
+    with Session(get_engine()) as session:
+        conn = session.connection()
+        created = ensure_partitions(conn)
+        removed = apply_retention(conn)
+        session.commit()
+    return {"created": created, "removed": removed}
@@ -0,0 +1,271 @@
+"""
+Daily / weekly / monthly KPI rollups (``kpi_rollup_day|week|month``).
+
+Every writer of ``kpi`` calls :func:`apply_rollup_writes` with the rows it
+just wrote, inside the same transaction.  Only the buckets those rows fall
+into are recomputed: day buckets from raw ``kpi``, with the same aggregate
+statement ``/dashboard/kpis/series`` uses, merged with the Parquet archive
+(:mod:`app.services.kpi_archive`) for days before its cutoff; week and
+month buckets from the day rollups.  Corrections and late-arriving points
+are handled exactly, also in buckets that were partly archived, and the
+cost is bounded by one day of raw rows per touched bucket, not the history.
+
+Range reads pick the coarsest rollup that evenly divides the requested
+bucket (:func:`rollup_for`).  :func:`rebuild_rollups` recomputes everything
+from raw hot and archived history::
+
+    celery -A app.core.celery_app call app.services.kpi_rollup.rebuild
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery_app
+from app.core.database import dialect_insert, get_engine
+from app.core.schema import schema
+from app.models import Kpi, KpiRollupDay, KpiRollupMonth, KpiRollupWeek
+from app.services.kpi_archive import (
+    archive_series,
+    archive_spans,
+    archived_before,
+    archived_companies,
+    has_archive,
+)
+from app.services.kpi_series import (
+    as_datetime,
+    bucket_ceil,
+    bucket_floor,
+    merge_buckets,
+    rollup_series_statement,
+    series_statement,
+)
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS = {"day": KpiRollupDay, "week": KpiRollupWeek, "month": KpiRollupMonth}
+
+# gap that splits the days touched by one write into separate raw reads
+_CLUSTER_GAP = dt.timedelta(days=1)
+
+# rollup grains that evenly divide each series bucket, coarsest first
+_DIVISORS = {"day": ("day",), "week": ("week", "day"), "month": ("month", "day")}
+
+
+def rollup_for(bucket: str):
+    """Rollup model to serve ``bucket`` from, or ``None`` to aggregate raw rows."""
+    for grain in _DIVISORS.get(bucket, ()):
+        model = ROLLUPS[grain]
+        if schema.has_table(model.__tablename__):
+            return model
+    return None
+
+
+def _as_uuid(value: Any) -> UUID:
+    return value if isinstance(value, UUID) else UUID(str(value))
+
+
+def _bucket_end(ts: dt.datetime, grain: str) -> dt.datetime:
+    """Start of the bucket after the one holding ``ts`` (naive UTC)."""
+    return bucket_ceil(bucket_floor(ts, grain) + dt.timedelta(microseconds=1), grain)
+
+
+def _recompute(
+    conn: Connection,
+    company_id: UUID,
+    metrics: List[str],
+    lo: dt.datetime,
+    hi: dt.datetime,
+    only: Optional[Dict[str, Set[Tuple[str, dt.datetime]]]] = None,
+) -> int:
+    """Aggregate rows of ``metrics`` in ``[lo, hi]`` into every rollup.
+
+    Day buckets are re-aggregated from raw ``kpi`` rows (plus the archived
+    rows of days before the archive mark); week and month buckets are then
+    merged from the day rollups, so a write re-reads one day of raw rows,
+    not its whole month.  With ``only`` (grain -> ``{(metric, bucket)}``)
+    just those buckets are written; neighbours read along the way are left
+    untouched.
+    """
+    dialect_name = conn.dialect.name
+    stmt = schema.cached(
+        ("kpi_series", "day", dialect_name),
+        lambda: series_statement("day", dialect_name),
+    )
+    start = bucket_floor(lo, "day").replace(tzinfo=dt.timezone.utc)
+    end = _bucket_end(hi, "day").replace(tzinfo=dt.timezone.utc)
+    result = list(conn.execute(stmt, {
+        "company_id": company_id, "metrics": metrics, "start": start, "end": end,
+    }).mappings())
+    if has_archive(company_id):
+        mark = archived_before(company_id)
+        # days past the mark hold no archived rows; skip the scan for them
+        if mark is None or start < mark:
+            result = merge_buckets(
+                archive_series(company_id, metrics, start, end, "day"), result
+            )
+    written = _store(conn, KpiRollupDay, company_id, result, only and only["day"])
+
+    day = KpiRollupDay.__table__
+    for grain in ("week", "month"):
+        stmt = schema.cached(
+            ("kpi_series_rollup", day.name, grain, dialect_name),
+            lambda grain=grain: rollup_series_statement(KpiRollupDay, grain, dialect_name),
+        )
+        result = conn.execute(stmt, {
+            "company_id": company_id,
+            "metrics": metrics,
+            "start": bucket_floor(lo, grain),
+            "end": _bucket_end(hi, grain),
+        }).mappings()
+        written += _store(conn, ROLLUPS[grain], company_id, result, only and only[grain])
+    return written
+
+
+def _store(
+    conn: Connection,
+    model,
+    company_id: UUID,
+    result: Iterable[Mapping],
+    only: Optional[Set[Tuple[str, dt.datetime]]],
+) -> int:
+    """Upsert aggregate rows shaped like :func:`series_statement` rows."""
+    now = dt.datetime.utcnow()
+    rows = []
+    for r in result:
+        bucket = as_datetime(r["bucket"])
+        if only is not None and (r["metric"], bucket) not in only:
+            continue
+        rows.append({
+            "company_id": company_id,
+            "metric": r["metric"],
+            "bucket": bucket,
+            "count": r["count"],
+            "sum": r["sum"],
+            "min": r["min"],
+            "max": r["max"],
+            "last_value": r["last"],
+            "last_as_of": _naive_utc(as_datetime(r["last_as_of"])),
+            "updated_at": now,
+        })
+    _upsert(conn, model.__table__, rows)
+    return len(rows)
+
+
+def _naive_utc(ts: dt.datetime) -> dt.datetime:
+    return ts.astimezone(dt.timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def _upsert(conn: Connection, table, rows: List[Dict]) -> None:
+    if not rows:
+        return
+    stmt = dialect_insert(table, conn.dialect.name)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.company_id, table.c.metric, table.c.bucket],
+        set_={
+            c.name: stmt.excluded[c.name]
+            for c in table.columns
+            if not c.primary_key
+        },
+    )
+    conn.execute(stmt, rows)
+
+
+def apply_rollup_writes(conn: Connection, rows: Iterable[Mapping]) -> int:
+    """Recompute the rollup buckets touched by freshly written ``kpi`` rows.
+
+    ``rows`` need ``company_id``, ``metric`` and ``as_of``.  Must run on the
+    writer's connection after its inserts and *before* it commits.  Returns
+    the number of rollup rows written.
+    """
+    touched: Dict[UUID, List[Tuple[str, dt.datetime]]] = defaultdict(list)
+    for r in rows:
+        touched[_as_uuid(r["company_id"])].append((r["metric"], r["as_of"]))
+
+    written = 0
+    for company_id, points in touched.items():
+        only = {
+            grain: {(metric, bucket_floor(ts, grain)) for metric, ts in points}
+            for grain in ROLLUPS
+        }
+        metrics = sorted({metric for metric, _ in points})
+        # a late point far from the rest gets its own read instead of
+        # widening one read over everything in between
+        for lo, hi in _clusters(sorted({bucket_floor(ts, "day") for _, ts in points})):
+            written += _recompute(conn, company_id, metrics, lo, hi, only)
+    return written
+
+
+def _clusters(stamps: List[dt.datetime]) -> List[Tuple[dt.datetime, dt.datetime]]:
+    """Split sorted day starts into ``(lo, hi)`` runs of consecutive days."""
+    runs = [[stamps[0], stamps[0]]]
+    for ts in stamps[1:]:
+        if ts - runs[-1][1] > _CLUSTER_GAP:
+            runs.append([ts, ts])
+        else:
+            runs[-1][1] = ts
+    return [(lo, hi) for lo, hi in runs]
+
+
+def rebuild_rollups(conn: Connection, company_id: Optional[UUID] = None) -> int:
+    """Recompute all rollups of one company (or all) from raw ``kpi`` history
+    and the archive."""
+    if not schema.loaded:
+        schema.refresh(conn)
+
+    if company_id is not None:
+        company_ids = [_as_uuid(company_id)]
+    else:
+        company_ids = set(conn.execute(select(Kpi.company_id).distinct()).scalars())
+        company_ids = sorted(company_ids | set(archived_companies()), key=str)
+
+    written = 0
+    for cid in company_ids:
+        for model in ROLLUPS.values():
+            conn.execute(delete(model.__table__).where(model.__table__.c.company_id == cid))
+        spans = conn.execute(
+            select(Kpi.metric, func.min(Kpi.as_of), func.max(Kpi.as_of))
+            .where(Kpi.company_id == cid)
+            .group_by(Kpi.metric)
+        ).all()
+        spans = [(metric, _naive_utc(as_datetime(lo)), _naive_utc(as_datetime(hi)))
+                 for metric, lo, hi in list(spans) + archive_spans(cid)]
+        if spans:
+            written += _recompute(
+                conn,
+                cid,
+                sorted({metric for metric, _, _ in spans}),
+                min(lo for _, lo, _ in spans),
+                max(hi for _, _, hi in spans),
+            )
+    return written
+
+
+def backfill_if_empty(conn: Connection) -> int:
+    """Populate the rollups once for databases created before they existed."""
+    day = KpiRollupDay.__table__
+    if conn.execute(select(day.c.metric).limit(1)).first() is not None:
+        return 0
+    if conn.execute(select(Kpi.id).limit(1)).first() is None:
+        return 0
+    written = rebuild_rollups(conn)
+    logger.info("Backfilled KPI rollups with %d rows", written)
+    return written
+
+
+@celery_app.task(name="app.services.kpi_rollup.rebuild")
+def rebuild(company_id: Optional[str] = None) -> int:
+    """Rebuild the KPI rollups for one company (or all) and return the row count."""
+    with Session(get_engine()) as session:
+        written = rebuild_rollups(
+            session.connection(), UUID(company_id) if company_id else None
+        )
+        session.commit()
+    return written
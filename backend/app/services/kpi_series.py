@@ -0,0 +1,281 @@
+"""
+Bucketed KPI history for charts (``/dashboard/kpis/series``).
+
+Raw ``kpi`` rows are aggregated in the database into fixed time buckets –
+``date_trunc`` on PostgreSQL, ``strftime`` on SQLite – so the response size
+depends on the number of buckets, never on the number of raw points.  Each
+bucket carries ``min``/``max``/``avg``/``last``/``count``; ``last`` is the
+value with the greatest ``as_of`` inside the bucket, picked with
+``ROW_NUMBER`` in the same statement.
+
+Buckets are aligned in UTC; weeks start on Monday (ISO, like ``date_trunc``).
+Day, week and month buckets are served from the pre-aggregated rollup
+tables once they exist; raw-bucket reads also merge in the Parquet archive
+(:mod:`app.services.kpi_archive`).
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+from collections import defaultdict
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import bindparam, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.schema import schema
+from app.models import Kpi
+from app.services.kpi_archive import archive_series, has_archive
+
+BUCKETS = ("hour", "day", "week", "month")
+
+# nominal width, used to size requests before running them
+BUCKET_WIDTH = {
+    "hour": dt.timedelta(hours=1),
+    "day": dt.timedelta(days=1),
+    "week": dt.timedelta(weeks=1),
+    "month": dt.timedelta(days=31),
+}
+
+_SQLITE_FORMATS = {
+    "hour": ("%Y-%m-%d %H:00:00",),
+    "day": ("%Y-%m-%d 00:00:00",),
+    "week": ("%Y-%m-%d 00:00:00", "weekday 0", "-6 days"),
+    "month": ("%Y-%m-01 00:00:00",),
+}
+
+
+def bucket_count(start: dt.datetime, end: dt.datetime, bucket: str) -> int:
+    """Upper bound on the buckets between ``start`` and ``end``."""
+    return int((end - start) / BUCKET_WIDTH[bucket]) + 2
+
+
+def finest_bucket(start: dt.datetime, end: dt.datetime, max_buckets: int) -> Optional[str]:
+    """Finest bucket keeping ``[start, end)`` within ``max_buckets``."""
+    return next((b for b in BUCKETS if bucket_count(start, end, b) <= max_buckets), None)
+
+
+def bucket_floor(ts: dt.datetime, bucket: str) -> dt.datetime:
+    """Python twin of :func:`bucket_expr`: start of the bucket holding ``ts`` (naive UTC)."""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    if bucket == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        return day - dt.timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def bucket_ceil(ts: dt.datetime, bucket: str) -> dt.datetime:
+    """Start of the first bucket at or after ``ts`` (naive UTC)."""
+    floor = bucket_floor(ts, bucket)
+    naive = ts.astimezone(dt.timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+    if floor == naive:
+        return floor
+    if bucket == "month":
+        return (floor + dt.timedelta(days=32)).replace(day=1)
+    return floor + BUCKET_WIDTH[bucket]
+
+
+def bucket_expr(column, bucket: str, dialect_name: str, *, naive_utc: bool = False):
+    """SQL expression truncating ``column`` to the start of its bucket (UTC).
+
+    ``naive_utc`` marks a ``timestamp without time zone`` column already in
+    UTC (the rollup ``bucket`` columns).
+    """
+    if dialect_name == "postgresql":
+        if naive_utc:
+            return func.date_trunc(bucket, column)
+        return func.date_trunc(bucket, func.timezone("UTC", column))
+    fmt, *modifiers = _SQLITE_FORMATS[bucket]
+    return func.strftime(fmt, column, *modifiers)
+
+
+def as_datetime(value: Any) -> dt.datetime:
+    """Bucket value as ``datetime`` (SQLite hands back the ``strftime`` text)."""
+    return value if isinstance(value, dt.datetime) else dt.datetime.fromisoformat(value)
+
+
+def series_statement(bucket: str, dialect_name: str):
+    """Per ``(metric, bucket)`` aggregates for ``:company_id`` within ``[:start, :end)``."""
+    start_of = bucket_expr(Kpi.as_of, bucket, dialect_name)
+    ranked = (
+        select(
+            Kpi.metric,
+            start_of.label("bucket"),
+            Kpi.value,
+            Kpi.as_of,
+            func.row_number()
+            .over(partition_by=(Kpi.metric, start_of), order_by=Kpi.as_of.desc())
+            .label("rn"),
+        )
+        .where(
+            Kpi.company_id == bindparam("company_id"),
+            Kpi.metric.in_(bindparam("metrics", expanding=True)),
+            Kpi.as_of >= bindparam("start"),
+            Kpi.as_of < bindparam("end"),
+        )
+        .subquery("ranked")
+    )
+    return (
+        select(
+            ranked.c.metric,
+            ranked.c.bucket,
+            func.min(ranked.c.value).label("min"),
+            func.max(ranked.c.value).label("max"),
+            func.avg(ranked.c.value).label("avg"),
+            func.max(case((ranked.c.rn == 1, ranked.c.value))).label("last"),
+            func.count().label("count"),
+            func.sum(ranked.c.value).label("sum"),
+            func.max(ranked.c.as_of).label("last_as_of"),
+        )
+        .group_by(ranked.c.metric, ranked.c.bucket)
+        .order_by(ranked.c.metric, ranked.c.bucket)
+    )
+
+
+def rollup_series_statement(rollup, bucket: str, dialect_name: str):
+    """:func:`series_statement` over a rollup table of equal or finer grain.
+
+    Finer rollup buckets are merged into ``bucket``: counts and sums add
+    up, ``last`` comes from the rollup row with the greatest ``last_as_of``.
+    ``sum`` and ``last_as_of`` are returned too, so the result can itself be
+    stored as a coarser rollup.
+    """
+    t = rollup.__table__
+    start_of = bucket_expr(t.c.bucket, bucket, dialect_name, naive_utc=True)
+    ranked = (
+        select(
+            t.c.metric,
+            start_of.label("bucket"),
+            t.c["count"], t.c["sum"], t.c["min"], t.c["max"],
+            t.c.last_value, t.c.last_as_of,
+            func.row_number()
+            .over(partition_by=(t.c.metric, start_of), order_by=t.c.last_as_of.desc())
+            .label("rn"),
+        )
+        .where(
+            t.c.company_id == bindparam("company_id"),
+            t.c.metric.in_(bindparam("metrics", expanding=True)),
+            t.c.bucket >= bindparam("start", type_=t.c.bucket.type),
+            t.c.bucket < bindparam("end", type_=t.c.bucket.type),
+        )
+        .subquery("ranked")
+    )
+    count = func.sum(ranked.c["count"])
+    total = func.sum(ranked.c["sum"])
+    return (
+        select(
+            ranked.c.metric,
+            ranked.c.bucket,
+            func.min(ranked.c["min"]).label("min"),
+            func.max(ranked.c["max"]).label("max"),
+            (total / count).label("avg"),
+            func.max(case((ranked.c.rn == 1, ranked.c.last_value))).label("last"),
+            count.label("count"),
+            total.label("sum"),
+            func.max(ranked.c.last_as_of).label("last_as_of"),
+        )
+        .group_by(ranked.c.metric, ranked.c.bucket)
+        .order_by(ranked.c.metric, ranked.c.bucket)
+    )
+
+
+def empty_series() -> Dict[str, List]:
+    return {"t": [], "min": [], "max": [], "avg": [], "last": [], "count": []}
+
+
+def append_point(series: Dict[str, List], row: Any) -> None:
+    series["t"].append(as_datetime(row["bucket"]))
+    for field in ("min", "max", "avg", "last"):
+        series[field].append(None if row[field] is None else round(float(row[field]), 6))
+    series["count"].append(int(row["count"]))
+
+
+async def load_series(
+    db: AsyncSession,
+    company_id: UUID,
+    metrics: Sequence[str],
+    start: dt.datetime,
+    end: dt.datetime,
+    bucket: str,
+) -> Dict[str, Dict[str, List]]:
+    """Columnar ``{metric: {"t", "min", "max", "avg", "last", "count"}}``.
+
+    The range is widened to whole buckets.  Day and coarser buckets are read
+    from the coarsest rollup table that divides them (see
+    :mod:`app.services.kpi_rollup`); hourly buckets aggregate raw ``kpi``.
+    Metrics without data in the range map to empty columns.
+    """
+    from app.services.kpi_rollup import rollup_for
+
+    await schema.ensure_loaded(db)
+    dialect_name = db.get_bind().dialect.name
+    rollup = rollup_for(bucket)
+    if rollup is not None:
+        stmt = schema.cached(
+            ("kpi_series_rollup", rollup.__tablename__, bucket, dialect_name),
+            lambda: rollup_series_statement(rollup, bucket, dialect_name),
+        )
+        start, end = bucket_floor(start, bucket), bucket_ceil(end, bucket)
+    else:
+        stmt = schema.cached(
+            ("kpi_series", bucket, dialect_name),
+            lambda: series_statement(bucket, dialect_name),
+        )
+        start = bucket_floor(start, bucket).replace(tzinfo=dt.timezone.utc)
+        end = bucket_ceil(end, bucket).replace(tzinfo=dt.timezone.utc)
+    result = await db.execute(
+        stmt,
+        {"company_id": company_id, "metrics": list(metrics), "start": start, "end": end},
+    )
+    rows = list(result.mappings())
+    if rollup is None and has_archive(company_id):
+        archived = await asyncio.to_thread(
+            archive_series, company_id, metrics, start, end, bucket
+        )
+        rows = merge_buckets(archived, rows)
+
+    series: Dict[str, Dict[str, List]] = defaultdict(empty_series)
+    for row in rows:
+        append_point(series[row["metric"]], row)
+    return {metric: series[metric] for metric in metrics}
+
+
+def merge_buckets(older: Sequence[Mapping], newer: Sequence[Mapping]) -> List[Mapping]:
+    """Combine two sets of :func:`series_statement` rows, ordered by metric and bucket.
+
+    A bucket present in both (the archive cutoff fell inside it) is merged;
+    its ``last`` is taken from the side with the later ``last_as_of``.
+    """
+    merged: Dict[tuple, Mapping] = {}
+    for row in list(older) + list(newer):
+        key = (row["metric"], as_datetime(row["bucket"]))
+        prev = merged.get(key)
+        if prev is None:
+            merged[key] = row
+            continue
+        count = prev["count"] + row["count"]
+        total = prev["sum"] + row["sum"]
+        latest = row if _utc(row["last_as_of"]) >= _utc(prev["last_as_of"]) else prev
+        merged[key] = {
+            "metric": row["metric"],
+            "bucket": key[1],
+            "min": min(prev["min"], row["min"]),
+            "max": max(prev["max"], row["max"]),
+            "sum": total,
+            "count": count,
+            "avg": total / count,
+            "last": latest["last"],
+            "last_as_of": latest["last_as_of"],
+        }
+    return [merged[key] for key in sorted(merged)]
+
+
+def _utc(value: Any) -> dt.datetime:
+    ts = as_datetime(value)
+    return ts.replace(tzinfo=dt.timezone.utc) if ts.tzinfo is None else ts
@@ -0,0 +1,126 @@
+"""
+Latest-plus-previous KPI snapshot for the dashboard endpoints.
+
+One query returns, for every metric of a company, the most recent value
+together with the value that preceded it – replacing the old "latest rows +
+one ``prev_stmt`` per metric" pattern (N+1 round trips).  The data comes from
+``kpi_latest``, maintained by :mod:`app.services.kpi_latest`.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.schema import schema
+from app.models import KpiLatest
+
+
+_SNAPSHOT_COLUMNS = (
+    "company_id", "metric", "value", "as_of", "prev_value", "prev_as_of",
+    "target", "type", "unit", "description", "updated_at",
+)
+
+
+@dataclass(slots=True)
+class KpiSnapshot:
+    """Latest value of one metric plus the value recorded just before it."""
+
+    company_id: UUID
+    metric: str
+    value: float
+    as_of: datetime
+    prev_value: Optional[float] = None
+    prev_as_of: Optional[datetime] = None
+    target: Optional[float] = None
+    type: Any = None
+    unit: Optional[str] = None
+    description: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+    @property
+    def delta_pct(self) -> float:
+        """Percentage change vs. the previous value (``0.0`` if undefined)."""
+        if not self.prev_value:
+            return 0.0
+        return round(((self.value - self.prev_value) / self.prev_value) * 100, 2)
+
+
+def snapshot_statement(*, filter_metrics: bool = False, limited: bool = False):
+    """SELECT over ``kpi_latest`` for ``:company_id``, newest first.
+
+    Parameters are bound at execution time (``company_id`` and, when enabled,
+    ``metrics`` / ``limit``) so one statement object serves every request.
+    """
+    t = KpiLatest.__table__
+    stmt = (
+        select(*(t.c[name] for name in _SNAPSHOT_COLUMNS))
+        .where(t.c.company_id == bindparam("company_id"))
+        .order_by(t.c.as_of.desc(), t.c.metric)
+    )
+    if filter_metrics:
+        stmt = stmt.where(t.c.metric.in_(bindparam("metrics", expanding=True)))
+    if limited:
+        stmt = stmt.limit(bindparam("limit"))
+    return stmt
+
+
+async def load_snapshot(
+    db: AsyncSession,
+    company_id: UUID,
+    *,
+    metrics: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+) -> List[KpiSnapshot]:
+    """Return one :class:`KpiSnapshot` per metric, newest first.
+
+    Reads the incrementally maintained ``kpi_latest`` table, i.e. O(metrics)
+    rows however much history the company has.  The compiled statement is
+    cached in the schema registry.
+    """
+    filter_metrics, limited = bool(metrics), limit is not None
+    stmt = schema.cached(
+        ("kpi_snapshot", filter_metrics, limited),
+        lambda: snapshot_statement(filter_metrics=filter_metrics, limited=limited),
+    )
+
+    params = {"company_id": company_id}
+    if filter_metrics:
+        params["metrics"] = list(metrics)
+    if limited:
+        params["limit"] = limit
+
+    result = await db.execute(stmt, params)
+    return [KpiSnapshot(**row) for row in result.mappings()]
+
+
+def portfolio_statement():
+    """SELECT over ``kpi_latest`` for every company in ``:company_ids``."""
+    t = KpiLatest.__table__
+    return (
+        select(*(t.c[name] for name in _SNAPSHOT_COLUMNS))
+        .where(t.c.company_id.in_(bindparam("company_ids", expanding=True)))
+        .order_by(t.c.company_id, t.c.as_of.desc(), t.c.metric)
+    )
+
+
+async def load_portfolio_snapshot(
+    db: AsyncSession, company_ids: Sequence[UUID]
+) -> Dict[UUID, List[KpiSnapshot]]:
+    """:func:`load_snapshot` for many companies in a single query.
+
+    Every requested company is present in the result, with an empty list
+    when it has no KPIs.
+    """
+    snapshots: Dict[UUID, List[KpiSnapshot]] = {cid: [] for cid in company_ids}
+    if not company_ids:
+        return snapshots
+    stmt = schema.cached("kpi_portfolio_snapshot", portfolio_statement)
+    result = await db.execute(stmt, {"company_ids": list(company_ids)})
+    for row in result.mappings():
+        snapshots[row["company_id"]].append(KpiSnapshot(**row))
+    return snapshots
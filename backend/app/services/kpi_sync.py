@@ -0,0 +1,126 @@
+"""
+Progress of the fanned-out hourly KPI sync (see :mod:`app.services.kpi_etl`).
+
+``kpi_etl.run`` starts a sync with one subtask per extraction source; each
+subtask adds its counts here when it finishes (successfully or not) and the
+chord callback marks the sync done.  ``GET /dashboard/kpis/sync/{sync_id}``
+reads it back (``latest`` for the newest sync).
+
+Keys (expire after ``KPI_SYNC_PROGRESS_TTL``)
+----
+- ``kpi-sync:<sync_id>``        – hash: ``state``, ``total``, ``done``,
+  ``failed``, ``rows``, ``inserted``, ``updated``, ``unchanged``,
+  ``full_resync``, ``started_at``, ``finished_at``
+- ``kpi-sync:<sync_id>:errors`` – list of ``{"source", "error"}`` JSON
+- ``kpi-sync:latest``           – id of the newest sync
+
+Progress is best effort: a Redis outage is logged and never fails the sync.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+import uuid
+from typing import Any, Dict, Mapping, Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = "kpi-sync"
+LATEST = "latest"
+COUNTERS = ("done", "failed", "rows", "inserted", "updated", "unchanged")
+
+_redis = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+_aredis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+def _key(sync_id: str) -> str:
+    return f"{_PREFIX}:{sync_id}"
+
+
+def _errors_key(sync_id: str) -> str:
+    return f"{_PREFIX}:{sync_id}:errors"
+
+
+def _now() -> str:
+    return dt.datetime.now(dt.timezone.utc).isoformat()
+
+
+def new_sync_id() -> str:
+    return uuid.uuid4().hex
+
+
+def start(sync_id: str, total: int, full_resync: bool = False) -> None:
+    ttl = settings.KPI_SYNC_PROGRESS_TTL
+    try:
+        pipe = _redis.pipeline(transaction=False)
+        pipe.hset(_key(sync_id), mapping={
+            "state": "running" if total else "done",
+            "total": total,
+            **{name: 0 for name in COUNTERS},
+            "full_resync": int(full_resync),
+            "started_at": _now(),
+        })
+        pipe.expire(_key(sync_id), ttl)
+        pipe.set(f"{_PREFIX}:{LATEST}", sync_id, ex=ttl)
+        pipe.execute()
+    except redis.RedisError as exc:
+        logger.warning("KPI sync progress update failed: %s", exc)
+
+
+def record(sync_id: str, summary: Mapping[str, Any]) -> None:
+    """Count one finished source (``summary`` of ``kpi_etl.load`` or ``{"source", "error"}``)."""
+    try:
+        pipe = _redis.pipeline(transaction=False)
+        key = _key(sync_id)
+        if "error" in summary:
+            pipe.hincrby(key, "failed", 1)
+            pipe.rpush(_errors_key(sync_id), json.dumps(
+                {"source": summary.get("source"), "error": summary["error"]}
+            ))
+            pipe.expire(_errors_key(sync_id), settings.KPI_SYNC_PROGRESS_TTL)
+        else:
+            pipe.hincrby(key, "done", 1)
+            for name in ("rows", "inserted", "updated", "unchanged"):
+                pipe.hincrby(key, name, int(summary.get(name) or 0))
+        pipe.execute()
+    except redis.RedisError as exc:
+        logger.warning("KPI sync progress update failed: %s", exc)
+
+
+def finish(sync_id: str) -> None:
+    try:
+        _redis.hset(_key(sync_id), mapping={"state": "done", "finished_at": _now()})
+    except redis.RedisError as exc:
+        logger.warning("KPI sync progress update failed: %s", exc)
+
+
+def _decode(sync_id: str, raw: Mapping[str, str], errors) -> Dict[str, Any]:
+    progress: Dict[str, Any] = {"sync_id": sync_id, "state": raw.get("state")}
+    for name in ("total", *COUNTERS):
+        progress[name] = int(raw.get(name, 0))
+    progress["full_resync"] = raw.get("full_resync") == "1"
+    progress["started_at"] = raw.get("started_at")
+    progress["finished_at"] = raw.get("finished_at")
+    finished = progress["done"] + progress["failed"]
+    progress["progress"] = round(finished / progress["total"], 4) if progress["total"] else 1.0
+    progress["errors"] = [json.loads(e) for e in errors]
+    return progress
+
+
+async def load_progress(sync_id: str) -> Optional[Dict[str, Any]]:
+    """Progress of ``sync_id`` (or :data:`LATEST`); ``None`` if unknown or expired."""
+    if sync_id == LATEST:
+        sync_id = await _aredis.get(f"{_PREFIX}:{LATEST}")
+        if sync_id is None:
+            return None
+    raw = await _aredis.hgetall(_key(sync_id))
+    if not raw:
+        return None
+    errors = await _aredis.lrange(_errors_key(sync_id), 0, -1)
+    return _decode(sync_id, raw, errors)
@@ -0,0 +1,129 @@
+"""
+Batched ``kpi`` upserts keyed on ``(company_id, metric, as_of)``.
+
+Rows are written in chunks of ``KPI_UPSERT_CHUNK_SIZE`` with one
+``INSERT … ON CONFLICT (company_id, metric, as_of) DO UPDATE`` per chunk
+(SQLAlchemy batches the VALUES lists), instead of a ``SELECT`` plus an
+``INSERT``/``UPDATE`` round trip per row.  The update only fires when the
+value actually changed, and ``RETURNING id`` tells the outcomes apart: a
+row comes back with the id generated for it when it was inserted, with the
+existing id when it was updated, and not at all when it was unchanged.
+
+Only inserted/updated rows are handed back (``changed``) so callers can
+feed just those to :func:`~app.services.kpi_latest.apply_kpi_writes` and
+:func:`~app.services.kpi_rollup.apply_rollup_writes`.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.engine import Connection
+
+from app.core.database import dialect_insert
+from app.core.settings import settings
+from app.models import Kpi, KpiType
+
+_table = Kpi.__table__
+
+
+@dataclass
+class UpsertResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    seconds: float = 0.0
+    changed: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+
+    @property
+    def rows(self) -> int:
+        return self.inserted + self.updated + self.unchanged
+
+    def add(self, other: "UpsertResult") -> None:
+        """Fold in the counts of another batch (its ``changed`` rows are not kept)."""
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+        self.seconds += other.seconds
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts and throughput, e.g. as a Celery task result."""
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows / self.seconds) if self.seconds else None,
+        }
+
+
+def _naive_utc(ts: Any) -> dt.datetime:
+    if hasattr(ts, "to_pydatetime"):  # pandas.Timestamp
+        ts = ts.to_pydatetime()
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _key(company_id: Any, metric: str, as_of: Any) -> Tuple[UUID, str, dt.datetime]:
+    cid = company_id if isinstance(company_id, UUID) else UUID(str(company_id))
+    return cid, metric, _naive_utc(as_of)
+
+
+def _normalise(rows: Iterable[Mapping]) -> Dict[Tuple, Dict[str, Any]]:
+    """One row per key (the last one wins), with the ``kpi`` column set filled."""
+    out: Dict[Tuple, Dict[str, Any]] = {}
+    for r in rows:
+        key = _key(r["company_id"], r["metric"], r["as_of"])
+        kpi_type = r.get("type") or KpiType.OPERATIONAL
+        out[key] = {
+            "id": uuid.uuid4(),
+            "company_id": key[0],
+            "metric": key[1],
+            "as_of": key[2].replace(tzinfo=dt.timezone.utc),
+            "value": float(r["value"]),
+            "type": kpi_type if isinstance(kpi_type, KpiType) else KpiType(kpi_type),
+        }
+    return out
+
+
+def _statement(dialect_name: str):
+    stmt = dialect_insert(_table, dialect_name)
+    return stmt.on_conflict_do_update(
+        index_elements=[_table.c.company_id, _table.c.metric, _table.c.as_of],
+        set_={"value": stmt.excluded.value},
+        where=_table.c.value.is_distinct_from(stmt.excluded.value),
+    ).returning(_table.c.id, _table.c.company_id, _table.c.metric, _table.c.as_of)
+
+
+def upsert_kpis(
+    conn: Connection, rows: Iterable[Mapping], chunk_size: Optional[int] = None
+) -> UpsertResult:
+    """Insert or update ``rows`` (``company_id``, ``metric``, ``value``,
+    ``as_of`` and optionally ``type``) in chunks; the caller commits."""
+    started = time.perf_counter()
+    chunk_size = chunk_size or settings.KPI_UPSERT_CHUNK_SIZE
+    stmt = _statement(conn.dialect.name)
+    pending = list(_normalise(rows).items())
+
+    result = UpsertResult()
+    for i in range(0, len(pending), chunk_size):
+        chunk = dict(pending[i:i + chunk_size])
+        generated = {row["id"] for row in chunk.values()}
+        written = 0
+        for row_id, company_id, metric, as_of in conn.execute(stmt, list(chunk.values())):
+            written += 1
+            if row_id in generated:
+                result.inserted += 1
+            else:
+                result.updated += 1
+            result.changed.append(chunk[_key(company_id, metric, as_of)])
+        result.unchanged += len(chunk) - written
+
+    result.seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,124 @@
+"""
+Extraction watermarks of the hourly KPI ETL.
+
+Every source the ETL pulls from (a tenant's own ``snowflake_dsn``, keyed by
+company id, or one company's rows in the shared ``SNOWFLAKE_DSN``, keyed
+``"*:<company id>"``) has a row in
+``kpi_extract_watermark`` holding the newest warehouse ``as_of`` loaded so
+far.  The next run only selects ``as_of > watermark - overlap``: the
+``KPI_EXTRACT_OVERLAP_MINUTES`` overlap re-reads recent rows so late
+arrivals are still picked up, and re-read rows that did not change cost
+nothing downstream (see :mod:`app.services.kpi_upsert`).
+
+:func:`advance_watermarks` runs on the ETL's connection before it commits,
+so a watermark only moves together with the rows it covers, and never
+backwards.  Rows landing further back than the overlap need a full resync::
+
+    celery -A app.core.celery_app call app.services.kpi_etl.run --kwargs='{"full_resync": true}'
+"""
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+
+from app.core.database import dialect_insert
+from app.core.settings import settings
+from app.models import KpiExtractWatermark
+
+SHARED_SOURCE = "*"
+
+_table = KpiExtractWatermark.__table__
+
+
+def _utc(ts: Any) -> dt.datetime:
+    if hasattr(ts, "to_pydatetime"):  # pandas.Timestamp
+        ts = ts.to_pydatetime()
+    # naive warehouse / SQLite timestamps are UTC
+    return ts.replace(tzinfo=dt.timezone.utc) if ts.tzinfo is None else ts.astimezone(dt.timezone.utc)
+
+
+def shared_source(company_id: str) -> str:
+    """Source of one company's rows in the shared ``SNOWFLAKE_DSN``."""
+    return f"{SHARED_SOURCE}:{company_id}"
+
+
+def is_shared_source(source: str) -> bool:
+    return source.startswith(f"{SHARED_SOURCE}:")
+
+
+def extract_bound(since: Mapping[str, dt.datetime], source: str) -> Optional[dt.datetime]:
+    """Lower bound of ``source`` in ``since`` (see :func:`extract_from`).
+
+    Per-company shared sources without a watermark of their own start from
+    the one the shared warehouse had as a single ``"*"`` source.
+    """
+    bound = since.get(source)
+    if bound is None and is_shared_source(source):
+        bound = since.get(SHARED_SOURCE)
+    return bound
+
+
+def load_watermarks(conn: Connection) -> Dict[str, dt.datetime]:
+    """``{source: newest as_of loaded}``."""
+    return {source: _utc(as_of) for source, as_of in conn.execute(select(_table.c.source, _table.c.as_of))}
+
+
+def extract_from(
+    conn: Connection, overlap_minutes: Optional[int] = None
+) -> Dict[str, dt.datetime]:
+    """Lower ``as_of`` bound of the next extraction per source (watermark
+    minus the late-arrival overlap).  Sources without a watermark are absent
+    and get a full extraction."""
+    if overlap_minutes is None:
+        overlap_minutes = settings.KPI_EXTRACT_OVERLAP_MINUTES
+    overlap = dt.timedelta(minutes=overlap_minutes)
+    return {source: as_of - overlap for source, as_of in load_watermarks(conn).items()}
+
+
+def observe(
+    newest: Dict[str, Tuple[dt.datetime, int]], source: str, as_of: Any, count: int = 1
+) -> None:
+    """Fold ``count`` extracted rows of ``source`` reaching ``as_of`` into ``newest``."""
+    as_of = _utc(as_of)
+    seen, total = newest.get(source, (as_of, 0))
+    newest[source] = (max(seen, as_of), total + count)
+
+
+def newest_by_source(rows: Iterable[Mapping]) -> Dict[str, Tuple[dt.datetime, int]]:
+    """``{source: (max as_of, row count)}`` of extracted rows."""
+    newest: Dict[str, Tuple[dt.datetime, int]] = {}
+    for r in rows:
+        observe(newest, r["source"], r["as_of"])
+    return newest
+
+
+def advance_watermarks(
+    conn: Connection, newest: Mapping[str, Tuple[dt.datetime, int]]
+) -> Dict[str, dt.datetime]:
+    """Move each source's watermark to its newest extracted ``as_of``.
+
+    ``newest`` is ``{source: (max as_of, row count)}`` (see :func:`observe`
+    / :func:`newest_by_source`).  Must run on the writer's connection
+    *before* it commits.  Returns the watermarks written.
+    """
+    if not newest:
+        return {}
+    now = dt.datetime.now(dt.timezone.utc)
+    stmt = dialect_insert(_table, conn.dialect.name)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_table.c.source],
+        set_={
+            "as_of": stmt.excluded.as_of,
+            "rows": stmt.excluded.rows,
+            "updated_at": stmt.excluded.updated_at,
+        },
+        where=_table.c.as_of <= stmt.excluded.as_of,
+    )
+    conn.execute(stmt, [
+        {"source": source, "as_of": as_of, "rows": count, "updated_at": now}
+        for source, (as_of, count) in newest.items()
+    ])
+    return {source: as_of for source, (as_of, _) in newest.items()}
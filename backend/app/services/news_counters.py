@@ -0,0 +1,77 @@
+"""
+Incrementally maintained news counters.
+
+``/dashboard/news`` used to run a ``GROUP BY source`` and a ``count(*)`` over
+the whole ``news`` table on every call.  Writers now bump
+``news_source_count`` in the same transaction as their inserts, so the
+facet and unfiltered totals are a read of a handful of rows.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+from collections import Counter
+from typing import Dict, Iterable, Mapping
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import dialect_insert
+from app.models import News, NewsSourceCount
+
+logger = logging.getLogger(__name__)
+
+_table = NewsSourceCount.__table__
+
+
+def increment_source_counts(conn: Connection, sources: Iterable[str]) -> None:
+    """Add one to the counter of every source in ``sources`` (one per row written)."""
+    counts = Counter(sources)
+    if not counts:
+        return
+    _add(conn, counts)
+
+
+def _add(conn: Connection, counts: Mapping[str, int]) -> None:
+    stmt = dialect_insert(_table, conn.dialect.name)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_table.c.source],
+        set_={
+            "count": _table.c.count + stmt.excluded.count,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    now = dt.datetime.utcnow()
+    conn.execute(
+        stmt,
+        [{"source": s, "count": n, "updated_at": now} for s, n in counts.items()],
+    )
+
+
+def rebuild_source_counts(conn: Connection) -> int:
+    """Recompute all counters from ``news``; returns the number of sources."""
+    conn.execute(delete(_table))
+    counts = dict(
+        conn.execute(select(News.source, func.count(News.id)).group_by(News.source)).all()
+    )
+    if counts:
+        _add(conn, counts)
+    return len(counts)
+
+
+def backfill_if_empty(conn: Connection) -> int:
+    """Populate the counters once for databases created before they existed."""
+    if conn.execute(select(_table.c.source).limit(1)).first() is not None:
+        return 0
+    if conn.execute(select(News.id).limit(1)).first() is None:
+        return 0
+    written = rebuild_source_counts(conn)
+    logger.info("Backfilled news_source_count with %d sources", written)
+    return written
+
+
+async def load_source_counts(db: AsyncSession) -> Dict[str, int]:
+    """``{source: article_count}`` straight from the counter table."""
+    result = await db.execute(select(_table.c.source, _table.c.count))
+    return {source: count for source, count in result.all()}
@@ -0,0 +1,204 @@
+"""
+Full-text search over ``news.title`` / ``news.description``.
+
+``ILIKE '%term%'`` cannot use an index, so every search scanned the whole
+``news`` table.  Each backend gets an indexed search structure:
+
+- **PostgreSQL** – a generated ``search_vector tsvector`` column (title
+  weighted ``A``, description ``B``) with a GIN index, added to existing
+  tables by migration ``0006_news_search_vector`` (the stored column
+  rewrites ``news``).  :func:`ensure_search_index` (run by ``init_db``)
+  only creates it while ``news`` is still empty.  Ranked with
+  ``ts_rank_cd``, snippets via ``ts_headline``.
+- **SQLite** – an external-content FTS5 table ``news_fts`` kept in sync by
+  triggers, created by :func:`ensure_search_index`.  Ranked with ``bm25``,
+  snippets via ``snippet()``.  It is keyed on the implicit ``rowid`` of
+  the UUID-keyed ``news`` table, which ``VACUUM`` may renumber: startup
+  checks the index against ``news`` and rebuilds it on mismatch; call
+  :func:`rebuild_search_index` after vacuuming a running database.
+
+Every search term is prefix-matched (``term:*`` / ``"term"*``), so partial
+words typed into the dashboard already hit.  When the structure is missing
+(``init_db`` never ran, unsupported backend) :func:`ranked_search` returns
+``None`` and callers keep the ``ILIKE`` path.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from typing import List, Optional
+
+from sqlalchemy import column, func, inspect, literal_column, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DatabaseError
+from sqlalchemy.sql import Select
+
+from app.core.schema import schema
+from app.models import News
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "news_fts"
+VECTOR_COLUMN = "search_vector"
+MARK_START, MARK_END = "<mark>", "</mark>"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# mirrored by migration 0006_news_search_vector
+_PG_DDL = (
+    f"""
+    ALTER TABLE news ADD COLUMN IF NOT EXISTS {VECTOR_COLUMN} tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    f"CREATE INDEX IF NOT EXISTS ix_news_{VECTOR_COLUMN} ON news USING GIN ({VECTOR_COLUMN})",
+)
+
+_SQLITE_DDL = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, content='news', content_rowid='rowid'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS news_fts_ai AFTER INSERT ON news BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS news_fts_ad AFTER DELETE ON news BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.rowid, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS news_fts_au AFTER UPDATE OF title, description ON news BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.rowid, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+)
+
+
+# --------------------------------------------------------------------------- #
+# DDL
+# --------------------------------------------------------------------------- #
+def ensure_search_index(conn: Connection) -> bool:
+    """Create the backend's search structure if missing; ``True`` when present.
+
+    Idempotent.  On PostgreSQL the column is only added to an empty ``news``
+    table; populated ones need migration ``0006_news_search_vector``.  A
+    freshly created FTS5 table is filled from existing rows, an existing one
+    is rebuilt if its rowids no longer match ``news``.
+    """
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        columns = {c["name"] for c in inspect(conn).get_columns("news")}
+        if VECTOR_COLUMN in columns:
+            return True
+        if conn.execute(text("SELECT EXISTS (SELECT 1 FROM news)")).scalar():
+            logger.warning(
+                "news.%s missing: run `alembic upgrade head` for ranked search",
+                VECTOR_COLUMN,
+            )
+            return False
+        for ddl in _PG_DDL:
+            conn.execute(text(ddl))
+        return True
+    if dialect == "sqlite":
+        existed = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        ).first()
+        try:
+            for ddl in _SQLITE_DDL:
+                conn.execute(text(ddl))
+        except Exception as exc:  # SQLite built without FTS5
+            logger.warning("News full-text search unavailable: %s", exc)
+            return False
+        if not existed:
+            rebuild_search_index(conn)
+        elif not _fts_in_sync(conn):
+            logger.warning("%s out of sync with news (VACUUM?); rebuilding", FTS_TABLE)
+            rebuild_search_index(conn)
+        return True
+    return False
+
+
+def _fts_in_sync(conn: Connection) -> bool:
+    # rank=1 also compares the index against the content table
+    try:
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('integrity-check', 1)"
+        ))
+    except DatabaseError:
+        return False
+    return True
+
+
+def rebuild_search_index(conn: Connection) -> None:
+    """Re-index ``news_fts`` from ``news`` (SQLite; e.g. after ``VACUUM``)."""
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def search_available(dialect_name: str) -> bool:
+    """Whether the search structure exists (per the schema registry)."""
+    if dialect_name == "postgresql":
+        return schema.has_column("news", VECTOR_COLUMN)
+    if dialect_name == "sqlite":
+        return schema.has_table(FTS_TABLE)
+    return False
+
+
+# --------------------------------------------------------------------------- #
+# Queries
+# --------------------------------------------------------------------------- #
+def search_terms(query: str) -> List[str]:
+    """Word tokens of a user query; punctuation and operators are dropped."""
+    return _TOKEN.findall(query.lower())
+
+
+def ranked_search(stmt: Select, query: str, dialect_name: str) -> Optional[Select]:
+    """Restrict ``stmt`` (a ``select(News)``) to matches of ``query``.
+
+    Adds ``relevance`` (higher is better) and ``snippet`` columns and orders by
+    relevance, newest first on ties.  Returns ``None`` when full-text search
+    is unavailable or the query has no word tokens.
+    """
+    terms = search_terms(query)
+    if not terms or not search_available(dialect_name):
+        return None
+
+    if dialect_name == "postgresql":
+        tsquery = func.to_tsquery("english", " & ".join(f"{t}:*" for t in terms))
+        vector = literal_column(f"news.{VECTOR_COLUMN}")
+        rank = func.ts_rank_cd(vector, tsquery)
+        snippet = func.ts_headline(
+            "english",
+            func.coalesce(News.description, News.title),
+            tsquery,
+            f"StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=35, MinWords=15",
+        )
+        stmt = stmt.where(vector.op("@@")(tsquery))
+    else:
+        fts = literal_column(FTS_TABLE)
+        match = " ".join(f'"{t}"*' for t in terms)
+        # bm25 is lower-is-better; negate so both backends sort DESC.  Title
+        # hits weigh ten times description hits, mirroring the A/B weights.
+        rank = -func.bm25(fts, 10.0, 1.0)
+        snippet = func.snippet(fts, -1, MARK_START, MARK_END, "…", 24)
+        fts_rows = table(FTS_TABLE, column("rowid"))
+        stmt = stmt.join(
+            fts_rows, fts_rows.c.rowid == literal_column("news.rowid")
+        ).where(fts.op("MATCH")(match))
+
+    # not ``rank``: that is a hidden FTS5 column
+    rank = rank.label("relevance")
+    return stmt.add_columns(rank, snippet.label("snippet")).order_by(
+        rank.desc(), News.published_at.desc(), News.id.desc()
+    )
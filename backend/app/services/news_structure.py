@@ -0,0 +1,162 @@
+"""
+Structured intel fields of ``news`` rows.
+
+The intel model already answers with ``impact_level``, ``opportunity_risk``,
+``sectors_affected`` and ``geo_regions``; :func:`structured_fields`
+normalises them for the indexed ``news`` columns written by
+``external_fetcher.fetch``.  Rows stored before those columns existed are
+recovered from their title tags and the formatted description by
+:func:`backfill_structured_columns` – once from ``init_db`` (Alembic
+revision ``0007_news_structured_columns`` carries a frozen copy), or on
+demand::
+
+    celery -A app.core.celery_app call app.services.news_structure.backfill
+"""
+from __future__ import annotations
+
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+from uuid import UUID
+
+from sqlalchemy import bindparam, exists, func, or_, select, type_coerce, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Connection
+
+from app.core.celery_app import celery_app
+from app.core.database import get_engine
+from app.models import News
+
+logger = logging.getLogger(__name__)
+
+IMPACT_LEVELS = ("critical", "high", "medium")
+OPPORTUNITY_RISK = ("opportunity", "risk", "both")
+
+_BATCH = 1000
+
+# Lines written by ``external_fetcher._format_news_description``
+_DESCRIPTION_FIELDS = {
+    "impact_level": re.compile(r"\*\*Impact Level\*\*:\s*(\w+)"),
+    "opportunity_risk": re.compile(r"\*\*Type\*\*:\s*(\w+)"),
+    "sectors_affected": re.compile(r"\*\*Sectors\*\*:\s*([^\n]+)"),
+    "geo_regions": re.compile(r"\*\*Regions\*\*:\s*([^\n]+)"),
+}
+
+
+def _choice(value: Any, allowed: Iterable[str]) -> Optional[str]:
+    value = str(value or "").strip().lower()
+    return value if value in allowed else None
+
+
+def _slugs(values: Any) -> Optional[List[str]]:
+    if isinstance(values, str):
+        values = values.split(",")
+    if not isinstance(values, (list, tuple)):
+        return None
+    slugs = [re.sub(r"[\s-]+", "_", str(v).strip().lower()) for v in values]
+    return [s for s in slugs if s] or None
+
+
+def structured_fields(item: Mapping[str, Any]) -> Dict[str, Any]:
+    """Column values for one intel item as returned by the model."""
+    return {
+        "impact_level": _choice(item.get("impact_level"), IMPACT_LEVELS),
+        "opportunity_risk": _choice(item.get("opportunity_risk"), OPPORTUNITY_RISK),
+        "sectors_affected": _slugs(item.get("sectors_affected")),
+        "geo_regions": _slugs(item.get("geo_regions")),
+    }
+
+
+def parse_legacy(title: str, description: Optional[str]) -> Dict[str, Any]:
+    """Recover the structured fields of a row stored before the columns existed."""
+    found: Dict[str, Any] = {}
+    for field, pattern in _DESCRIPTION_FIELDS.items():
+        match = pattern.search(description or "")
+        if match:
+            found[field] = match.group(1)
+    fields = structured_fields(found)
+
+    # title tags predate the description format
+    if fields["impact_level"] is None:
+        fields["impact_level"] = next(
+            (level for level in IMPACT_LEVELS if f"[{level.upper()}]" in title), None
+        )
+    if fields["opportunity_risk"] is None:
+        if "[OPPORTUNITY]" in title:
+            fields["opportunity_risk"] = "opportunity"
+        elif "[RISK]" in title:
+            fields["opportunity_risk"] = "risk"
+    return fields
+
+
+# --------------------------------------------------------------------------- #
+# Filters
+# --------------------------------------------------------------------------- #
+def array_contains(column, value: str, dialect_name: str):
+    """``value`` is an element of the JSON array ``column``.
+
+    PostgreSQL uses JSONB ``@>`` (GIN-indexed); SQLite expands the array
+    with ``json_each``.
+    """
+    if dialect_name == "postgresql":
+        return type_coerce(column, JSONB).contains([value])
+    elements = func.json_each(column).table_valued("value")
+    return exists().select_from(elements).where(elements.c.value == value)
+
+
+# --------------------------------------------------------------------------- #
+# Backfill
+# --------------------------------------------------------------------------- #
+def _pending(after: Optional[UUID], limit: int):
+    stmt = select(News.id, News.title, News.description).where(
+        News.impact_level.is_(None),
+        News.opportunity_risk.is_(None),
+        News.sectors_affected.is_(None),
+        News.geo_regions.is_(None),
+        or_(News.title.contains("["), News.description.contains("**")),
+    )
+    if after is not None:
+        stmt = stmt.where(News.id > after)
+    return stmt.order_by(News.id).limit(limit)
+
+
+def backfill_structured_columns(
+    conn: Connection, *, batch_size: int = _BATCH, commit: bool = False
+) -> int:
+    """Fill the structured columns of rows that carry only tags; returns rows updated.
+
+    Only rows where every structured column is NULL are considered, so the
+    backfill is idempotent and never overwrites values written by ``fetch``.
+    Rows are read in keyset-paginated batches of ``batch_size`` (by ``id``;
+    rows without recoverable tags stay pending, so the filter alone would
+    not advance); with ``commit`` each batch is committed on ``conn``.
+    """
+    table = News.__table__
+    stmt = update(table).where(table.c.id == bindparam("row_id"))
+    updated = 0
+    after: Optional[UUID] = None
+    while True:
+        rows = conn.execute(_pending(after, batch_size)).all()
+        if not rows:
+            break
+        params = []
+        for row in rows:
+            fields = parse_legacy(row.title, row.description)
+            if any(v is not None for v in fields.values()):
+                params.append({"row_id": row.id, **fields})
+        if params:
+            conn.execute(stmt, params)
+            updated += len(params)
+        if commit:
+            conn.commit()
+        after = rows[-1].id
+    if updated:
+        logger.info("Backfilled structured columns of %d news rows", updated)
+    return updated
+
+
+@celery_app.task(name="app.services.news_structure.backfill")
+def backfill() -> int:
+    """One-off backfill of the structured news columns."""
+    with get_engine().connect() as conn:
+        return backfill_structured_columns(conn, commit=True)
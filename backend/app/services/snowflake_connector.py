@@ -1,57 +1,389 @@
-"""Helpers to read KPI data from Snowflake."""
+"""Helpers to read KPI data from Snowflake.
 
+Companies are extracted concurrently on a bounded thread pool
+(``KPI_EXTRACT_CONCURRENCY``) and streamed to the caller in cleaned batches
+of ``KPI_EXTRACT_BATCH_SIZE`` rows (see :func:`stream_kpis`).  Connections are pooled per DSN and reused
+across ETL runs: at most ``KPI_EXTRACT_PER_DSN`` queries run against one
+warehouse at a time, and connections idle for longer than
+``KPI_EXTRACT_IDLE_SECONDS`` are closed.
+
+Both limits hold across Celery workers too: every extraction takes one of
+``KPI_EXTRACT_CONCURRENCY`` global and ``KPI_EXTRACT_PER_DSN`` per-warehouse
+slots in Redis (:func:`shared_slot`), since the sync runs one subtask per
+source on any number of workers.  The shared ``SNOWFLAKE_DSN`` is extracted
+per company, so it fans out like tenant warehouses do.
+"""
+
+import atexit
+import datetime as dt
+import hashlib
+import logging
 import os
-from typing import List, Dict
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+from uuid import UUID
 
 import pandas as pd
+import redis
 import snowflake.connector
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.core.database import get_engine
+from app.core.settings import settings
 from app.models import Company
+from app.services.kpi_watermark import SHARED_SOURCE, extract_bound, is_shared_source, shared_source
 
+logger = logging.getLogger(__name__)
 
-def fetch_table(dsn: str, query: str) -> pd.DataFrame:
-    """Execute ``query`` using the given DSN and return a ``DataFrame``."""
+KPI_QUERY = "SELECT company_id, metric, value, as_of FROM kpi"
+
+_SLOT_PREFIX = "kpi-extract-slot"
+_SLOT_POLL_SECONDS = 0.5
+
+_redis = redis.Redis.from_url(settings.REDIS_URL)
 
-    ctx = snowflake.connector.connect(**snowflake.connector.parse_account(dsn))
+
+@contextmanager
+def shared_slot(name: str, limit: int) -> Iterator[None]:
+    """Hold one of ``limit`` slots of ``name``, shared by every worker.
+
+    Slots are Redis keys set with ``NX`` that expire after
+    ``KPI_SYNC_TIME_LIMIT``, so a killed worker cannot keep one.  Waits for
+    a free slot; when Redis is unreachable only the per-process limits
+    apply.
+    """
+    token = uuid.uuid4().hex.encode()
+    keys = [f"{_SLOT_PREFIX}:{name}:{i}" for i in range(max(1, limit))]
+    held = None
+    try:
+        while held is None:
+            held = next(
+                (k for k in keys if _redis.set(k, token, nx=True, ex=settings.KPI_SYNC_TIME_LIMIT)),
+                None,
+            )
+            if held is None:
+                time.sleep(_SLOT_POLL_SECONDS)
+    except redis.RedisError as exc:
+        logger.warning("Shared extraction slot %s unavailable: %s", name, exc)
     try:
-        cur = ctx.cursor().execute(query)
-        return cur.fetch_pandas_all()
+        yield
     finally:
+        if held is not None:
+            try:
+                if _redis.get(held) == token:
+                    _redis.delete(held)
+            except redis.RedisError as exc:
+                logger.warning("Releasing extraction slot %s failed: %s", held, exc)
+
+
+def _dsn_key(dsn: str) -> str:
+    # credentials stay out of Redis
+    return hashlib.sha256(dsn.encode()).hexdigest()[:16]
+
+
+def _connect(dsn: str):
+    return snowflake.connector.connect(**snowflake.connector.parse_account(dsn))
+
+
+def _close(ctx) -> None:
+    try:
         ctx.close()
+    except Exception:  # already gone server-side
+        logger.debug("Closing a warehouse connection failed", exc_info=True)
 
 
-def query_kpis() -> List[Dict]:
-    """Return KPI rows from Snowflake as a list of dictionaries."""
+class _DsnPool:
+    """Reusable connections to one warehouse, at most ``limit`` in use at once."""
 
-    query = "SELECT company_id, metric, value, as_of FROM kpi"
-    rows: List[Dict] = []
+    def __init__(self, dsn: str, limit: int) -> None:
+        self.dsn = dsn
+        self._slots = threading.BoundedSemaphore(max(1, limit))
+        self._idle: Deque[Tuple[Any, float]] = deque()  # (connection, released at)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        with self._slots, shared_slot(f"dsn:{_dsn_key(self.dsn)}", settings.KPI_EXTRACT_PER_DSN):
+            ctx = self._checkout()
+            try:
+                yield ctx
+            except BaseException:
+                # the session may be mid-query or broken: don't hand it out again
+                _close(ctx)
+                raise
+            with self._lock:
+                self._idle.append((ctx, time.monotonic()))
+
+    def _checkout(self):
+        with self._lock:
+            self._evict(time.monotonic())
+            while self._idle:
+                ctx, _ = self._idle.pop()  # most recently used first
+                if not ctx.is_closed():
+                    return ctx
+        return _connect(self.dsn)
+
+    def _evict(self, now: float) -> int:
+        evicted = 0
+        while self._idle and now - self._idle[0][1] > settings.KPI_EXTRACT_IDLE_SECONDS:
+            _close(self._idle.popleft()[0])
+            evicted += 1
+        return evicted
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            return self._evict(time.monotonic())
+
+    def close(self) -> None:
+        with self._lock:
+            while self._idle:
+                _close(self._idle.pop()[0])
+
+
+_pools: Dict[str, _DsnPool] = {}
+_pools_lock = threading.Lock()
+
+
+def pool_for(dsn: str) -> _DsnPool:
+    with _pools_lock:
+        pool = _pools.get(dsn)
+        if pool is None:
+            pool = _pools[dsn] = _DsnPool(dsn, settings.KPI_EXTRACT_PER_DSN)
+        return pool
+
+
+def close_idle() -> int:
+    """Close pooled connections idle past ``KPI_EXTRACT_IDLE_SECONDS``."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return sum(pool.evict_idle() for pool in pools)
+
+
+@atexit.register
+def close_all() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _fetch(ctx, query: str, params: Optional[Mapping[str, Any]]) -> pd.DataFrame:
+    return ctx.cursor().execute(query, params).fetch_pandas_all()
+
+
+def _fetch_batches(ctx, query: str, params: Optional[Mapping[str, Any]]) -> Iterator[pd.DataFrame]:
+    return ctx.cursor().execute(query, params).fetch_pandas_batches()
 
-    def _load(dsn: str, company_id=None) -> None:
-        df = fetch_table(dsn, query)
-        for r in df.to_dict("records"):
-            rows.append(
-                {
-                    "company_id": r.get("company_id", company_id),
-                    "metric": r["metric"],
-                    "value": r["value"],
-                    "as_of": r["as_of"],
-                }
-            )
 
+def fetch_table(dsn: str, query: str, params: Optional[Mapping[str, Any]] = None) -> pd.DataFrame:
+    """Execute ``query`` using the given DSN and return a ``DataFrame``."""
+
+    with pool_for(dsn).connection() as ctx:
+        return _fetch(ctx, query, params)
+
+
+def extraction_sources(only: Optional[Sequence[str]] = None) -> List[Tuple[str, str, Optional[str]]]:
+    """``(source, dsn, company_id)`` of every warehouse to extract, or of the
+    sources named in ``only``.
+
+    The shared ``SNOWFLAKE_DSN`` yields one source per company
+    (:func:`~app.services.kpi_watermark.shared_source`); ``"*"`` in ``only``
+    selects all of them.
+    """
     env_dsn = os.getenv("SNOWFLAKE_DSN")
     if env_dsn:
-        _load(env_dsn)
-        return rows
+        sources = [(shared_source(cid), env_dsn, cid) for cid in _company_ids()]
+        if only is not None and SHARED_SOURCE not in only:
+            sources = [s for s in sources if s[0] in only]
+        return sources
 
+    stmt = select(Company.id, Company.snowflake_dsn).where(Company.snowflake_dsn.is_not(None))
+    if only is not None:
+        stmt = stmt.where(Company.id.in_([UUID(s) for s in only if s != SHARED_SOURCE]))
     engine = get_engine()
     with Session(engine) as sess:
-        for cid, dsn in sess.execute(
-            select(Company.id, Company.snowflake_dsn).where(Company.snowflake_dsn.is_not(None))
-        ):
-            if dsn:
-                _load(dsn, str(cid))
+        return [(str(cid), dsn, str(cid)) for cid, dsn in sess.execute(stmt) if dsn]
+
+
+def _company_ids() -> List[str]:
+    with Session(get_engine()) as sess:
+        return [str(cid) for cid in sess.execute(select(Company.id)).scalars()]
+
+
+def _rechunk(df: pd.DataFrame, size: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), size):
+        yield df.iloc[start:start + size]
+
+
+def clean_batch(df: pd.DataFrame, company_id: Optional[str] = None) -> pd.DataFrame:
+    """Normalise one warehouse batch to ``company_id``/``metric``/``value``/``as_of``.
+
+    Snowflake upper-cases column names; a missing ``company_id`` falls back
+    to the source's company, ``as_of`` becomes UTC and rows without a
+    usable value or timestamp are dropped.
+    """
+    df = df.rename(columns=str.lower)
+    company = df["company_id"] if "company_id" in df else pd.Series(None, index=df.index, dtype=object)
+    if company_id is not None:
+        company = company.fillna(company_id)
+    out = pd.DataFrame({
+        "company_id": company,
+        "metric": df["metric"],
+        "value": pd.to_numeric(df["value"], errors="coerce").astype("float64"),
+        "as_of": pd.to_datetime(df["as_of"], utc=True, errors="coerce"),
+    })
+    out = out.dropna()
+    out["company_id"] = out["company_id"].astype(str)
+    return out
+
+
+def _extract(
+    source: str,
+    dsn: str,
+    company_id: Optional[str],
+    since: Optional[dt.datetime],
+    emit,
+) -> Dict[str, Any]:
+    """Stream one source's rows to ``emit`` in cleaned batches; returns its timing."""
+    conditions, params = [], {}
+    if is_shared_source(source):
+        conditions.append("company_id = %(company_id)s")
+        params["company_id"] = company_id
+    if since is not None:
+        conditions.append("as_of > %(since)s")
+        params["since"] = since
+    query = f"{KPI_QUERY} WHERE {' AND '.join(conditions)}" if conditions else KPI_QUERY
+
+    rows = 0
+    started = time.perf_counter()
+    with shared_slot("all", settings.KPI_EXTRACT_CONCURRENCY), pool_for(dsn).connection() as ctx:
+        connected = time.perf_counter()
+        for raw in _fetch_batches(ctx, query, params or None):
+            for chunk in _rechunk(raw, settings.KPI_EXTRACT_BATCH_SIZE):
+                batch = clean_batch(chunk, company_id)
+                if len(batch):
+                    emit(batch)
+                    rows += len(batch)
+    fetched = time.perf_counter()
+    return {
+        "source": source,
+        "rows": rows,
+        "wait": round(connected - started, 3),    # free slot + connection
+        "seconds": round(fetched - connected, 3),  # query + fetch, incl. back-pressure
+    }
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def stream_kpis(
+    since: Optional[Mapping[str, dt.datetime]] = None,
+    timings: Optional[List[Dict[str, Any]]] = None,
+    only: Optional[Sequence[str]] = None,
+) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Yield ``(source, batch)`` of every source (or those in ``only``),
+    extracted concurrently.
+
+    Batches hold at most ``KPI_EXTRACT_BATCH_SIZE`` cleaned rows and pass
+    through a queue of ``KPI_EXTRACT_QUEUE_SIZE``: extraction threads block
+    while the consumer is busy, so memory stays bounded by roughly
+    ``(KPI_EXTRACT_QUEUE_SIZE + KPI_EXTRACT_CONCURRENCY)`` batches whatever
+    the extract size.
+
+    Once a source is done its timing entry is appended to ``timings``; a
+    source whose query fails gets an ``error`` there (batches it already
+    yielded stay yielded) and the others carry on.
+    """
+    since = since or {}
+    timings = timings if timings is not None else []
+    sources = extraction_sources(only)
+    if not sources:
+        return
+
+    batches: "queue.Queue[Tuple[str, Optional[pd.DataFrame], Optional[Dict]]]" = queue.Queue(
+        maxsize=max(1, settings.KPI_EXTRACT_QUEUE_SIZE)
+    )
+    stop = threading.Event()
+
+    def _put(item) -> None:
+        while True:
+            if stop.is_set():
+                raise _Cancelled
+            try:
+                batches.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _produce(source: str, dsn: str, company_id: Optional[str]) -> None:
+        try:
+            timing = _extract(
+                source, dsn, company_id, extract_bound(since, source),
+                lambda batch: _put((source, batch, None)),
+            )
+        except _Cancelled:
+            return
+        except Exception as exc:
+            logger.exception("KPI extraction of %s failed", source)
+            timing = {"source": source, "rows": 0, "error": repr(exc)}
+        try:
+            _put((source, None, timing))
+        except _Cancelled:
+            pass
+
+    workers = max(1, min(settings.KPI_EXTRACT_CONCURRENCY, len(sources)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kpi-extract") as pool:
+        for source, dsn, company_id in sources:
+            pool.submit(_produce, source, dsn, company_id)
+        try:
+            remaining = len(sources)
+            while remaining:
+                source, batch, timing = batches.get()
+                if batch is None:
+                    logger.debug("KPI extraction: %s", timing)
+                    timings.append(timing)
+                    remaining -= 1
+                    continue
+                yield source, batch
+        finally:
+            # consumer gone (done or failed): unblock and stop the producers
+            stop.set()
+
+    close_idle()
+
+
+def extract_kpis(
+    since: Optional[Mapping[str, dt.datetime]] = None,
+) -> Tuple[List[Dict], List[Dict[str, Any]]]:
+    """Extract KPI rows of every source concurrently into one list.
+
+    Returns the rows and one timing entry per source (see
+    :func:`stream_kpis`).  The ETL streams instead; this is for callers
+    that want everything in memory.
+    """
+    rows: List[Dict] = []
+    timings: List[Dict[str, Any]] = []
+    for source, batch in stream_kpis(since, timings):
+        rows.extend({**r, "source": source} for r in batch.to_dict("records"))
+    return rows, timings
+
+
+def query_kpis(since: Optional[Mapping[str, dt.datetime]] = None) -> List[Dict]:
+    """Return KPI rows from Snowflake as a list of dictionaries.
+
+    ``since`` maps an extraction source (company id, or ``"*:<company id>"``
+    for the shared ``SNOWFLAKE_DSN``) to the ``as_of`` lower bound of its query;
+    sources without an entry are read in full.  Every row carries its
+    ``source`` so the caller can advance the watermarks.
+    """
 
-    return rows
\ No newline at end of file
+    return extract_kpis(since)[0]
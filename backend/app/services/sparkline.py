@@ -0,0 +1,226 @@
+"""
+Server-side sparkline series for the dashboard tiles.
+
+Raw history for every metric that is not cached yet is read with *one*
+query – per request, even for a whole portfolio of companies – then reduced to ``SPARKLINE_POINTS`` points with
+Largest-Triangle-Three-Buckets (LTTB) in NumPy.  A series with fewer than
+``SPARKLINE_MAX_RAW_POINTS`` hot rows is topped up with the newest archived
+rows before its oldest hot one (see :mod:`app.services.kpi_archive`), so
+archiving does not shorten the tiles.  Results are cached per
+``(company_id, metric, watermark)`` where the watermark is the
+``kpi_latest.updated_at`` stamp – any write to a metric invalidates it.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import bindparam, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.schema import schema
+from app.core.settings import settings
+from app.models import Kpi
+from app.services.kpi_archive import archive_batches, has_archive
+from app.services.kpi_snapshot import KpiSnapshot
+
+
+# --------------------------------------------------------------------------- #
+# LTTB
+# --------------------------------------------------------------------------- #
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Return the indices of the ``n_out`` points LTTB keeps.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    selected point and the average of the next bucket.  Work inside each
+    bucket is vectorised, so the Python loop runs ``n_out`` times regardless
+    of the input size.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # bucket boundaries for the n-2 interior points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    # mean of every bucket, used as the third triangle vertex
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.append(sums_x / counts, x[-1])
+    mean_y = np.append(sums_y / counts, y[-1])
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        cx, cy = mean_x[i + 1], mean_y[i + 1]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def _utc(ts: datetime) -> datetime:
+    # SQLite returns naive UTC, which ``timestamp()`` would read as local time
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+def downsample(as_of: Sequence[datetime], values: Sequence[float], n_out: int) -> List[float]:
+    """Downsample one chronological series to at most ``n_out`` values."""
+    y = np.asarray(values, dtype=np.float64)
+    x = np.fromiter((_utc(t).timestamp() for t in as_of), dtype=np.float64, count=len(y))
+    return y[lttb(x, y, n_out)].round(4).tolist()
+
+
+# --------------------------------------------------------------------------- #
+# Cache
+# --------------------------------------------------------------------------- #
+class _SparkCache:
+    """Tiny LRU keyed by ``(company_id, metric, watermark)``."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, List[float]]" = OrderedDict()
+
+    def get(self, key: Hashable):
+        try:
+            self._data.move_to_end(key)
+            return self._data[key]
+        except KeyError:
+            return None
+
+    def put(self, key: Hashable, value: List[float]) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+_cache = _SparkCache(settings.SPARKLINE_CACHE_SIZE)
+
+
+def _history_statement():
+    """Newest ``:max_raw`` rows after ``:since`` of each requested
+    ``(company_id, metric)``, chronological."""
+    ranked = (
+        select(
+            Kpi.company_id,
+            Kpi.metric,
+            Kpi.as_of,
+            Kpi.value,
+            func.row_number()
+            .over(partition_by=(Kpi.company_id, Kpi.metric), order_by=Kpi.as_of.desc())
+            .label("rn"),
+        )
+        .where(
+            # the plain INs let SQLite search the (company_id, metric, as_of)
+            # index; the row-value IN keeps the result exact
+            Kpi.company_id.in_(bindparam("company_ids", expanding=True)),
+            Kpi.metric.in_(bindparam("metrics", expanding=True)),
+            tuple_(Kpi.company_id, Kpi.metric).in_(bindparam("series", expanding=True)),
+            # bounds the partitions scanned on PostgreSQL
+            Kpi.as_of >= bindparam("since"),
+        )
+        .subquery("history")
+    )
+    return (
+        select(ranked.c.company_id, ranked.c.metric, ranked.c.as_of, ranked.c.value)
+        .where(ranked.c.rn <= bindparam("max_raw"))
+        .order_by(ranked.c.company_id, ranked.c.metric, ranked.c.as_of)
+    )
+
+
+def _archived_tails(
+    company_id: UUID, needs: Mapping[str, Tuple[Optional[datetime], int]], since: datetime
+) -> Dict[str, Tuple[List, List]]:
+    """``{metric: (as_of, values)}``: for each ``metric: (before, n)`` in
+    ``needs``, the newest ``n`` archived points after ``since`` and before
+    ``before`` (the oldest hot point, if any), chronological."""
+    points: Dict[str, List[Tuple[datetime, float]]] = defaultdict(list)
+    for batch in archive_batches(company_id, ("metric", "as_of", "value"), list(needs), start=since):
+        for metric, as_of, value in batch:
+            before = needs[metric][0]
+            if before is None or as_of < before:
+                points[metric].append((as_of, value))
+
+    tails = {}
+    for metric, rows in points.items():
+        rows.sort()
+        rows = rows[-needs[metric][1]:]
+        tails[metric] = ([t for t, _ in rows], [v for _, v in rows])
+    return tails
+
+
+async def load_sparklines(
+    db: AsyncSession, company_id: UUID, snapshot: Sequence[KpiSnapshot]
+) -> Dict[str, List[float]]:
+    """Return ``{metric: spark}`` for every metric in ``snapshot``."""
+    sparks = await load_portfolio_sparklines(db, {company_id: snapshot})
+    return sparks[company_id]
+
+
+async def load_portfolio_sparklines(
+    db: AsyncSession, snapshots: Mapping[UUID, Sequence[KpiSnapshot]]
+) -> Dict[UUID, Dict[str, List[float]]]:
+    """Return ``{company_id: {metric: spark}}``; one query for all cache misses."""
+    sparks: Dict[UUID, Dict[str, List[float]]] = {cid: {} for cid in snapshots}
+    missing: Dict[Tuple[UUID, str], Tuple] = {}
+    for company_id, snapshot in snapshots.items():
+        for s in snapshot:
+            key = (company_id, s.metric, s.updated_at or s.as_of)
+            cached = _cache.get(key)
+            if cached is None:
+                missing[(company_id, s.metric)] = key
+            else:
+                sparks[company_id][s.metric] = cached
+    if not missing:
+        return sparks
+
+    max_raw = settings.SPARKLINE_MAX_RAW_POINTS
+    since = datetime.now(timezone.utc) - timedelta(days=settings.KPI_QUERY_LOOKBACK_DAYS)
+    company_ids = list({cid for cid, _ in missing})
+    stmt = schema.cached("sparkline_history", _history_statement)
+    result = await db.execute(
+        stmt,
+        {
+            "series": list(missing),
+            "company_ids": company_ids,
+            "metrics": list({metric for _, metric in missing}),
+            "max_raw": max_raw,
+            "since": since,
+        },
+    )
+    series: Dict[Tuple[UUID, str], Tuple[List, List]] = defaultdict(lambda: ([], []))
+    for company_id, metric, as_of, value in result:
+        xs, ys = series[(company_id, metric)]
+        xs.append(as_of)
+        ys.append(value)
+
+    # short series: prepend archived history (one scan per archived company)
+    archived = {cid for cid in company_ids if has_archive(cid)}
+    needs: Dict[UUID, Dict[str, Tuple[Optional[datetime], int]]] = defaultdict(dict)
+    for company_id, metric in missing:
+        xs, _ = series.get((company_id, metric), ([], []))
+        if company_id in archived and len(xs) < max_raw:
+            needs[company_id][metric] = (_utc(xs[0]) if xs else None, max_raw - len(xs))
+    for company_id, wanted in needs.items():
+        tails = await asyncio.to_thread(_archived_tails, company_id, wanted, since)
+        for metric, (old_xs, old_ys) in tails.items():
+            xs, ys = series[(company_id, metric)]
+            xs[:0] = old_xs
+            ys[:0] = old_ys
+
+    for (company_id, metric), key in missing.items():
+        xs, ys = series.get((company_id, metric), ([], []))
+        spark = downsample(xs, ys, settings.SPARKLINE_POINTS) if ys else []
+        _cache.put(key, spark)
+        sparks[company_id][metric] = spark
+    return sparks
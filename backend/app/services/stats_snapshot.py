@@ -0,0 +1,144 @@
+"""
+Background-refreshed snapshot behind ``/dashboard/stats``.
+
+The endpoint used to run full ``count(*)`` scans over ``company``, ``kpi``
+and ``news`` and serialise every connected WebSocket client on each call.
+Instead, :class:`StatsSnapshot` recomputes cheap approximations every
+``STATS_SNAPSHOT_INTERVAL`` seconds in a background task and requests just
+read the last result:
+
+- **PostgreSQL** – row estimates from ``pg_class.reltuples`` (kept fresh by
+  autovacuum/ANALYZE), summed over partitions.
+- **SQLite** – ``news`` from the maintained ``news_source_count`` counters,
+  ``kpi`` from ``max(rowid)`` (an upper bound), ``company`` exactly.
+
+``news_last_24h`` is an index range count on ``news.published_at`` in both
+cases.  WebSocket figures are aggregated (:meth:`ConnectionManager.get_summary`).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import bindparam, func, literal_column, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal
+from app.core.settings import settings
+from app.models import Company, Kpi, News, NewsSourceCount
+from app.utils.broadcaster import manager
+
+logger = logging.getLogger(__name__)
+
+_TABLES = ("company", "kpi", "news")
+
+# estimate of every table, including the children of partitioned ones
+_PG_ESTIMATES = text(
+    """
+    SELECT coalesce(parent.relname, c.relname) AS name,
+           sum(greatest(c.reltuples, 0))::bigint AS estimate
+    FROM pg_class c
+    LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+    LEFT JOIN pg_class parent ON parent.oid = i.inhparent
+    WHERE coalesce(parent.relname, c.relname) IN :names
+      AND c.relkind = 'r'
+    GROUP BY 1
+    """
+).bindparams(bindparam("names", expanding=True))
+
+
+async def _approximate_counts(db: AsyncSession) -> Dict[str, int]:
+    if db.get_bind().dialect.name == "postgresql":
+        rows = await db.execute(_PG_ESTIMATES, {"names": list(_TABLES)})
+        counts = {name: 0 for name in _TABLES}
+        counts.update({name: int(estimate) for name, estimate in rows})
+        return counts
+    return {
+        "company": await db.scalar(select(func.count(Company.id))) or 0,
+        "kpi": await db.scalar(select(func.max(literal_column("kpi.rowid"))).select_from(Kpi)) or 0,
+        "news": await db.scalar(select(func.sum(NewsSourceCount.count))) or 0,
+    }
+
+
+async def _recent_news(db: AsyncSession) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
+    return await db.scalar(
+        select(func.count()).select_from(News).where(News.published_at >= cutoff)
+    ) or 0
+
+
+async def exact_counts(db: AsyncSession) -> Dict[str, Any]:
+    """Exact global figures (full scans) for ``/stats?exact=true``."""
+    return {
+        "total_companies": await db.scalar(select(func.count(Company.id))),
+        "total_kpis": await db.scalar(select(func.count(Kpi.id))),
+        "total_news": await db.scalar(select(func.count(News.id))),
+        "news_last_24h": await _recent_news(db),
+    }
+
+
+class StatsSnapshot:
+    """Last computed stats plus the task that keeps them fresh."""
+
+    def __init__(self, interval: float, session_factory=AsyncSessionLocal) -> None:
+        self.interval = interval
+        self._session_factory = session_factory
+        self._data: Optional[Dict[str, Any]] = None
+        self._refreshed_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Recompute the snapshot now and return it."""
+        async with self._session_factory() as db:
+            counts = await _approximate_counts(db)
+            recent = await _recent_news(db)
+        self._data = {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "websocket": manager.get_summary(),
+            "global_stats": {
+                "total_companies": counts["company"],
+                "total_kpis": counts["kpi"],
+                "total_news": counts["news"],
+                "news_last_24h": recent,
+            },
+        }
+        self._refreshed_at = time.monotonic()
+        return self._data
+
+    async def get(self) -> Dict[str, Any]:
+        """Current snapshot; computed inline only before the first refresh."""
+        if self._data is None:
+            async with self._lock:
+                if self._data is None:
+                    await self.refresh()
+        return {**self._data, "age_seconds": round(time.monotonic() - self._refreshed_at, 1)}
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Stats snapshot refresh failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+stats_snapshot = StatsSnapshot(settings.STATS_SNAPSHOT_INTERVAL)
@@ -1,14 +1,233 @@
-import pandas as pd, sqlalchemy as sa
-from sqlalchemy.ext.asyncio import create_async_engine
-from functools import cache
+"""
+Async engines for tenant warehouses reachable through SQLAlchemy, one per DSN.
+
+Engines live in a bounded LRU registry (:data:`engines`) instead of an
+unbounded ``functools.cache``:
+
+- at most ``WAREHOUSE_ENGINE_CACHE_SIZE`` engines are kept; creating one
+  more disposes the least recently used engine that has no query running;
+- engines unused for ``WAREHOUSE_ENGINE_IDLE_SECONDS`` are disposed by a
+  background sweep (started with the app) and on every lookup;
+- each engine gets ``WAREHOUSE_POOL_SIZE`` + ``WAREHOUSE_MAX_OVERFLOW``
+  connections, overridable per DSN with :meth:`EngineRegistry.configure`.
+
+Disposal is ``await engine.dispose()``: idle pooled connections are closed
+and checked-out ones are discarded when returned.  :meth:`EngineRegistry.stats`
+reports hits, misses, evictions, open connections and checkout wait times.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+import pandas as pd
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    engine: AsyncEngine
+    sizing: Tuple[int, int]
+    last_used: float
+    leases: int = 0  # connections handed out by :meth:`EngineRegistry.connect`
+
+
+class EngineRegistry:
+    def __init__(self, capacity: int, idle_seconds: float) -> None:
+        self.capacity = capacity
+        self.idle_seconds = idle_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._sizing: Dict[str, Tuple[int, int]] = {}
+        self._disposing: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "hits": 0, "misses": 0, "evictions": 0, "idle_evictions": 0,
+            "checkouts": 0, "checkout_wait_total": 0.0, "checkout_wait_max": 0.0,
+        }
+
+    # ------------------------------------------------------------------ #
+    # Lookup
+    # ------------------------------------------------------------------ #
+    def _pool_sizing(self, dsn: str) -> Tuple[int, int]:
+        return self._sizing.get(dsn, (settings.WAREHOUSE_POOL_SIZE, settings.WAREHOUSE_MAX_OVERFLOW))
+
+    def _create(self, dsn: str, sizing: Tuple[int, int]) -> AsyncEngine:
+        # SQLAlchemy 2.0 style async; driver must support asyncio
+        options: Dict[str, Any] = {"pool_pre_ping": True}
+        if make_url(dsn).get_backend_name() != "sqlite":
+            options.update(
+                pool_size=sizing[0],
+                max_overflow=sizing[1],
+                pool_timeout=settings.WAREHOUSE_POOL_TIMEOUT,
+            )
+        return create_async_engine(dsn, **options)
+
+    def get(self, dsn: str) -> AsyncEngine:
+        """Engine for ``dsn``, created on first use."""
+        now = time.monotonic()
+        self._evict_idle(now)
+        entry = self._entries.get(dsn)
+        if entry is not None:
+            self._stats["hits"] += 1
+            self._entries.move_to_end(dsn)
+        else:
+            self._stats["misses"] += 1
+            sizing = self._pool_sizing(dsn)
+            entry = self._entries[dsn] = _Entry(self._create(dsn, sizing), sizing, now)
+            self._evict_overflow()
+        entry.last_used = now
+        return entry.engine
+
+    def configure(self, dsn: str, *, pool_size: int, max_overflow: int = 0) -> None:
+        """Pool sizing of one DSN; an engine built with other sizes is replaced."""
+        self._sizing[dsn] = (pool_size, max_overflow)
+        entry = self._entries.get(dsn)
+        if entry is not None and entry.sizing != self._sizing[dsn] and not entry.leases:
+            self._evict(dsn)
+
+    @asynccontextmanager
+    async def connect(self, dsn: str) -> AsyncIterator[AsyncConnection]:
+        """Pooled connection of ``dsn``; the engine is not evicted while in use."""
+        engine = self.get(dsn)
+        entry = self._entries[dsn]
+        entry.leases += 1
+        try:
+            started = time.perf_counter()
+            async with engine.connect() as conn:
+                waited = time.perf_counter() - started
+                self._stats["checkouts"] += 1
+                self._stats["checkout_wait_total"] += waited
+                self._stats["checkout_wait_max"] = max(self._stats["checkout_wait_max"], waited)
+                yield conn
+        finally:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+
+    # ------------------------------------------------------------------ #
+    # Eviction
+    # ------------------------------------------------------------------ #
+    def _evict(self, dsn: str) -> None:
+        entry = self._entries.pop(dsn)
+        try:
+            task = asyncio.get_running_loop().create_task(entry.engine.dispose())
+        except RuntimeError:  # no event loop: nothing can have been connected
+            entry.engine.sync_engine.dispose(close=False)
+            return
+        self._disposing.add(task)
+        task.add_done_callback(self._disposing.discard)
+
+    def _evict_overflow(self) -> None:
+        while len(self._entries) > self.capacity:
+            # least recently used first; engines with a query running and the
+            # one just requested (last) are kept
+            candidates = list(self._entries.items())[:-1]
+            victim = next((dsn for dsn, e in candidates if not e.leases), None)
+            if victim is None:
+                break
+            self._evict(victim)
+            self._stats["evictions"] += 1
+
+    def _evict_idle(self, now: float) -> int:
+        idle = [
+            dsn for dsn, e in self._entries.items()
+            if not e.leases and now - e.last_used > self.idle_seconds
+        ]
+        for dsn in idle:
+            self._evict(dsn)
+        self._stats["idle_evictions"] += len(idle)
+        return len(idle)
+
+    async def evict_idle(self) -> int:
+        """Dispose engines idle past ``idle_seconds``; returns how many."""
+        evicted = self._evict_idle(time.monotonic())
+        await self.drain()
+        return evicted
+
+    async def drain(self) -> None:
+        """Wait for pending disposals."""
+        if self._disposing:
+            await asyncio.gather(*list(self._disposing), return_exceptions=True)
+
+    async def dispose_all(self) -> None:
+        for dsn in list(self._entries):
+            self._evict(dsn)
+        await self.drain()
+
+    # ------------------------------------------------------------------ #
+    # Metrics / background sweep
+    # ------------------------------------------------------------------ #
+    def stats(self) -> Dict[str, Any]:
+        """Registry counters and pool usage of this process."""
+        in_use = idle = 0
+        for entry in self._entries.values():
+            pool = entry.engine.pool
+            in_use += pool.checkedout() if hasattr(pool, "checkedout") else entry.leases
+            idle += pool.checkedin() if hasattr(pool, "checkedin") else 0
+        lookups = self._stats["hits"] + self._stats["misses"]
+        checkouts = self._stats["checkouts"]
+        return {
+            "engines": len(self._entries),
+            "capacity": self.capacity,
+            "hits": self._stats["hits"],
+            "misses": self._stats["misses"],
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else None,
+            "evictions": self._stats["evictions"],
+            "idle_evictions": self._stats["idle_evictions"],
+            "connections_in_use": in_use,
+            "connections_idle": idle,
+            "checkouts": checkouts,
+            "checkout_wait_avg_ms": (
+                round(self._stats["checkout_wait_total"] / checkouts * 1000, 3) if checkouts else None
+            ),
+            "checkout_wait_max_ms": round(self._stats["checkout_wait_max"] * 1000, 3),
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_seconds / 4))
+            try:
+                evicted = await self.evict_idle()
+                if evicted:
+                    logger.info("Disposed %d idle warehouse engines", evicted)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Warehouse engine sweep failed")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.dispose_all()
+
+
+engines = EngineRegistry(settings.WAREHOUSE_ENGINE_CACHE_SIZE, settings.WAREHOUSE_ENGINE_IDLE_SECONDS)
+
+
+def get_async_engine(dsn: str) -> AsyncEngine:
+    """Engine of ``dsn`` from the bounded registry."""
+    return engines.get(dsn)
 
-@cache   # one engine per DSN
-def get_async_engine(dsn: str):
-    # SQLAlchemy 2.0 style async; driver must support asyncio
-    return create_async_engine(dsn, pool_pre_ping=True)
 
 async def fetch_df(dsn: str, query: str) -> pd.DataFrame:
-    eng = get_async_engine(dsn)
-    async with eng.connect() as conn:
+    async with engines.connect(dsn) as conn:
         df = await conn.run_sync(lambda c: pd.read_sql(query, c))
     return df
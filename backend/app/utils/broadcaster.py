@@ -16,7 +16,12 @@ import redis.asyncio as aioredis
 from fastapi import WebSocket, WebSocketDisconnect
 from starlette.websockets import WebSocketState
 
+from app.core.database import AsyncSessionLocal
 from app.core.settings import settings
+from app.models.dto import KPITile
+from app.services.kpi_events import KPI_CHANNEL
+from app.services.kpi_snapshot import load_snapshot
+from app.services.sparkline import load_sparklines
 
 # Configuration
 _CHANNEL = "ai-sync.response"
@@ -52,10 +57,15 @@ class ConnectionManager:
         self._company_subscribers: Dict[UUID, Set[WebSocket]] = defaultdict(set)
         self._redis_task: Optional[asyncio.Task] = None
         self._heartbeat_task: Optional[asyncio.Task] = None
+        # kpi-changed events waiting for / being turned into tile pushes
+        self._kpi_pending: Dict[UUID, Dict[str, Any]] = {}
+        self._kpi_running: Set[UUID] = set()
+        self._kpi_tasks: Set[asyncio.Task] = set()
         self._stats = {
             "total_connections": 0,
             "total_messages": 0,
             "total_errors": 0,
+            "kpi_updates": 0,
             "start_time": time.time()
         }
     
@@ -191,6 +201,77 @@ class ConnectionManager:
         for ws in disconnected:
             self.disconnect(ws)
     
+    async def _send_to_company(self, company_id: UUID, data: Dict[str, Any]) -> int:
+        """Send JSON data to the subscribers of one company only."""
+        sent = 0
+        for ws in list(self._company_subscribers.get(company_id, ())):
+            client_info = self.active.get(ws)
+            if client_info and await self._send_to_client(ws, data):
+                client_info.message_count += 1
+                self._stats["total_messages"] += 1
+                sent += 1
+        return sent
+
+    def handle_kpi_event(self, msg: str) -> None:
+        """Queue a ``kpi-changed`` event for a tile push.
+
+        Events of companies nobody watches are dropped; events arriving
+        while a company's push is in flight are merged into the next one.
+        """
+        try:
+            event = json.loads(msg)
+            company_id = UUID(event["company_id"])
+            metrics = set(event["metrics"])
+            as_of = event.get("as_of")
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            logger.error(f"Invalid KPI change event: {msg[:100]}")
+            return
+        if not self._company_subscribers.get(company_id):
+            return
+
+        pending = self._kpi_pending.setdefault(company_id, {"metrics": set(), "as_of": as_of})
+        pending["metrics"] |= metrics
+        if as_of and (pending["as_of"] is None or as_of > pending["as_of"]):
+            pending["as_of"] = as_of
+        if company_id not in self._kpi_running:
+            self._kpi_running.add(company_id)
+            task = asyncio.create_task(self._push_kpi_tiles(company_id))
+            self._kpi_tasks.add(task)
+            task.add_done_callback(self._kpi_tasks.discard)
+
+    async def _push_kpi_tiles(self, company_id: UUID) -> None:
+        """Recompute the touched tiles of a company and push them to its subscribers."""
+        try:
+            while company_id in self._kpi_pending:
+                change = self._kpi_pending.pop(company_id)
+                if not self._company_subscribers.get(company_id):
+                    continue
+                async with AsyncSessionLocal() as db:
+                    snapshot = await load_snapshot(db, company_id, metrics=sorted(change["metrics"]))
+                    sparks = await load_sparklines(db, company_id, snapshot)
+                tiles = [
+                    KPITile(
+                        label=s.metric,
+                        value=s.value,
+                        delta_pct=s.delta_pct,
+                        spark=sparks.get(s.metric, []),
+                    ).model_dump()
+                    for s in snapshot
+                ]
+                await self._send_to_company(company_id, {
+                    "type": "kpi-update",
+                    "company_id": str(company_id),
+                    "as_of": change["as_of"],
+                    "tiles": tiles,
+                })
+                self._stats["kpi_updates"] += 1
+        except Exception as e:
+            logger.error(f"KPI tile push for {company_id} failed: {e}")
+            self._stats["total_errors"] += 1
+            self._kpi_pending.pop(company_id, None)
+        finally:
+            self._kpi_running.discard(company_id)
+
     async def _send_to_client(self, ws: WebSocket, data: Dict[str, Any]) -> bool:
         """Send JSON data to a specific client with error handling."""
         try:
@@ -219,7 +300,8 @@ class ConnectionManager:
                 # Subscribe to multiple channels
                 channels = [
                     _CHANNEL,  # Main channel
-                    f"{_CHANNEL}.company.*"  # Company-specific channels
+                    f"{_CHANNEL}.company.*",  # Company-specific channels
+                    KPI_CHANNEL,  # KPI writers (turned into tile pushes)
                 ]
                 await pub.psubscribe(*channels)
                 
@@ -231,6 +313,10 @@ class ConnectionManager:
                         channel = message.get("channel", "")
                         data = message["data"]
                         
+                        if channel == KPI_CHANNEL:
+                            self.handle_kpi_event(data)
+                            continue
+                        
                         # Extract company ID from channel if present
                         company_id = None
                         if ".company." in channel:
@@ -339,6 +425,7 @@ class ConnectionManager:
             "total_connections": self._stats["total_connections"],
             "total_messages": self._stats["total_messages"],
             "total_errors": self._stats["total_errors"],
+            "kpi_updates": self._stats["kpi_updates"],
             "uptime_seconds": uptime,
             "companies_monitored": len(self._company_subscribers),
             "clients": [
@@ -353,6 +440,23 @@ class ConnectionManager:
             ]
         }
     
+    def get_summary(self) -> Dict[str, Any]:
+        """Aggregated connection metrics – no per-client detail."""
+        now = time.time()
+        durations = [now - info.connected_at for info in self.active.values()]
+        return {
+            "active_connections": len(self.active),
+            "total_connections": self._stats["total_connections"],
+            "total_messages": self._stats["total_messages"],
+            "total_errors": self._stats["total_errors"],
+            "kpi_updates": self._stats["kpi_updates"],
+            "uptime_seconds": now - self._stats["start_time"],
+            "companies_monitored": len(self._company_subscribers),
+            "subscriptions": sum(len(subs) for subs in self._company_subscribers.values()),
+            "avg_connected_seconds": sum(durations) / len(durations) if durations else 0.0,
+            "max_connected_seconds": max(durations, default=0.0),
+        }
+    
     async def start_background_tasks(self) -> None:
         """Start background tasks for Redis listener and heartbeat."""
         if not self._redis_task or self._redis_task.done():
@@ -373,6 +477,10 @@ class ConnectionManager:
             self._heartbeat_task.cancel()
             tasks.append(self._heartbeat_task)
         
+        for task in list(self._kpi_tasks):
+            task.cancel()
+            tasks.append(task)
+        
         if tasks:
             await asyncio.gather(*tasks, return_exceptions=True)
         
@@ -0,0 +1,154 @@
+"""
+Response compression middleware: brotli when the client accepts it and the
+``brotli`` package is installed, gzip otherwise.
+
+Bodies smaller than ``minimum_size``, responses that already carry a
+``Content-Encoding`` and already-compressed formats (Parquet, Arrow IPC
+exports) are passed through untouched.  Streamed bodies are compressed
+chunk by chunk and the compressor is flushed after each chunk, so clients
+receive every chunk as soon as it is produced.
+"""
+from __future__ import annotations
+
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # optional: pip install brotli
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+
+# compressed on their own; gzip would only burn CPU
+_INCOMPRESSIBLE_TYPES = ("application/vnd.apache.parquet", "application/vnd.apache.arrow.")
+
+
+def _passthrough(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "").lower()
+    return "content-encoding" in headers or content_type.startswith(_INCOMPRESSIBLE_TYPES)
+
+
+def _accepted(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class _Gzip:
+    def __init__(self, level: int) -> None:
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._z.compress(data)
+
+    def flush(self) -> bytes:
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush()
+
+
+class _Brotli:
+    def __init__(self, quality: int) -> None:
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _encoding(self, scope: Scope) -> Optional[str]:
+        accepted = _accepted(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    @staticmethod
+    def _compress(compressor, body: bytes, more_body: bool) -> bytes:
+        data = compressor.compress(body)
+        # sync-flush streamed chunks instead of buffering them in the compressor
+        return data + (compressor.flush() if more_body else compressor.finish())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = self._encoding(scope) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message = {}
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # held back until the first body chunk decides the headers
+                start = message
+                passthrough = _passthrough(Headers(raw=message["headers"]))
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if passthrough:
+                if start:
+                    await send(start)
+                    start = {}
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if len(body) < self.minimum_size and not more_body:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = (
+                    _Brotli(self.brotli_quality) if encoding == "br"
+                    else _Gzip(self.gzip_level)
+                )
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                data = self._compress(compressor, body, more_body)
+                if not more_body:
+                    headers["Content-Length"] = str(len(data))
+                elif "content-length" in headers:
+                    del headers["Content-Length"]
+                await send(start)
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            data = self._compress(compressor, body, more_body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,69 @@
+"""
+Fast JSON serialisation for route payloads.
+
+``dumps`` turns a payload straight into bytes.  With ``JSON_FAST`` enabled
+(off by default) and ``orjson`` installed, datetimes, UUIDs, enums, dataclasses and NumPy
+values are encoded natively, and pydantic models via ``model_dump``; the
+remaining types fall back to ``jsonable_encoder``.  Otherwise the payload
+goes through ``jsonable_encoder`` + stdlib ``json``, as FastAPI would do.
+Both paths produce the same document for the types the routes emit
+(ISO-8601 datetimes, string UUIDs).
+
+Payload builders should hand over ``datetime`` objects instead of calling
+``isoformat()`` per row, and use :func:`row_converter` to copy ORM rows
+into dicts without per-field attribute lookups in Python.
+"""
+from __future__ import annotations
+
+import json
+from decimal import Decimal
+from operator import attrgetter
+from typing import Any, Callable, Dict
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from app.core.settings import settings
+
+try:  # optional: pip install orjson
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return jsonable_encoder(obj)
+
+
+def backend() -> str:
+    """Name of the encoder :func:`dumps` uses."""
+    return "orjson" if orjson is not None and settings.JSON_FAST else "json"
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialise ``payload`` to compact JSON bytes."""
+    if orjson is not None and settings.JSON_FAST:
+        return orjson.dumps(payload, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+
+
+def row_converter(**fields: str) -> Callable[[Any], Dict[str, Any]]:
+    """Build ``row -> {key: row.<attribute>}`` for ``key=attribute`` pairs.
+
+    The attribute fetch is a single precompiled ``attrgetter`` call::
+
+        news_item = row_converter(id="id", title="title", published_at="published_at")
+    """
+    keys = tuple(fields)
+    getter = attrgetter(*fields.values())
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda row: {key: getter(row)}
+    return lambda row: dict(zip(keys, getter(row)))
@@ -10,7 +10,7 @@ from __future__ import annotations
 import json
 import logging
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set
 import hashlib
 from openai import OpenAI
 
@@ -23,6 +23,9 @@ from app.core.celery_app import celery_app
 from app.core.settings import settings
 from app.core.database import get_engine
 from app.models import News
+from app.services.dashboard_cache import NEWS_SCOPE, bump_version_sync
+from app.services.news_counters import increment_source_counts
+from app.services.news_structure import structured_fields
 
 # ──────────────────────────────────────────────────────────
 client = OpenAI(api_key=settings.OPENAI_API_KEY)
@@ -178,6 +181,7 @@ def fetch() -> int:
         return 0
 
     stored = 0
+    stored_sources: List[str] = []
     now = datetime.now(timezone.utc)
     
     # Look back 48 hours for duplicate detection
@@ -196,6 +200,7 @@ def fetch() -> int:
             .all()
         )
         
+        seen_urls: Set[str] = set()
         for item in items:
             title = item.get("title", "").strip()[:120]  # Enforce length limit
             summary = item.get("summary", "").strip()[:200]
@@ -215,9 +220,12 @@ def fetch() -> int:
                 )
             ).first()
             
-            if existing:
+            # ``url`` is unique across all rows, not just the 48h window above
+            url = f"urn:intel:{content_hash}"
+            if existing or url in seen_urls or sess.query(News.id).filter(News.url == url).first():
                 logging.debug("Skipping duplicate: %s", title[:50])
                 continue
+            seen_urls.add(url)
             
             # Create rich description
             description = _format_news_description(item)
@@ -236,15 +244,25 @@ def fetch() -> int:
 
             news = News(
                 title=title,
-                url="",  # no external link—AI generated
+                # no external link—AI generated; ``url`` is unique, so key it by content
+                url=url,
                 source="OpenAI",
                 published_at=now,
                 description=description,
+                raw_data=item,
+                **structured_fields(item),
             )
             sess.add(news)
+            stored_sources.append(news.source)
             stored += 1
 
+        # facet counters for /dashboard/news, same transaction as the inserts
+        increment_source_counts(sess.connection(), stored_sources)
         sess.commit()
 
+    if stored:
+        # invalidates cached /dashboard/news pages, their ETags and /stats
+        bump_version_sync(scopes=[NEWS_SCOPE])
+
     logging.info("AI intel: saved %s new items out of %s generated", stored, len(items))
     return stored
\ No newline at end of file
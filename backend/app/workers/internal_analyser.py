@@ -44,10 +44,12 @@ def _fetch_kpi_data(
 ) -> Tuple[List[Kpi], Dict[str, List[Dict[str, Any]]], datetime]:
     """Return recent KPIs and trend data for the given company."""
 
+    # ``as_of`` bounds let PostgreSQL prune the monthly ``kpi`` partitions
+    lookback = datetime.utcnow() - timedelta(days=settings.KPI_QUERY_LOOKBACK_DAYS)
     recent_kpis = (
         sess.query(Kpi)
         .options(load_only(Kpi.metric, Kpi.value, Kpi.as_of))
-        .filter_by(company_id=company_uuid)
+        .filter(and_(Kpi.company_id == company_uuid, Kpi.as_of >= lookback))
         .order_by(Kpi.as_of.desc())
         .limit(50)
         .all()
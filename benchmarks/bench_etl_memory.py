@@ -0,0 +1,134 @@
+"""Peak memory of the KPI ETL: whole-extract load vs streamed batches.
+
+Runs ``app.services.kpi_etl.load`` against a fake warehouse (synthetic
+``fetch_pandas_batches`` output, no Snowflake needed) and a throw-away
+SQLite database, each mode in its own process so ``ru_maxrss`` is not
+shared:
+
+- ``all``     – the previous path: ``fetch_pandas_all`` + ``to_dict("records")``
+  over every company, then one upsert
+- ``stream``  – :func:`stream_kpis` batches of ``KPI_EXTRACT_BATCH_SIZE``
+  upserted as they arrive
+
+::
+
+    python benchmarks/bench_etl_memory.py
+    python benchmarks/bench_etl_memory.py --rows 1000000 --companies 10 --batch-size 50000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.pop("SNOWFLAKE_DSN", None)
+
+WAREHOUSE_CHUNK = 10_000  # rows per fake fetch_pandas_batches() frame
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def fake_warehouse(rows_per_company: int):
+    import numpy as np
+    import pandas as pd
+
+    start = pd.Timestamp("2020-01-01")
+
+    def fetch_batches(ctx, query, params=None):
+        for offset in range(0, rows_per_company, WAREHOUSE_CHUNK):
+            n = min(WAREHOUSE_CHUNK, rows_per_company - offset)
+            idx = np.arange(offset, offset + n)
+            yield pd.DataFrame({
+                "METRIC": np.array([f"metric_{i % 20}" for i in idx], dtype=object),
+                "VALUE": idx.astype("float64"),
+                "AS_OF": start + pd.to_timedelta(idx // 20, unit="h"),
+            })
+
+    return fetch_batches
+
+
+def child(mode: str, rows: int, companies: int, batch_size: int) -> None:
+    import pandas as pd
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.core.database import Base
+    from app.core.settings import settings
+    from app.models import Company
+    from app.services import kpi_etl, snowflake_connector
+    from app.services.kpi_latest import apply_kpi_writes
+    from app.services.kpi_rollup import apply_rollup_writes
+    from app.services.kpi_upsert import upsert_kpis
+
+    settings.KPI_EXTRACT_BATCH_SIZE = batch_size
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(engine)
+        company_ids = [uuid.uuid4() for _ in range(companies)]
+        with Session(engine) as session:
+            session.add_all(Company(id=c, owner_id=uuid.uuid4(), name=str(c)) for c in company_ids)
+            session.commit()
+
+        fetch_batches = fake_warehouse(rows // companies)
+        snowflake_connector.extraction_sources = lambda only=None: [(str(c), "bench", str(c)) for c in company_ids]
+        snowflake_connector._connect = lambda dsn: type("Conn", (), {"is_closed": lambda s: False, "close": lambda s: None})()
+        snowflake_connector._fetch_batches = fetch_batches
+        kpi_etl.get_engine = lambda: engine
+        kpi_etl.bump_version_sync = lambda company_ids: None
+        kpi_etl.kpi_events.publish_sync = lambda changes: None
+
+        baseline = peak_rss_mb()
+        started = time.perf_counter()
+        if mode == "stream":
+            summary = kpi_etl.load()
+        else:
+            rows_out = []
+            for source, _, cid in snowflake_connector.extraction_sources():
+                df = pd.concat(list(fetch_batches(None, None)))  # fetch_pandas_all
+                df = snowflake_connector.clean_batch(df, cid)
+                rows_out.extend(df.to_dict("records"))
+            with Session(engine) as session:
+                result = upsert_kpis(session.connection(), rows_out)
+                apply_kpi_writes(session.connection(), result.changed)
+                apply_rollup_writes(session.connection(), result.changed)
+                session.commit()
+            summary = result.summary()
+        elapsed = time.perf_counter() - started
+        print(
+            f"  {mode:<7} {summary['rows']:>10,} rows  {elapsed:7.2f} s  "
+            f"peak RSS {peak_rss_mb():8.1f} MiB  (+{peak_rss_mb() - baseline:.1f} over imports)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--companies", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    parser.add_argument("--mode", choices=("all", "stream"))
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args.mode, args.rows, args.companies, args.batch_size)
+        return
+    print(f"rows={args.rows:,}  companies={args.companies}  batch_size={args.batch_size:,}")
+    for mode in ("all", "stream"):
+        subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--rows", str(args.rows),
+             "--companies", str(args.companies), "--batch-size", str(args.batch_size)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Compare ``/dashboard/news?search=`` strategies: ILIKE scan vs full-text index.
+
+Fills a scratch database with synthetic news, builds the search structure
+exactly like ``init_db`` does and times both query shapes::
+
+    python benchmarks/bench_news_search.py                       # SQLite, 1M rows
+    python benchmarks/bench_news_search.py --rows 100000
+    python benchmarks/bench_news_search.py --url postgresql://user:pw@localhost/bench
+
+The target database is dropped and recreated; never point it at real data.
+
+Expect the index to win by one to two orders of magnitude on selective and
+multi-term queries.  A term found in most rows can be faster with ILIKE,
+which stops after ``--limit`` recent hits, whereas ranking scores every
+match.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from sqlalchemy import create_engine, or_, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.core.schema import schema  # noqa: E402
+from app.models import News  # noqa: E402
+from app.services.news_search import ensure_search_index, ranked_search  # noqa: E402
+
+SYLLABLES = "ka lo mi re su ta ve no pi da fe gu ri zo be".split()
+# Zipf-distributed vocabulary so terms have realistic selectivity
+VOCABULARY = [
+    a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES
+]  # 3 375 words
+ZIPF_WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+# (label, query): common / mid-frequency / rare term, prefix, two-term AND
+QUERIES = (
+    ("common", VOCABULARY[5]),
+    ("mid", VOCABULARY[300]),
+    ("rare", VOCABULARY[3000]),
+    ("prefix", VOCABULARY[3000][:4]),
+    ("two terms", f"{VOCABULARY[300]} {VOCABULARY[800]}"),
+)
+BATCH = 20_000
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, ZIPF_WEIGHTS, k=n)).capitalize()
+
+
+def populate(engine, rows: int) -> None:
+    News.__table__.drop(engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS news_fts")
+    News.__table__.create(engine)
+
+    rng = random.Random(42)
+    now = dt.datetime.now(dt.timezone.utc)
+    with engine.begin() as conn:
+        for start in range(0, rows, BATCH):
+            conn.execute(News.__table__.insert(), [
+                {
+                    "id": uuid.uuid4(),
+                    "title": _sentence(rng, 8),
+                    "description": _sentence(rng, 30),
+                    "url": f"https://example.com/{i}",
+                    "source": rng.choice(("Reuters", "OpenAI", "Bloomberg")),
+                    "published_at": now - dt.timedelta(minutes=i),
+                }
+                for i in range(start, min(start + BATCH, rows))
+            ])
+        # built after the bulk load, the way init_db backfills old databases
+        t0 = time.perf_counter()
+        ensure_search_index(conn)
+        print(f"index build: {time.perf_counter() - t0:.1f}s")
+        schema.refresh(conn)
+
+
+def ilike(query: str):
+    pattern = f"%{query}%"
+    return select(News).where(
+        or_(News.title.ilike(pattern), News.description.ilike(pattern))
+    ).order_by(News.published_at.desc(), News.id.desc())
+
+
+def timed(session: Session, stmt, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        session.execute(stmt).all()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="sqlite:///./bench_news.db")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    t0 = time.perf_counter()
+    populate(engine, args.rows)
+    print(f"loaded {args.rows:,} rows in {time.perf_counter() - t0:.1f}s ({engine.dialect.name})\n")
+
+    print(f"{'query':<28}{'ILIKE ms':>12}{'FTS ms':>12}{'speed-up':>10}")
+    with Session(engine) as session:
+        for label, query in QUERIES:
+            fts = ranked_search(select(News), query, engine.dialect.name)
+            if fts is None:
+                sys.exit("full-text search unavailable on this backend")
+            slow = timed(session, ilike(query).limit(args.limit), args.repeat)
+            fast = timed(session, fts.limit(args.limit), args.repeat)
+            print(f"{label + ' ' + repr(query):<28}{slow:>12.1f}{fast:>12.1f}{slow / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
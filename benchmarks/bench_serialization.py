@@ -0,0 +1,164 @@
+"""Compare response serialisation paths for the ``news`` and ``kpis/latest`` payloads.
+
+Builds in-memory ORM rows (no database needed) and times, per payload:
+
+- ``legacy``  – per-row ``isoformat()`` dicts + ``jsonable_encoder`` + stdlib ``json``
+- ``stdlib``  – :func:`row_converter` dicts + ``dumps`` with ``JSON_FAST=false``
+- ``fast``    – :func:`row_converter` dicts + ``dumps`` with orjson (if installed)
+
+and the cost/ratio of gzip and brotli (if installed) on the encoded body::
+
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --rows 20000 --repeat 20
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app.core.settings import settings  # noqa: E402
+from app.models import News  # noqa: E402
+from app.services.kpi_snapshot import KpiSnapshot  # noqa: E402
+from app.utils import serialization  # noqa: E402
+from app.utils.serialization import dumps, row_converter  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+NOW = dt.datetime(2024, 6, 1, tzinfo=dt.timezone.utc)
+
+news_item = row_converter(
+    id="id", title="title", url="url", source="source",
+    published_at="published_at", description="description",
+)
+kpi_item = row_converter(metric="metric", value="value", as_of="as_of")
+
+
+def make_news(rows: int):
+    return [
+        News(
+            id=uuid.uuid4(),
+            title=f"Headline number {i} about markets and supply chains",
+            url=f"https://example.com/news/{i}",
+            source="Reuters" if i % 3 else "Bloomberg",
+            published_at=NOW - dt.timedelta(minutes=i),
+            description="Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+        )
+        for i in range(rows)
+    ]
+
+
+def make_kpis(rows: int):
+    return [
+        KpiSnapshot(
+            company_id=uuid.uuid4(), metric=f"metric_{i}", value=100.0 + i,
+            as_of=NOW - dt.timedelta(hours=i), prev_value=99.0 + i,
+            prev_as_of=NOW - dt.timedelta(hours=i + 1),
+        )
+        for i in range(rows)
+    ]
+
+
+def legacy_news(rows):
+    return {"items": [
+        {
+            "id": n.id, "title": n.title, "url": n.url or "", "source": n.source,
+            "published_at": n.published_at.isoformat(), "description": n.description or "",
+        }
+        for n in rows
+    ]}
+
+
+def converted_news(rows):
+    items = []
+    for n in rows:
+        item = news_item(n)
+        item["url"] = item["url"] or ""
+        item["description"] = item["description"] or ""
+        items.append(item)
+    return {"items": items}
+
+
+def legacy_kpis(rows):
+    return {"kpis": [
+        {
+            "metric": k.metric, "value": k.value, "as_of": k.as_of.isoformat(),
+            "previous_value": k.prev_value, "previous_as_of": k.prev_as_of.isoformat(),
+        }
+        for k in rows
+    ]}
+
+
+def converted_kpis(rows):
+    items = []
+    for k in rows:
+        item = kpi_item(k)
+        item["previous_value"] = k.prev_value
+        item["previous_as_of"] = k.prev_as_of
+        items.append(item)
+    return {"kpis": items}
+
+
+def legacy_encode(payload):
+    return json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000, result
+
+
+def fast_encode(build, rows, fast: bool):
+    settings.JSON_FAST = fast
+    return dumps(build(rows))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"rows={args.rows}  orjson={serialization.orjson is not None}  brotli={brotli is not None}")
+    for name, rows, legacy, converted in (
+        ("news", make_news(args.rows), legacy_news, converted_news),
+        ("kpis/latest", make_kpis(args.rows), legacy_kpis, converted_kpis),
+    ):
+        print(f"\n{name}")
+        legacy_ms, body = timed(lambda: legacy_encode(legacy(rows)), args.repeat)
+        print(f"  {'legacy':<8} {legacy_ms:8.2f} ms  {len(body):>10,} B")
+        stdlib_ms, _ = timed(lambda: fast_encode(converted, rows, False), args.repeat)
+        print(f"  {'stdlib':<8} {stdlib_ms:8.2f} ms  x{legacy_ms / stdlib_ms:.1f}")
+        if serialization.orjson is not None:
+            fast_ms, fast_body = timed(lambda: fast_encode(converted, rows, True), args.repeat)
+            assert json.loads(fast_body) == json.loads(body)
+            print(f"  {'fast':<8} {fast_ms:8.2f} ms  x{legacy_ms / fast_ms:.1f}")
+
+        gzip_ms, gz = timed(lambda: gzip.compress(body, compresslevel=6), args.repeat)
+        print(f"  {'gzip-6':<8} {gzip_ms:8.2f} ms  {len(gz):>10,} B  ({len(gz) / len(body):.1%})")
+        if brotli is not None:
+            br_ms, br = timed(lambda: brotli.compress(body, quality=4), args.repeat)
+            print(f"  {'br-4':<8} {br_ms:8.2f} ms  {len(br):>10,} B  ({len(br) / len(body):.1%})")
+
+
+if __name__ == "__main__":
+    main()
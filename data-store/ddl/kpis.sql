@@ -1,5 +1,7 @@
+-- Monthly range partitions kpi_yYYYYmMM (+ kpi_default) are created and
+-- expired by app.services.kpi_partitions (Celery beat)
 CREATE TABLE IF NOT EXISTS kpi (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     company_id UUID NOT NULL REFERENCES company(id),
     metric VARCHAR(100) NOT NULL,
     value DOUBLE PRECISION NOT NULL,
@@ -7,7 +9,83 @@ CREATE TABLE IF NOT EXISTS kpi (
     as_of TIMESTAMP WITH TIME ZONE NOT NULL,
     type VARCHAR(32) NOT NULL,
     unit VARCHAR(20),
-    description TEXT
+    description TEXT,
+    PRIMARY KEY (id, as_of)
+) PARTITION BY RANGE (as_of);
+
+CREATE TABLE IF NOT EXISTS kpi_default PARTITION OF kpi DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_kpi_as_of ON kpi (as_of);
+-- per-company reads (see alembic/versions/0002_kpi_composite_indexes.py)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_kpi_company_metric_as_of
+    ON kpi (company_id, metric, as_of DESC) INCLUDE (value);
+CREATE INDEX IF NOT EXISTS ix_kpi_company_as_of ON kpi (company_id, as_of DESC);
+
+-- Latest + previous value per metric, maintained by every KPI writer
+CREATE TABLE IF NOT EXISTS kpi_latest (
+    company_id UUID NOT NULL REFERENCES company(id),
+    metric VARCHAR(100) NOT NULL,
+    value DOUBLE PRECISION NOT NULL,
+    as_of TIMESTAMP WITH TIME ZONE NOT NULL,
+    prev_value DOUBLE PRECISION,
+    prev_as_of TIMESTAMP WITH TIME ZONE,
+    target DOUBLE PRECISION,
+    type VARCHAR(32),
+    unit VARCHAR(20),
+    description TEXT,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (company_id, metric)
 );
 
-CREATE INDEX IF NOT EXISTS idx_kpi_as_of ON kpi (as_of);
\ No newline at end of file
+-- Per-bucket aggregates (bucket = UTC start; weeks start Monday),
+-- recomputed for the buckets every KPI writer touches
+CREATE TABLE IF NOT EXISTS kpi_rollup_day (
+    company_id UUID NOT NULL REFERENCES company(id),
+    metric VARCHAR(100) NOT NULL,
+    bucket TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    count INTEGER NOT NULL,
+    sum DOUBLE PRECISION NOT NULL,
+    min DOUBLE PRECISION NOT NULL,
+    max DOUBLE PRECISION NOT NULL,
+    last_value DOUBLE PRECISION NOT NULL,
+    last_as_of TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (company_id, metric, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS kpi_rollup_week (
+    company_id UUID NOT NULL REFERENCES company(id),
+    metric VARCHAR(100) NOT NULL,
+    bucket TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    count INTEGER NOT NULL,
+    sum DOUBLE PRECISION NOT NULL,
+    min DOUBLE PRECISION NOT NULL,
+    max DOUBLE PRECISION NOT NULL,
+    last_value DOUBLE PRECISION NOT NULL,
+    last_as_of TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (company_id, metric, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS kpi_rollup_month (
+    company_id UUID NOT NULL REFERENCES company(id),
+    metric VARCHAR(100) NOT NULL,
+    bucket TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    count INTEGER NOT NULL,
+    sum DOUBLE PRECISION NOT NULL,
+    min DOUBLE PRECISION NOT NULL,
+    max DOUBLE PRECISION NOT NULL,
+    last_value DOUBLE PRECISION NOT NULL,
+    last_as_of TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (company_id, metric, bucket)
+);
+
+-- Incremental warehouse extraction: newest as_of loaded per source
+-- (company id, or '*' for the shared SNOWFLAKE_DSN)
+CREATE TABLE IF NOT EXISTS kpi_extract_watermark (
+    source VARCHAR(64) PRIMARY KEY,
+    as_of TIMESTAMP WITH TIME ZONE NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
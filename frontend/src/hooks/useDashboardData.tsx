@@ -31,7 +31,7 @@ export const useDashboardData = (companyId?: string) => {
           change: kpi.delta_pct,
           changeType: 'percentage' as const,
           trend: kpi.delta_pct > 0 ? 'up' as const : kpi.delta_pct < 0 ? 'down' as const : 'neutral' as const,
-          sparkline: kpi.spark || generateSparkline(),
+          sparkline: kpi.spark?.length ? kpi.spark : generateSparkline(),
           unit: kpi.unit,
           status: getMetricStatus(kpi),
           subtitle: 'vs LM'
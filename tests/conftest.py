@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from backend.app.core.database import Base
+
+
+@pytest.fixture
+def setup_engine():
+    """Factory of in-memory SQLite engines with every table created.
+
+    ``StaticPool`` keeps the one connection (and so the database) shared by
+    all sessions of an engine, across ``asyncio.run`` calls; the engines are
+    disposed after the test.
+    """
+    engines = []
+
+    def _factory():
+        engine = create_async_engine(
+            "sqlite+aiosqlite://",
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
+
+        async def _create():
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+
+        asyncio.run(_create())
+        engines.append(engine)
+        return engine
+
+    yield _factory
+    for engine in engines:
+        asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def engine(setup_engine):
+    """One empty in-memory database for the test."""
+    return setup_engine()
@@ -0,0 +1,148 @@
+import asyncio
+import uuid
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+from starlette.requests import Request
+
+from backend.app.services import dashboard_cache
+
+COMPANY = uuid.uuid4()
+
+
+def _request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/dashboard/",
+        "headers": [(k.replace("_", "-").lower().encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(dashboard_cache.settings, "DASHBOARD_CACHE_ENABLED", True)
+    monkeypatch.setattr(dashboard_cache, "_stats", dict.fromkeys(dashboard_cache._stats, 0))
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return {"value": len(builds)}
+
+    def run(scenario):
+        # one client per event loop
+        async def _run():
+            client = fakeredis.aioredis.FakeRedis(server=server)
+            monkeypatch.setattr(dashboard_cache, "_aredis", client)
+            try:
+                return await scenario()
+            finally:
+                await client.aclose()
+
+        return asyncio.run(_run())
+
+    def get(request=None, **kwargs):
+        return dashboard_cache.cached_json(
+            request or _request(), "summary", COMPANY, {"limit": 5}, build, **kwargs
+        )
+
+    return server, builds, run, get
+
+
+def test_hit_after_miss_and_invalidation(cache):
+    _, builds, run, get = cache
+
+    async def scenario():
+        first, second = await get(), await get()
+        await dashboard_cache.bump_version([COMPANY])
+        third = await get()
+        return first, second, third
+
+    first, second, third = run(scenario)
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+    assert first.body == second.body == b'{"value":1}'
+    # a write to the company re-addresses the entry
+    assert third.headers["X-Cache"] == "MISS" and third.body == b'{"value":2}'
+    assert third.headers["ETag"] != first.headers["ETag"]
+    assert len(builds) == 2
+
+
+def test_if_none_match_returns_304(cache):
+    _, builds, run, get = cache
+
+    async def scenario():
+        first = await get()
+        etag = first.headers["ETag"]
+        again = await get(_request(if_none_match=etag))
+        await dashboard_cache.bump_version([COMPANY])
+        changed = await get(_request(if_none_match=etag))
+        return first, again, changed
+
+    first, again, changed = run(scenario)
+    assert again.status_code == 304 and again.body == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+    assert changed.status_code == 200 and changed.body == b'{"value":2}'
+    assert len(builds) == 2
+
+
+def test_redis_down_falls_back_to_watermark(cache):
+    server, builds, run, get = cache
+    server.connected = False
+    watermark = {"value": "2024-01-01:3"}
+
+    async def mark():
+        return watermark["value"]
+
+    async def scenario():
+        first = await get(watermark=mark)
+        again = await get(_request(if_none_match=first.headers["ETag"]), watermark=mark)
+        watermark["value"] = "2024-01-02:4"
+        changed = await get(_request(if_none_match=first.headers["ETag"]), watermark=mark)
+        return first, again, changed
+
+    first, again, changed = run(scenario)
+    # nothing is cached, but the DB watermark still answers revalidations
+    assert first.status_code == 200 and first.headers["X-Cache"] == "MISS"
+    assert again.status_code == 304
+    assert changed.status_code == 200 and changed.headers["ETag"] != first.headers["ETag"]
+    assert len(builds) == 2
+    assert dashboard_cache.cache_stats()["errors"] >= 3
+
+
+def test_bypass_header_skips_read_and_write(cache):
+    server, builds, run, get = cache
+
+    async def scenario():
+        bypassed = await get(_request(x_cache_bypass="1"))
+        stored = await dashboard_cache._aredis.keys("dashboard-cache:summary:*")
+        cached = await get()
+        bypassed_again = await get(_request(x_cache_bypass="1"))
+        return bypassed, stored, cached, bypassed_again
+
+    bypassed, stored, cached, bypassed_again = run(scenario)
+    assert bypassed.headers["X-Cache"] == "BYPASS" and "ETag" not in bypassed.headers
+    assert stored == []                       # nothing written
+    assert cached.headers["X-Cache"] == "MISS"
+    # an entry exists now, but the bypass still rebuilds
+    assert bypassed_again.headers["X-Cache"] == "BYPASS"
+    assert bypassed_again.body == b'{"value":3}'
+    assert len(builds) == 3
+
+
+def test_counters_move(cache):
+    _, _, run, get = cache
+
+    async def scenario():
+        first = await get()
+        await get()
+        await get()
+        await get(_request(if_none_match=first.headers["ETag"]))
+        await get(_request(x_cache_bypass="1"))
+
+    run(scenario)
+    stats = dashboard_cache.cache_stats()
+    assert (stats["misses"], stats["hits"], stats["not_modified"], stats["bypass"]) == (1, 2, 1, 1)
+    assert stats["hit_ratio"] == round(2 / 3, 4)
+    assert stats["errors"] == 0
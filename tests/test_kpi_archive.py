@@ -0,0 +1,191 @@
+import asyncio
+import csv
+import io
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.models import Company, Kpi, KpiLatest, KpiType
+from backend.app.services import kpi_archive, kpi_export, kpi_latest, kpi_rollup
+from backend.app.services.kpi_series import load_series
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+CUTOFF = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def test_archive_moves_old_rows_and_reads_stay_complete(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(kpi_archive.settings, "KPI_ARCHIVE_DIR", str(tmp_path))
+    company_id = uuid.uuid4()
+    # every 6 hours for 90 days, two metrics
+    points = [START + timedelta(hours=6 * i) for i in range(360)]
+    window = (datetime(2024, 2, 27, tzinfo=timezone.utc), datetime(2024, 3, 3, tzinfo=timezone.utc))
+
+    async def _run():
+        async with AsyncSession(engine) as sess:
+            sess.add(Company(id=company_id, owner_id=uuid.uuid4(), name="ACME"))
+            await sess.execute(Kpi.__table__.insert(), [
+                {"company_id": company_id, "metric": metric, "value": float(i),
+                 "as_of": as_of, "type": KpiType.FINANCIAL, "unit": "USD"}
+                for i, as_of in enumerate(points)
+                for metric in ("revenue", "churn")
+            ])
+            await sess.commit()
+            before = await load_series(sess, company_id, ["revenue"], *window, "hour")
+
+            count, paths = await sess.run_sync(
+                lambda s: kpi_archive.archive_company(s.connection(), company_id, CUTOFF)
+            )
+            await sess.commit()
+            left = await sess.scalar(select(func.count()).select_from(Kpi))
+            after = await load_series(sess, company_id, ["revenue"], *window, "hour")
+
+            stmt = kpi_export.export_statement(company_id, ["revenue"], None, None)
+            archived = kpi_archive.archive_batches(company_id, kpi_export.COLUMNS, ["revenue"])
+            exported = b"".join([c async for c in kpi_export.stream_export(sess, stmt, "csv", archived)])
+        return count, paths, left, before, after, exported
+
+    count, paths, left, before, after, exported = asyncio.run(_run())
+
+    archived_points = sum(1 for p in points if p < CUTOFF)
+    assert count == 2 * archived_points
+    assert left == 2 * (len(points) - archived_points)
+    assert sorted(p.relative_to(tmp_path).parts[:3] for p in paths) == [
+        (f"company_id={company_id}", "year=2024", "month=01"),
+        (f"company_id={company_id}", "year=2024", "month=02"),
+    ]
+
+    # hot + archive reads match what the database alone returned before
+    assert after == before
+    assert len(before["revenue"]["t"]) == 4 * 5
+
+    rows = list(csv.DictReader(io.StringIO(exported.decode())))
+    assert len(rows) == len(points)
+    assert rows[0]["as_of"] == START.isoformat()
+    assert {r["metric"] for r in rows} == {"revenue"}
+
+
+def test_scanner_pushes_down_filters(tmp_path, monkeypatch):
+    monkeypatch.setattr(kpi_archive.settings, "KPI_ARCHIVE_DIR", str(tmp_path))
+    company_id = uuid.uuid4()
+    assert kpi_archive.scanner(company_id, ["metric"]) is None
+
+    for month in (1, 2, 3):
+        writer = kpi_archive._MonthWriter(company_id, (2024, month), "t")
+        writer.write([
+            (str(uuid.uuid4()), metric, datetime(2024, month, day, tzinfo=timezone.utc),
+             float(day), None, "financial", None, None)
+            for day in (1, 15)
+            for metric in ("revenue", "churn")
+        ])
+        writer.close()
+
+    scan = kpi_archive.scanner(
+        company_id, ["metric", "as_of"], ["churn"],
+        datetime(2024, 1, 10, tzinfo=timezone.utc), datetime(2024, 2, 20, tzinfo=timezone.utc),
+    )
+    table = scan.to_table()
+    assert table.column_names == ["metric", "as_of"]
+    assert table.column("metric").to_pylist() == ["churn"] * 3
+    assert [(ts.month, ts.day) for ts in table.column("as_of").to_pylist()] == [(1, 15), (2, 1), (2, 15)]
+
+
+def test_rollups_and_latest_keep_archived_rows(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(kpi_archive.settings, "KPI_ARCHIVE_DIR", str(tmp_path))
+    company_id = uuid.uuid4()
+    points = [START + timedelta(hours=6 * i) for i in range(360)]
+    late = {"company_id": company_id, "metric": "revenue", "value": 1000.0,
+            "as_of": datetime(2024, 1, 15, 12, 30, tzinfo=timezone.utc), "type": KpiType.FINANCIAL}
+
+    def _rollups(conn):
+        return {
+            grain: {
+                (r.metric, r.bucket): (r.count, r.sum, r.min, r.max, r.last_value)
+                for r in conn.execute(select(model.__table__))
+            }
+            for grain, model in kpi_rollup.ROLLUPS.items()
+        }
+
+    def _latest(conn):
+        return {r.metric: (r.value, r.prev_value) for r in conn.execute(select(KpiLatest.__table__))}
+
+    async def _run():
+        async with AsyncSession(engine) as sess:
+            sess.add(Company(id=company_id, owner_id=uuid.uuid4(), name="ACME"))
+            await sess.execute(Kpi.__table__.insert(), [
+                {"company_id": company_id, "metric": metric, "value": float(i),
+                 "as_of": as_of, "type": KpiType.FINANCIAL}
+                for i, as_of in enumerate(points)
+                for metric in ("revenue", "churn")
+                # churn stops before the cutoff and ends up wholly archived
+                if metric == "revenue" or as_of < CUTOFF
+            ])
+            await sess.commit()
+        async with engine.begin() as conn:
+            await conn.run_sync(kpi_rollup.rebuild_rollups, company_id)
+            await conn.run_sync(kpi_latest.rebuild_latest, company_id)
+            before, latest_before = await conn.run_sync(_rollups), await conn.run_sync(_latest)
+            await conn.run_sync(kpi_archive.archive_company, company_id, CUTOFF)
+
+        async with engine.begin() as conn:
+            # a late point lands in a bucket that only exists in the archive
+            await conn.execute(Kpi.__table__.insert(), [late])
+            await conn.run_sync(kpi_rollup.apply_rollup_writes, [late])
+            incremental = await conn.run_sync(_rollups)
+        async with engine.begin() as conn:
+            await conn.run_sync(kpi_rollup.rebuild_rollups, company_id)
+            await conn.run_sync(kpi_latest.rebuild_latest, company_id)
+            rebuilt, latest_after = await conn.run_sync(_rollups), await conn.run_sync(_latest)
+        return before, latest_before, incremental, rebuilt, latest_after
+
+    before, latest_before, incremental, rebuilt, latest_after = asyncio.run(_run())
+
+    expected = {grain: dict(buckets) for grain, buckets in before.items()}
+    for grain, bucket in (("day", datetime(2024, 1, 15)), ("week", datetime(2024, 1, 15)),
+                          ("month", datetime(2024, 1, 1))):
+        count, total, low, _, last = expected[grain][("revenue", bucket)]
+        expected[grain][("revenue", bucket)] = (count + 1, total + 1000.0, low, 1000.0, last)
+    assert incremental == expected
+    assert rebuilt == expected
+    assert latest_after == latest_before
+    assert set(latest_after) == {"revenue", "churn"}
+
+
+def test_rows_written_during_the_run_stay_hot(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(kpi_archive.settings, "KPI_ARCHIVE_DIR", str(tmp_path))
+    company_id = uuid.uuid4()
+    points = [START + timedelta(days=i) for i in range(90)]
+    late = {"company_id": company_id, "metric": "revenue", "value": 999.0,
+            "as_of": datetime(2024, 1, 5, 12, tzinfo=timezone.utc), "type": KpiType.FINANCIAL}
+
+    def _archive(conn):
+        close = kpi_archive._MonthWriter.close
+
+        def _close_and_write(writer):
+            # a writer lands a row below the cutoff after the rows were read
+            if not conn.execute(select(Kpi.id).where(Kpi.value == 999.0)).first():
+                conn.execute(Kpi.__table__.insert(), [late])
+            return close(writer)
+
+        monkeypatch.setattr(kpi_archive._MonthWriter, "close", _close_and_write)
+        return kpi_archive.archive_company(conn, company_id, CUTOFF)
+
+    async def _run():
+        async with AsyncSession(engine) as sess:
+            sess.add(Company(id=company_id, owner_id=uuid.uuid4(), name="ACME"))
+            await sess.execute(Kpi.__table__.insert(), [
+                {"company_id": company_id, "metric": "revenue", "value": float(i),
+                 "as_of": as_of, "type": KpiType.FINANCIAL}
+                for i, as_of in enumerate(points)
+            ])
+            await sess.commit()
+        async with engine.begin() as conn:
+            count, _ = await conn.run_sync(_archive)
+            hot = (await conn.execute(select(Kpi.value).where(Kpi.as_of < CUTOFF))).scalars().all()
+        return count, hot
+
+    count, hot = asyncio.run(_run())
+    archived = [v for rows in kpi_archive.archive_batches(company_id, ["value"]) for (v,) in rows]
+    assert count == len(archived) == sum(1 for p in points if p < CUTOFF)
+    assert hot == [999.0]
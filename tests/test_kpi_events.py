@@ -0,0 +1,94 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette.websockets import WebSocketState
+
+from backend.app.models import Kpi, KpiLatest
+from backend.app.services.kpi_events import collect, events
+from backend.app.utils import broadcaster
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+# sparklines only read history inside the query lookback
+RECENT = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(days=1)
+
+
+class FakeWebSocket:
+    client_state = WebSocketState.CONNECTED
+    headers = {}
+
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+def test_one_compact_event_per_company():
+    a, b = uuid.uuid4(), uuid.uuid4()
+    changes = collect({}, [
+        {"company_id": a, "metric": "revenue", "as_of": NOW},
+        {"company_id": str(a), "metric": "churn", "as_of": NOW - timedelta(days=1)},
+        {"company_id": a, "metric": "revenue", "as_of": NOW.replace(tzinfo=None) + timedelta(hours=1)},
+        {"company_id": b, "metric": "mrr", "as_of": NOW},
+    ])
+
+    by_company = {e["company_id"]: e for e in map(json.loads, events(changes))}
+    assert by_company[str(a)] == {
+        "type": "kpi-changed", "company_id": str(a), "metrics": ["churn", "revenue"],
+        "as_of": "2024-06-01T01:00:00+00:00",
+    }
+    assert by_company[str(b)]["metrics"] == ["mrr"]
+
+
+def test_kpi_events_push_recomputed_tiles_to_company_subscribers(engine, monkeypatch):
+    monkeypatch.setattr(broadcaster, "AsyncSessionLocal", async_sessionmaker(engine))
+    watched, other = uuid.uuid4(), uuid.uuid4()
+    manager = broadcaster.ConnectionManager()
+
+    async def _run():
+        async with engine.begin() as conn:
+            await conn.execute(KpiLatest.__table__.insert(), [
+                {"company_id": watched, "metric": m, "value": v, "as_of": RECENT,
+                 "prev_value": 100.0, "prev_as_of": RECENT - timedelta(days=1), "updated_at": RECENT}
+                for m, v in (("revenue", 110.0), ("churn", 90.0), ("mrr", 50.0))
+            ])
+            await conn.execute(Kpi.__table__.insert(), [
+                {"company_id": watched, "metric": "revenue", "value": float(i),
+                 "as_of": RECENT - timedelta(days=5 - i), "type": "FINANCIAL"}
+                for i in range(5)
+            ])
+
+        subscriber, bystander = FakeWebSocket(), FakeWebSocket()
+        for ws in (subscriber, bystander):
+            await manager.connect(ws)
+        await manager.subscribe_to_company(subscriber, watched)
+
+        # two events in a row are merged into one push; nobody watches ``other``
+        for metrics in (["revenue"], ["churn"]):
+            manager.handle_kpi_event(json.dumps({
+                "type": "kpi-changed", "company_id": str(watched),
+                "metrics": metrics, "as_of": RECENT.isoformat(),
+            }))
+        manager.handle_kpi_event(json.dumps({
+            "type": "kpi-changed", "company_id": str(other), "metrics": ["x"], "as_of": None,
+        }))
+        await asyncio.gather(*manager._kpi_tasks)
+        return subscriber.sent, bystander.sent
+
+    sent, bystander_sent = asyncio.run(_run())
+
+    updates = [m for m in sent if m["type"] == "kpi-update"]
+    assert len(updates) == 1
+    tiles = {t["label"]: t for t in updates[0]["tiles"]}
+    assert set(tiles) == {"revenue", "churn"}
+    assert tiles["revenue"]["delta_pct"] == 10.0 and tiles["churn"]["delta_pct"] == -10.0
+    assert tiles["revenue"]["spark"] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert updates[0]["as_of"] == RECENT.isoformat()
+    assert all(m["type"] != "kpi-update" for m in bystander_sent)
+    assert manager.get_summary()["kpi_updates"] == 1
@@ -0,0 +1,160 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from backend.app.core.database import Base
+from backend.app.models import Kpi
+from backend.app.services import kpi_partitions
+from backend.app.services.kpi_partitions import (
+    add_months,
+    apply_retention,
+    create_partition,
+    ensure_partitions,
+    month_start,
+    partition_name,
+)
+
+NOW = datetime(2024, 6, 15, 12, tzinfo=timezone.utc)
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+
+class _Conn:
+    """A partitioned PostgreSQL ``kpi`` as far as the catalog queries go;
+    records every other statement issued."""
+
+    class dialect:
+        name = "postgresql"
+
+    def __init__(self, partitions=(), default=True, default_rows=()):
+        self.partitions = [partition_name(m) for m in partitions]
+        self.default = default
+        self.default_rows = default_rows   # months with rows in kpi_default
+        self.issued = []
+
+    def execute(self, stmt, params=None):
+        sql = " ".join(str(stmt).split())
+        if "pg_partitioned_table" in sql:
+            return _Result([(1,)])
+        if "pg_inherits" in sql:
+            return _Result([(name,) for name in self.partitions])
+        if "to_regclass" in sql:
+            return _Result([(self.default,)])
+        if sql.startswith("SELECT 1 FROM kpi_default"):
+            return _Result([(1,)] if month_start(params["lo"]) in self.default_rows else [])
+        self.issued.append((sql, params))
+        return _Result([])
+
+    @property
+    def sql(self):
+        return [sql for sql, _ in self.issued]
+
+
+def test_month_arithmetic():
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    # month boundaries are UTC
+    local = datetime(2024, 3, 1, 0, 30, tzinfo=timezone(timedelta(hours=2)))
+    assert month_start(local) == date(2024, 2, 1)
+    assert partition_name(date(2024, 2, 1)) == "kpi_y2024m02"
+
+
+def test_kpi_is_range_partitioned_on_postgresql():
+    ddl = str(CreateTable(Kpi.__table__).compile(dialect=postgresql.dialect()))
+    assert "PARTITION BY RANGE (as_of)" in ddl
+    assert "PRIMARY KEY (id, as_of)" in ddl
+
+
+def test_sqlite_stays_unpartitioned(monkeypatch):
+    from backend.app.services import kpi_partitions
+
+    monkeypatch.setattr(kpi_partitions.settings, "KPI_RETENTION_MONTHS", 6)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        assert ensure_partitions(conn) == []
+        assert apply_retention(conn) == []
+    engine.dispose()
+
+
+def test_create_partition_attaches_directly_when_default_is_empty():
+    conn = _Conn()
+    assert create_partition(conn, date(2024, 7, 1)) == "kpi_y2024m07"
+    assert conn.sql == [
+        "CREATE TABLE IF NOT EXISTS kpi_y2024m07 PARTITION OF kpi "
+        "FOR VALUES FROM ('2024-07-01 00:00:00+00') TO ('2024-08-01 00:00:00+00')"
+    ]
+
+
+def test_create_partition_moves_rows_out_of_default():
+    conn = _Conn(default_rows={date(2024, 7, 1)})
+    create_partition(conn, date(2024, 7, 1))
+    create, move, attach = conn.issued
+    assert create[0].startswith("CREATE TABLE kpi_y2024m07 (LIKE kpi")
+    assert move[0].startswith("WITH moved AS (DELETE FROM kpi_default")
+    assert move[1] == {
+        "lo": datetime(2024, 7, 1, tzinfo=timezone.utc),
+        "hi": datetime(2024, 8, 1, tzinfo=timezone.utc),
+    }
+    assert attach[0] == (
+        "ALTER TABLE kpi ATTACH PARTITION kpi_y2024m07 "
+        "FOR VALUES FROM ('2024-07-01 00:00:00+00') TO ('2024-08-01 00:00:00+00')"
+    )
+
+
+def test_ensure_partitions_fills_gaps_through_months_ahead(monkeypatch):
+    monkeypatch.setattr(kpi_partitions.settings, "KPI_PARTITIONS_AHEAD", 2)
+    conn = _Conn(partitions=[date(2024, 6, 1), date(2024, 8, 1)], default=False)
+    created = ensure_partitions(conn, first=date(2024, 4, 1), now=NOW)
+    assert created == ["kpi_y2024m04", "kpi_y2024m05", "kpi_y2024m07"]
+    assert conn.sql[-1] == "CREATE TABLE IF NOT EXISTS kpi_default PARTITION OF kpi DEFAULT"
+    # nothing is created for months that already exist
+    assert not any("kpi_y2024m06" in sql or "kpi_y2024m08" in sql for sql in conn.sql)
+
+
+@pytest.mark.parametrize("mode", ["detach", "drop"])
+def test_retention_removes_whole_months_past_the_cutoff(monkeypatch, mode):
+    monkeypatch.setattr(kpi_partitions.settings, "KPI_RETENTION_MONTHS", 3)
+    monkeypatch.setattr(kpi_partitions.settings, "KPI_RETENTION_MODE", mode)
+    months = [date(2024, m, 1) for m in range(1, 8)]
+    conn = _Conn(partitions=months)
+    # cutoff is 2024-03-01: January and February end on or before it
+    assert apply_retention(conn, now=NOW) == ["kpi_y2024m01", "kpi_y2024m02"]
+
+    expected = []
+    for name in ("kpi_y2024m01", "kpi_y2024m02"):
+        expected.append(f"ALTER TABLE kpi DETACH PARTITION {name}")
+        if mode == "drop":
+            expected.append(f"DROP TABLE {name}")
+    expected.append("DELETE FROM kpi_default WHERE as_of < :cutoff")
+    assert conn.sql == expected
+    assert conn.issued[-1][1] == {"cutoff": datetime(2024, 3, 1, tzinfo=timezone.utc)}
+
+
+def test_retention_keeps_the_month_that_ends_after_the_cutoff(monkeypatch):
+    monkeypatch.setattr(kpi_partitions.settings, "KPI_RETENTION_MONTHS", 3)
+    monkeypatch.setattr(kpi_partitions.settings, "KPI_RETENTION_MODE", "drop")
+    conn = _Conn(partitions=[date(2024, 2, 1), date(2024, 3, 1)])
+    # the first instant of the month still counts towards it
+    first_instant = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    assert apply_retention(conn, now=first_instant) == ["kpi_y2024m02"]
+    assert not any("kpi_y2024m03" in sql for sql in conn.sql)
+    # a moment earlier the cutoff is a month earlier, and February stays too
+    conn = _Conn(partitions=[date(2024, 2, 1), date(2024, 3, 1)])
+    assert apply_retention(conn, now=first_instant - timedelta(microseconds=1)) == []
+    assert conn.sql == ["DELETE FROM kpi_default WHERE as_of < :cutoff"]
@@ -0,0 +1,158 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import fakeredis.aioredis
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+
+from backend.app.models import Company, Kpi, KpiType
+from backend.app.routers import dashboard
+from backend.app.services.kpi_rollup import apply_rollup_writes, rebuild_rollups
+from backend.app.services.kpi_series import bucket_floor, finest_bucket, load_series
+
+# the cache module the router uses (imported as ``app.*``)
+from app.services import dashboard_cache
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)  # a Monday
+
+
+def run_series(engine, points, bucket, start=START, end=START + timedelta(days=40),
+               rebuild=False):
+    company_id = uuid.uuid4()
+
+    async def _run():
+        async with AsyncSession(engine) as sess:
+            sess.add(Company(id=company_id, owner_id=uuid.uuid4(), name="ACME"))
+            rows = [
+                {"company_id": company_id, "metric": "revenue", "value": value,
+                 "as_of": as_of, "type": KpiType.FINANCIAL}
+                for as_of, value in points
+            ]
+            await sess.execute(Kpi.__table__.insert(), rows)
+            # the writers' path, or a rebuild from raw history
+            if rebuild:
+                await sess.run_sync(lambda s: rebuild_rollups(s.connection()))
+            else:
+                await sess.run_sync(lambda s: apply_rollup_writes(s.connection(), rows))
+            await sess.commit()
+            result = await load_series(sess, company_id, ["revenue", "churn"], start, end, bucket)
+        return result
+
+    return asyncio.run(_run())
+
+
+def test_daily_buckets_aggregate_in_database(setup_engine):
+    # 48 hourly points over two days: value = hour index
+    points = [(START + timedelta(hours=h), float(h)) for h in range(48)]
+    series = run_series(setup_engine(), points, "day")
+    revenue = series["revenue"]
+    assert revenue["t"] == [datetime(2024, 1, 1), datetime(2024, 1, 2)]
+    assert revenue["min"] == [0.0, 24.0]
+    assert revenue["max"] == revenue["last"] == [23.0, 47.0]
+    assert revenue["avg"] == [11.5, 35.5]
+    assert revenue["count"] == [24, 24]
+    assert series["churn"] == {"t": [], "min": [], "max": [], "avg": [], "last": [], "count": []}
+
+
+def test_week_and_month_alignment_matches_python(setup_engine):
+    days = [START + timedelta(days=d, hours=5) for d in (0, 6, 7, 13, 31)]
+    weekly = run_series(setup_engine(), [(d, 1.0) for d in days], "week")
+    assert weekly["revenue"]["t"] == sorted({bucket_floor(d, "week") for d in days})
+    assert weekly["revenue"]["count"] == [2, 2, 1]
+    monthly = run_series(setup_engine(), [(d, 1.0) for d in days], "month")
+    assert monthly["revenue"]["t"] == [datetime(2024, 1, 1), datetime(2024, 2, 1)]
+
+
+def test_finest_bucket_respects_cap():
+    assert finest_bucket(START, START + timedelta(days=2), 1000) == "hour"
+    assert finest_bucket(START, START + timedelta(days=365), 1000) == "day"
+    assert finest_bucket(START, START + timedelta(days=365 * 30), 1000) == "month"
+
+
+def test_rollups_match_raw_aggregation(setup_engine):
+    # minute-level points spread over two months, written in two batches
+    points = [(START + timedelta(minutes=37 * i), float(i % 50)) for i in range(3000)]
+    raw = run_series(setup_engine(), points, "hour", end=START + timedelta(days=80))["revenue"]
+    for bucket in ("day", "week", "month"):
+        incremental = run_series(setup_engine(), points, bucket, end=START + timedelta(days=80))["revenue"]
+        rebuilt = run_series(setup_engine(), points, bucket, end=START + timedelta(days=80), rebuild=True)["revenue"]
+        assert incremental == rebuilt
+        assert sum(incremental["count"]) == sum(raw["count"]) == 3000
+        assert max(incremental["max"]) == max(raw["max"])
+        assert incremental["last"][-1] == raw["last"][-1]
+
+
+def test_default_end_is_cacheable(engine, monkeypatch):
+    monkeypatch.setattr(dashboard_cache.settings, "DASHBOARD_CACHE_ENABLED", True)
+    clock = {"now": datetime(2024, 3, 1, 10, 5, tzinfo=timezone.utc)}
+
+    class _Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock["now"]
+
+    monkeypatch.setattr(dashboard, "datetime", _Clock)
+    company_id = uuid.uuid4()
+
+    def request(etag=None):
+        headers = [(b"if-none-match", etag.encode())] if etag else []
+        return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+    async def _run():
+        monkeypatch.setattr(dashboard_cache, "_aredis", fakeredis.aioredis.FakeRedis())
+        async with AsyncSession(engine) as sess:
+            poll = lambda req: dashboard.kpi_series(
+                req, company_id, ["revenue"], start=None, end=None, bucket=None, db=sess
+            )
+            first = await poll(request())
+            clock["now"] += timedelta(minutes=30)   # same hour
+            second = await poll(request())
+            third = await poll(request(first.headers["ETag"]))
+        return first, second, third
+
+    first, second, third = asyncio.run(_run())
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+    assert third.status_code == 304
+    assert b'"end":"2024-03-01T11:00:00+00:00"' in first.body
+
+
+def test_incremental_write_reads_one_day_of_raw_rows(engine):
+    company_id = uuid.uuid4()
+    points = [START + timedelta(minutes=30 * i) for i in range(2 * 24 * 31)]
+    late = {"company_id": company_id, "metric": "revenue", "value": 100.0,
+            "as_of": datetime(2024, 1, 20, 7, 15, tzinfo=timezone.utc), "type": KpiType.FINANCIAL}
+    raw_reads = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM kpi " in statement:
+            raw_reads.append(parameters[-2:])
+
+    async def _run():
+        async with AsyncSession(engine) as sess:
+            sess.add(Company(id=company_id, owner_id=uuid.uuid4(), name="ACME"))
+            await sess.execute(Kpi.__table__.insert(), [
+                {"company_id": company_id, "metric": "revenue", "value": 1.0,
+                 "as_of": as_of, "type": KpiType.FINANCIAL}
+                for as_of in points
+            ])
+            await sess.run_sync(lambda s: rebuild_rollups(s.connection()))
+            await sess.execute(Kpi.__table__.insert(), [late])
+            event.listen(engine.sync_engine, "before_cursor_execute", _record)
+            await sess.run_sync(lambda s: apply_rollup_writes(s.connection(), [late]))
+            event.remove(engine.sync_engine, "before_cursor_execute", _record)
+            await sess.commit()
+            series = {
+                bucket: await load_series(sess, company_id, ["revenue"], START, START + timedelta(days=31), bucket)
+                for bucket in ("day", "week", "month")
+            }
+        return series
+
+    series = asyncio.run(_run())
+    # only the touched day is re-aggregated from raw rows
+    assert raw_reads == [("2024-01-20 00:00:00.000000", "2024-01-21 00:00:00.000000")]
+    assert series["month"]["revenue"]["count"] == [len(points) + 1]
+    assert series["month"]["revenue"]["max"] == [100.0]
+    assert sum(series["week"]["revenue"]["count"]) == len(points) + 1
+    assert series["day"]["revenue"]["count"][19] == 49
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.models import Company, Kpi, KpiType
+from backend.app.routers import dashboard
+from backend.app.services.kpi_latest import apply_kpi_writes, rebuild_latest
+
+
+def populate_data(engine, company_uuid, n_metrics, n_points=3):
+    now = datetime.utcnow()
+
+    async def _populate():
+        async with AsyncSession(engine) as sess:
+            sess.add(Company(id=company_uuid, owner_id=uuid.uuid4(), name="ACME"))
+            for m in range(n_metrics):
+                for p in range(n_points):
+                    sess.add(
+                        Kpi(
+                            company_id=company_uuid,
+                            metric=f"metric_{m}",
+                            value=100.0 + p,
+                            as_of=now - timedelta(days=p),
+                            type=KpiType.FINANCIAL,
+                        )
+                    )
+            await sess.commit()
+        async with engine.begin() as conn:
+            await conn.run_sync(rebuild_latest, company_uuid)
+
+    asyncio.run(_populate())
+
+
+def count_queries(engine, coro_factory):
+    statements = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        result = asyncio.run(coro_factory())
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _record)
+    return len(statements), result
+
+
+def run_summary(engine, company_uuid):
+    async def _call():
+        async with AsyncSession(engine) as sess:
+            return await dashboard._summary_tiles(sess, company_uuid)
+
+    return count_queries(engine, _call)
+
+
+def run_latest(engine, company_uuid):
+    async def _call():
+        async with AsyncSession(engine) as sess:
+            return await dashboard._latest_kpis_payload(
+                sess, company_uuid, limit=500, metrics=None
+            )
+
+    return count_queries(engine, _call)
+
+
+def test_snapshot_deltas(setup_engine):
+    engine = setup_engine()
+    company_uuid = uuid.uuid4()
+    populate_data(engine, company_uuid, n_metrics=2)
+
+    _, tiles = run_summary(engine, company_uuid)
+    assert {t.label for t in tiles} == {"metric_0", "metric_1"}
+    # latest=100 (today), previous=101 (yesterday)
+    assert all(t.value == 100.0 for t in tiles)
+    assert all(t.delta_pct == round((100 - 101) / 101 * 100, 2) for t in tiles)
+
+    _, payload = run_latest(engine, company_uuid)
+    assert payload["kpi_count"] == 2
+    assert all(k["previous_value"] == 101.0 for k in payload["kpis"])
+
+
+def test_query_count_is_constant(setup_engine):
+    small, large = setup_engine(), setup_engine()
+    small_id, large_id = uuid.uuid4(), uuid.uuid4()
+    populate_data(small, small_id, n_metrics=2)
+    populate_data(large, large_id, n_metrics=60)
+    run_latest(small, small_id)  # warm the schema registry
+
+    small_queries, small_tiles = run_summary(small, small_id)
+    large_queries, large_tiles = run_summary(large, large_id)
+    assert len(small_tiles) == 2 and len(large_tiles) == 60
+    assert all(len(t.spark) == 3 for t in large_tiles)
+    assert small_queries == large_queries
+
+    small_queries, _ = run_latest(small, small_id)
+    large_queries, payload = run_latest(large, large_id)
+    assert payload["kpi_count"] == 60
+    assert small_queries == large_queries
+
+
+def test_incremental_latest_matches_rebuild(setup_engine):
+    engine = setup_engine()
+    company_uuid = uuid.uuid4()
+    populate_data(engine, company_uuid, n_metrics=1)
+    now = datetime.utcnow()
+    writes = [
+        # newer point, an in-place correction and a late-arriving old point
+        {"company_id": company_uuid, "metric": "metric_0", "value": 90.0, "as_of": now + timedelta(days=1)},
+        {"company_id": company_uuid, "metric": "metric_0", "value": 95.0, "as_of": now},
+        {"company_id": str(company_uuid), "metric": "metric_0", "value": 1.0, "as_of": now - timedelta(days=30)},
+        {"company_id": company_uuid, "metric": "metric_new", "value": 5.0, "as_of": now},
+    ]
+
+    async def _apply():
+        async with engine.begin() as conn:
+            await conn.run_sync(apply_kpi_writes, writes)
+
+    asyncio.run(_apply())
+    _, tiles = run_summary(engine, company_uuid)
+    by_label = {t.label: t for t in tiles}
+    assert by_label["metric_0"].value == 90.0
+    assert by_label["metric_0"].delta_pct == round((90 - 95) / 95 * 100, 2)
+    assert (by_label["metric_new"].value, by_label["metric_new"].delta_pct) == (5.0, 0.0)
+
+
+def run_portfolio(engine, company_ids):
+    async def _call():
+        async with AsyncSession(engine) as sess:
+            response = await dashboard.portfolio_summary(company_ids=company_ids, db=sess)
+            return b"".join([chunk async for chunk in response.body_iterator])
+
+    return count_queries(engine, _call)
+
+
+def test_portfolio_is_batched(setup_engine):
+    engine = setup_engine()
+    few, many = [uuid.uuid4() for _ in range(2)], [uuid.uuid4() for _ in range(6)]
+    for cid in few + many:
+        populate_data(engine, cid, n_metrics=3)
+    run_latest(engine, few[0])  # warm the schema registry
+
+    few_queries, _ = run_portfolio(engine, few)
+    unknown = uuid.uuid4()
+    many_queries, body = run_portfolio(engine, many + [unknown])
+    assert few_queries == many_queries == 3  # names, snapshot, sparkline history
+
+    payload = json.loads(body)
+    assert [c["company_id"] for c in payload["companies"]] == [str(c) for c in many]
+    assert all(len(c["tiles"]) == 3 for c in payload["companies"])
+    assert payload["companies"][0]["tiles"][0]["spark"] == [102.0, 101.0, 100.0]
+    assert payload["missing"] == [str(unknown)]
+
+
+def test_latest_kpis_returns_one_entry_per_metric(setup_engine):
+    engine = setup_engine()
+    company_uuid = uuid.uuid4()
+    populate_data(engine, company_uuid, n_metrics=3, n_points=4)
+
+    async def _call(**kwargs):
+        async with AsyncSession(engine) as sess:
+            return await dashboard._latest_kpis_payload(sess, company_uuid, **kwargs)
+
+    payload = asyncio.run(_call(limit=50, metrics=None))
+    # 12 raw rows, but only the newest point of each metric
+    assert [k["metric"] for k in payload["kpis"]] == ["metric_0", "metric_1", "metric_2"]
+    assert all((k["value"], k["previous_value"]) == (100.0, 101.0) for k in payload["kpis"])
+
+    # ``limit`` caps metrics, ``metrics`` filters them
+    assert asyncio.run(_call(limit=2, metrics=None))["kpi_count"] == 2
+    payload = asyncio.run(_call(limit=50, metrics=["metric_1"]))
+    assert [k["metric"] for k in payload["kpis"]] == ["metric_1"]
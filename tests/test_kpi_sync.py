@@ -0,0 +1,74 @@
+import asyncio
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+
+from backend.app.services import kpi_etl
+
+# the module kpi_etl writes progress through
+kpi_sync = kpi_etl.kpi_sync
+
+SOURCES = ["c-1", "c-2", "c-flaky", "c-broken"]
+
+
+@pytest.fixture
+def sync(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(kpi_sync, "_redis", fakeredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(kpi_sync, "_aredis", fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(kpi_etl.celery_app.conf, "task_always_eager", True)
+    monkeypatch.setattr(kpi_sync.settings, "KPI_SYNC_MAX_RETRIES", 2)
+    monkeypatch.setattr(kpi_sync.settings, "KPI_SYNC_RETRY_DELAY", 0)
+    monkeypatch.setattr(
+        kpi_etl, "extraction_sources", lambda only=None: [(s, "dsn", s) for s in SOURCES]
+    )
+    attempts = {}
+
+    def load(only, full_resync=False):
+        (source,) = only
+        attempts[source] = attempts.get(source, 0) + 1
+        if source == "c-broken" or (source == "c-flaky" and attempts[source] < 3):
+            raise RuntimeError(f"{source} unavailable")
+        return {"rows": 10, "inserted": 4, "updated": 1, "unchanged": 5,
+                "elapsed": 0.1 * attempts[source], "extract": [{"source": source, "rows": 10}]}
+
+    monkeypatch.setattr(kpi_etl, "load", load)
+    return attempts
+
+
+def test_sync_fans_out_per_source_and_reports_progress(sync):
+    dispatched = kpi_etl.run.apply().get()
+    assert dispatched["sources"] == 4
+
+    # c-flaky succeeds on its last retry, c-broken gives up after the retries
+    assert sync == {"c-1": 1, "c-2": 1, "c-flaky": 3, "c-broken": 3}
+
+    progress = asyncio.run(kpi_sync.load_progress(kpi_sync.LATEST))
+    assert progress["sync_id"] == dispatched["sync_id"]
+    assert progress["state"] == "done"
+    assert (progress["total"], progress["done"], progress["failed"]) == (4, 3, 1)
+    assert (progress["rows"], progress["inserted"]) == (30, 12)
+    assert progress["progress"] == 1.0
+    assert [e["source"] for e in progress["errors"]] == ["c-broken"]
+
+
+def test_finalize_aggregates_source_results():
+    results = [
+        {"source": "a", "rows": 3, "inserted": 1, "updated": 1, "unchanged": 1, "elapsed": 0.5},
+        {"source": "b", "rows": 2, "inserted": 2, "updated": 0, "unchanged": 0, "elapsed": 1.5},
+        {"source": "c", "error": "RuntimeError('down')"},
+    ]
+    summary = kpi_etl.finalize.run(results, "sync-1")
+    assert summary["rows"] == 5 and summary["inserted"] == 3
+    assert summary["failed"] == [{"source": "c", "error": "RuntimeError('down')"}]
+    assert summary["slowest"] == {"source": "b", "elapsed": 1.5}
+
+
+def test_unknown_sync_has_no_progress(monkeypatch):
+    monkeypatch.setattr(kpi_sync, "_aredis", fakeredis.aioredis.FakeRedis(decode_responses=True))
+
+    async def _load():
+        return await kpi_sync.load_progress("nope"), await kpi_sync.load_progress(kpi_sync.LATEST)
+
+    assert asyncio.run(_load()) == (None, None)
@@ -0,0 +1,62 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, func, select
+
+from backend.app.core.database import Base
+from backend.app.models import Kpi
+from backend.app.services.kpi_upsert import upsert_kpis
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _rows(company_id, values):
+    return [
+        {"company_id": company_id, "metric": "revenue", "value": v,
+         "as_of": START + timedelta(days=i)}
+        for i, v in enumerate(values)
+    ]
+
+
+def test_upsert_counts_inserted_updated_and_unchanged():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    company_id = uuid.uuid4()
+
+    with engine.begin() as conn:
+        first = upsert_kpis(conn, _rows(company_id, [1, 2, 3, 4, 5]), chunk_size=2)
+    assert (first.inserted, first.updated, first.unchanged) == (5, 0, 0)
+    assert len(first.changed) == 5
+
+    with engine.begin() as conn:
+        # two values change, one new day, and a duplicate key where the last row wins
+        rows = _rows(company_id, [1, 20, 3, 40, 5, 6])
+        rows.append({**rows[0], "value": 1.0})
+        second = upsert_kpis(conn, rows, chunk_size=4)
+        stored = conn.execute(
+            select(Kpi.value, Kpi.type).where(Kpi.company_id == company_id).order_by(Kpi.as_of)
+        ).all()
+
+    assert (second.inserted, second.updated, second.unchanged) == (1, 2, 3)
+    assert sorted(r["value"] for r in second.changed) == [6.0, 20.0, 40.0]
+    assert [v for v, _ in stored] == [1, 20, 3, 40, 5, 6]
+    assert all(t is not None for _, t in stored)
+
+    summary = second.summary()
+    assert summary["rows"] == 6 and summary["rows_per_second"] > 0
+
+
+def test_upsert_merges_timezone_aware_and_naive_timestamps():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    company_id = uuid.uuid4()
+    local = START.astimezone(timezone(timedelta(hours=2)))
+
+    with engine.begin() as conn:
+        upsert_kpis(conn, [{"company_id": str(company_id), "metric": "m", "value": 1, "as_of": local}])
+        result = upsert_kpis(conn, [{"company_id": company_id, "metric": "m", "value": 2,
+                                     "as_of": START.replace(tzinfo=None)}])
+        count = conn.scalar(select(func.count()).select_from(Kpi))
+
+    assert (result.inserted, result.updated) == (0, 1)
+    assert count == 1
@@ -0,0 +1,157 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import fakeredis
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from backend.app.core.database import Base
+from backend.app.models import Kpi
+from backend.app.services import kpi_archive, kpi_etl, kpi_watermark, snowflake_connector
+from backend.app.services.kpi_watermark import SHARED_SOURCE, load_watermarks, shared_source
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+COMPANY = uuid.uuid4()
+
+
+def _warehouse_row(hours, value=1.0):
+    return {"company_id": str(COMPANY), "metric": "revenue", "value": value,
+            "as_of": START + timedelta(hours=hours)}
+
+
+@pytest.fixture
+def etl(monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    warehouse = [_warehouse_row(h) for h in range(10)]
+    calls = []
+
+    def stream_kpis(since, timings, only=None):
+        calls.append(dict(since))
+        bound = since.get(SHARED_SOURCE)
+        rows = [r for r in warehouse if bound is None or r["as_of"] > bound]
+        # two batches per run
+        for batch in (rows[:3], rows[3:]):
+            if batch:
+                yield SHARED_SOURCE, pd.DataFrame(batch)
+        timings.append({"source": SHARED_SOURCE, "rows": len(rows)})
+
+    monkeypatch.setattr(kpi_etl, "get_engine", lambda: engine)
+    monkeypatch.setattr(kpi_etl, "stream_kpis", stream_kpis)
+    monkeypatch.setattr(kpi_etl, "bump_version_sync", lambda company_ids: None)
+    monkeypatch.setattr(kpi_etl.kpi_events, "publish_sync", lambda changes: None)
+    monkeypatch.setattr(kpi_watermark.settings, "KPI_EXTRACT_OVERLAP_MINUTES", 90)
+    return engine, warehouse, calls
+
+
+def _watermark(engine):
+    with engine.connect() as conn:
+        return load_watermarks(conn).get(SHARED_SOURCE)
+
+
+def test_runs_extract_past_the_watermark_with_overlap(etl):
+    engine, warehouse, calls = etl
+
+    first = kpi_etl.load()
+    assert calls[-1] == {}
+    assert first["inserted"] == 10
+    assert _watermark(engine) == START + timedelta(hours=9)
+
+    # a late row inside the overlap window and a new one
+    warehouse.append(_warehouse_row(8.5))
+    warehouse.append(_warehouse_row(11))
+    second = kpi_etl.load()
+    assert calls[-1] == {SHARED_SOURCE: START + timedelta(hours=7, minutes=30)}
+    assert (second["rows"], second["inserted"], second["unchanged"]) == (4, 2, 2)
+    assert _watermark(engine) == START + timedelta(hours=11)
+
+    resync = kpi_etl.load(full_resync=True)
+    assert calls[-1] == {}
+    assert (resync["rows"], resync["unchanged"]) == (12, 12)
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(Kpi)) == 12
+
+
+def test_watermark_stays_put_when_the_load_fails(etl, monkeypatch):
+    engine, warehouse, _ = etl
+    kpi_etl.load()
+    warehouse.append(_warehouse_row(20))
+
+    def _fail(conn, rows):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(kpi_etl, "apply_rollup_writes", _fail)
+    with pytest.raises(RuntimeError):
+        kpi_etl.load()
+    assert _watermark(engine) == START + timedelta(hours=9)
+
+
+def test_full_resync_skips_archived_rows(etl, monkeypatch, tmp_path):
+    engine, warehouse, _ = etl
+    monkeypatch.setattr(kpi_archive.settings, "KPI_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(kpi_archive.settings, "KPI_ARCHIVE_AFTER_DAYS", 30)
+    monkeypatch.setattr(kpi_archive, "get_engine", lambda: engine)
+    kpi_etl.load()
+
+    # hours 0-4 move to the archive
+    cutoff = START + timedelta(hours=5)
+    assert kpi_archive.archive_old(now=cutoff + timedelta(days=30)) == 5
+    assert kpi_archive.archived_before(COMPANY) == cutoff
+
+    resync = kpi_etl.load(full_resync=True)
+    assert (resync["archived"], resync["rows"]) == (5, 5)
+    with engine.connect() as conn:
+        hot = conn.execute(select(Kpi.as_of).order_by(Kpi.as_of)).scalars().all()
+    archived = [row[0] for rows in kpi_archive.archive_batches(COMPANY, ["as_of"]) for row in rows]
+    # every warehouse row exactly once across archive + hot
+    assert len(archived) + len(hot) == len(warehouse) == 10
+    assert min(hot).replace(tzinfo=timezone.utc) == cutoff
+
+
+class FakeConnection:
+    closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+def test_query_kpis_bounds_sources_with_a_watermark(monkeypatch):
+    queries = []
+    other = str(uuid.uuid4())
+
+    def fetch_batches(ctx, query, params=None):
+        queries.append((query, params))
+        return iter([pd.DataFrame([_warehouse_row(1)])])
+
+    monkeypatch.setenv("SNOWFLAKE_DSN", "account=x")
+    monkeypatch.setattr(snowflake_connector, "_redis", fakeredis.FakeRedis())
+    monkeypatch.setattr(snowflake_connector, "_company_ids", lambda: [str(COMPANY), other])
+    monkeypatch.setattr(snowflake_connector, "_connect", lambda dsn: FakeConnection())
+    monkeypatch.setattr(snowflake_connector, "_fetch_batches", fetch_batches)
+    by_company = f"{snowflake_connector.KPI_QUERY} WHERE company_id = %(company_id)s"
+
+    # the shared warehouse is extracted (and fanned out) per company
+    assert [s for s, _, _ in snowflake_connector.extraction_sources()] == [
+        shared_source(str(COMPANY)), shared_source(other),
+    ]
+    assert len(snowflake_connector.extraction_sources([shared_source(other)])) == 1
+
+    rows = snowflake_connector.query_kpis()
+    assert sorted(queries, key=lambda q: q[1]["company_id"]) == sorted(
+        ((by_company, {"company_id": cid}) for cid in (str(COMPANY), other)),
+        key=lambda q: q[1]["company_id"],
+    )
+    assert {r["source"] for r in rows} == {shared_source(str(COMPANY)), shared_source(other)}
+
+    # companies without a watermark of their own start from the old shared one
+    queries.clear()
+    snowflake_connector.query_kpis({SHARED_SOURCE: START, shared_source(other): START + timedelta(hours=2)})
+    assert sorted(queries, key=lambda q: q[1]["since"]) == [
+        (f"{by_company} AND as_of > %(since)s", {"company_id": str(COMPANY), "since": START}),
+        (f"{by_company} AND as_of > %(since)s", {"company_id": other, "since": START + timedelta(hours=2)}),
+    ]
+    snowflake_connector.close_all()
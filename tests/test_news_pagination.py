@@ -0,0 +1,124 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import fakeredis.aioredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+
+from backend.app.models import News
+from backend.app.routers import dashboard
+from backend.app.services.news_counters import increment_source_counts
+
+# the cache module the router uses (imported as ``app.*``)
+from app.services import dashboard_cache
+
+
+@pytest.fixture
+def engine(engine):
+    async def _populate():
+        now = datetime.utcnow()
+        sources = []
+        async with AsyncSession(engine) as sess:
+            for i in range(7):
+                source = "OpenAI" if i % 2 else "Reuters"
+                sources.append(source)
+                sess.add(
+                    News(
+                        title=f"item {i}",
+                        url=f"https://example.com/{i}",
+                        source=source,
+                        # two items share a timestamp to exercise the id tiebreak
+                        published_at=now - timedelta(minutes=i // 2),
+                    )
+                )
+            await sess.run_sync(lambda s: increment_source_counts(s.connection(), sources))
+            await sess.commit()
+
+    asyncio.run(_populate())
+    return engine
+
+
+def fetch_page(engine, limit, cursor=None, source=None):
+    async def _call():
+        async with AsyncSession(engine) as sess:
+            after = dashboard._decode_news_cursor(cursor) if cursor else None
+            return await dashboard._news_payload(sess, limit, source, None, None, None, after)
+
+    return asyncio.run(_call())
+
+
+def test_keyset_pages_cover_everything_once(engine):
+    seen, cursor = [], None
+    while True:
+        page = fetch_page(engine, 3, cursor)
+        seen.extend(item["title"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 7
+    assert page["total_count"] == 7
+
+
+def test_source_facet_from_counters(engine):
+    page = fetch_page(engine, 10, source="OpenAI")
+    assert page["sources"] == {"OpenAI": 3, "Reuters": 4}
+    assert page["total_count"] == page["count"] == 3
+    assert page["next_cursor"] is None
+
+
+def test_malformed_cursor_rejected():
+    with pytest.raises(ValueError):
+        dashboard._decode_news_cursor("not-a-cursor")
+
+
+def test_cursor_with_search_rejected():
+    app = FastAPI()
+    app.include_router(dashboard.router)
+    client = TestClient(app)
+    response = client.get("/dashboard/news", params={"search": "rates", "cursor": "abc"})
+    assert response.status_code == 400
+
+    # the null total is part of the documented response
+    schema = client.get("/openapi.json").json()["components"]["schemas"]["NewsPage"]
+    assert "null" in schema["properties"]["total_count"]["description"]
+
+
+def test_hours_window_moves_the_etag(engine, monkeypatch):
+    monkeypatch.setattr(dashboard_cache.settings, "DASHBOARD_CACHE_ENABLED", True)
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    clock = {"now": now + timedelta(seconds=1)}
+
+    class _Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock["now"]
+
+    monkeypatch.setattr(dashboard, "datetime", _Clock)
+
+    def request(etag=None):
+        headers = [(b"if-none-match", etag.encode())] if etag else []
+        return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+    async def _run():
+        monkeypatch.setattr(dashboard_cache, "_aredis", fakeredis.aioredis.FakeRedis())
+        async with AsyncSession(engine) as sess:
+            poll = lambda req: dashboard.latest_news(
+                req, limit=20, source=None, hours=1, search=None, impact_level=None,
+                opportunity_risk=None, sector=None, region=None, cursor=None, db=sess,
+            )
+            first = await poll(request())
+            clock["now"] += timedelta(seconds=30)       # same minute
+            second = await poll(request(first.headers["ETag"]))
+            clock["now"] += timedelta(hours=1, minutes=2)   # every item aged out
+            third = await poll(request(first.headers["ETag"]))
+        return first, second, third
+
+    first, second, third = asyncio.run(_run())
+    assert first.headers["X-Cache"] == "MISS" and b'"count":7' in first.body
+    assert second.status_code == 304
+    assert third.status_code == 200 and third.headers["X-Cache"] == "MISS"
+    assert b'"count":0' in third.body
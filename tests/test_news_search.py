@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.models import News
+from backend.app.routers import dashboard
+from backend.app.services.news_search import ensure_search_index, search_terms
+
+ARTICLES = [
+    ("Semiconductor tariffs announced", "New tariffs hit chip imports."),
+    ("Retail sales beat forecasts", "Holiday demand lifted semiconductor stocks too."),
+    ("Central bank holds rates", "No change to interest rates this quarter."),
+]
+
+
+@pytest.fixture
+def engine(engine):
+    now = datetime.utcnow()
+
+    async def _setup():
+        async with engine.begin() as conn:
+            # one row predates the index, the rest go through the triggers
+            await conn.execute(News.__table__.insert(), [{
+                "title": ARTICLES[0][0], "description": ARTICLES[0][1],
+                "url": "https://example.com/0", "source": "Reuters", "published_at": now,
+            }])
+            await conn.run_sync(ensure_search_index)
+            # the registry the router reads (imported as ``app.*``)
+            await conn.run_sync(dashboard.schema.refresh)
+        async with AsyncSession(engine) as sess:
+            for i, (title, description) in enumerate(ARTICLES[1:], start=1):
+                sess.add(News(
+                    title=title, description=description, url=f"https://example.com/{i}",
+                    source="Reuters", published_at=now - timedelta(hours=i),
+                ))
+            await sess.commit()
+
+    asyncio.run(_setup())
+    return engine
+
+
+def search(engine, query):
+    async def _call():
+        async with AsyncSession(engine) as sess:
+            return await dashboard._news_payload(sess, 10, None, None, query, None)
+
+    return asyncio.run(_call())["items"]
+
+
+def test_prefix_match_ranks_title_hits_first(engine):
+    items = search(engine, "semicond")
+    assert [i["title"] for i in items] == [ARTICLES[0][0], ARTICLES[1][0]]
+    assert items[0]["relevance"] > items[1]["relevance"]
+    assert "<mark>" in items[1]["snippet"]
+
+
+def test_operators_in_query_are_ignored(engine):
+    assert search_terms('rates" OR -*') == ["rates", "or"]
+    assert [i["title"] for i in search(engine, "interest rates")] == [ARTICLES[2][0]]
+    assert search(engine, "?!") == []  # no word tokens: plain ILIKE
+
+
+def test_index_is_rebuilt_when_rowids_drift(engine):
+    async def _renumber():
+        async with engine.begin() as conn:
+            # what VACUUM may do to a table without an INTEGER PRIMARY KEY
+            await conn.exec_driver_sql("UPDATE news SET rowid = rowid + 100")
+            await conn.run_sync(ensure_search_index)
+
+    asyncio.run(_renumber())
+    assert [i["title"] for i in search(engine, "interest rates")] == [ARTICLES[2][0]]
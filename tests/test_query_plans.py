@@ -0,0 +1,84 @@
+"""Dashboard KPI queries must use the composite ``kpi`` indexes.
+
+Each statement runs against a seeded SQLite database while a cursor hook
+captures its ``EXPLAIN QUERY PLAN``; a full scan of ``kpi`` (or a search
+that does not lead with ``company_id``) fails the test.
+"""
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, event, func, select
+
+from backend.app.core.database import Base
+from backend.app.models import Company, Kpi, KpiType
+from backend.app.services.kpi_export import export_statement
+from backend.app.services.kpi_series import series_statement
+from backend.app.services.sparkline import _history_statement
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+METRICS = ["revenue", "churn", "nps", "headcount"]
+
+
+def _seeded_engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    companies = [uuid.uuid4() for _ in range(20)]
+    with engine.begin() as conn:
+        conn.execute(Company.__table__.insert(), [
+            {"id": cid, "owner_id": uuid.uuid4(), "name": f"c{i}"}
+            for i, cid in enumerate(companies)
+        ])
+        conn.execute(Kpi.__table__.insert(), [
+            {"id": uuid.uuid4(), "company_id": cid, "metric": metric, "value": float(day),
+             "as_of": START + timedelta(days=day), "type": KpiType.FINANCIAL}
+            for cid in companies
+            for metric in METRICS
+            for day in range(60)
+        ])
+        conn.exec_driver_sql("ANALYZE")
+    return engine, companies[0]
+
+
+@contextmanager
+def query_plans(engine):
+    plans = []
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        plans.append([row[3] for row in cursor.fetchall()])
+
+    event.listen(engine, "before_cursor_execute", explain)
+    try:
+        yield plans
+    finally:
+        event.remove(engine, "before_cursor_execute", explain)
+
+
+def _kpi_steps(plan):
+    return [step for step in plan if " kpi " in f" {step} ".replace("(", " ")]
+
+
+def test_dashboard_kpi_queries_use_composite_indexes():
+    engine, company_id = _seeded_engine()
+    window = {"start": START, "end": START + timedelta(days=30)}
+    queries = {
+        "series": (series_statement("day", "sqlite"),
+                   {"company_id": company_id, "metrics": METRICS[:2], **window}),
+        "sparkline": (_history_statement(),
+                      {"series": [(company_id, m) for m in METRICS], "company_ids": [company_id],
+                       "metrics": METRICS, "max_raw": 24, "since": START}),
+        "export": (export_statement(company_id, ["revenue"], window["start"], window["end"]), {}),
+        "company count": (select(func.count(Kpi.id)).where(Kpi.company_id == company_id), {}),
+        "latest update": (select(func.max(Kpi.as_of)).where(Kpi.company_id == company_id), {}),
+    }
+
+    with engine.connect() as conn, query_plans(engine) as plans:
+        for name, (stmt, params) in queries.items():
+            conn.execute(stmt, params).all()
+            steps = _kpi_steps(plans[-1])
+            assert steps, f"{name}: kpi not in plan {plans[-1]}"
+            for step in steps:
+                assert not step.startswith("SCAN"), f"{name}: {step}"
+                assert "(company_id=?" in step, f"{name}: {step}"
+    engine.dispose()
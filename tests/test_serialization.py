@@ -0,0 +1,126 @@
+import asyncio
+import gzip
+import json
+import uuid
+import zlib
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend.app.models.dto import KPITile
+from backend.app.utils import serialization
+from backend.app.utils.compression import CompressionMiddleware
+from backend.app.utils.serialization import dumps, row_converter
+
+PAYLOAD = {
+    "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "at": datetime(2024, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc),
+    "naive": datetime(2024, 1, 2, 3, 4, 5),
+    "tiles": [KPITile(label="revenue", value=1.5, delta_pct=-2.0, spark=[1.0, 2.0])],
+    "none": None,
+}
+
+
+def test_fast_and_stdlib_paths_agree(monkeypatch):
+    assert serialization.backend() == "json"  # opt-in
+    slow = dumps(PAYLOAD)
+    monkeypatch.setattr(serialization.settings, "JSON_FAST", True)
+    assert serialization.backend() == "orjson"
+    fast = dumps(PAYLOAD)
+    assert json.loads(fast) == json.loads(slow)
+    assert json.loads(fast)["at"] == "2024-01-02T03:04:05.000678+00:00"
+
+
+def test_row_converter_copies_attributes():
+    convert = row_converter(metric="metric", value="value", when="as_of")
+    row = SimpleNamespace(metric="revenue", value=3.0, as_of="t", other=1)
+    assert convert(row) == {"metric": "revenue", "value": 3.0, "when": "t"}
+    assert row_converter(metric="metric")(row) == {"metric": "revenue"}
+
+
+def _client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("tiny")
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse("x" * 5000)
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"a" * 3000, b"b" * 3000]))
+
+    @app.get("/parquet")
+    def parquet():
+        return StreamingResponse(iter([b"P" * 3000]), media_type="application/vnd.apache.parquet")
+
+    @app.get("/arrow")
+    def arrow():
+        return StreamingResponse(iter([b"A" * 3000]), media_type="application/vnd.apache.arrow.stream")
+
+    return TestClient(app)
+
+
+def test_compression_thresholds_and_streaming():
+    client = _client()
+    headers = {"Accept-Encoding": "gzip"}
+
+    r = client.get("/small", headers=headers)
+    assert "content-encoding" not in r.headers and r.text == "tiny"
+
+    r = client.get("/large", headers=headers)
+    assert r.headers["content-encoding"] == "gzip"
+    assert int(r.headers["content-length"]) < 5000
+    assert r.text == "x" * 5000
+
+    r = client.get("/stream", headers=headers)
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.content == b"a" * 3000 + b"b" * 3000
+
+    r = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers
+
+
+def test_gzip_body_is_valid_gzip():
+    client = _client()
+    with client.stream("GET", "/large", headers={"Accept-Encoding": "gzip"}) as r:
+        raw = b"".join(r.iter_raw())
+    assert gzip.decompress(raw) == b"x" * 5000
+
+
+def test_exports_are_not_recompressed():
+    client = _client()
+    for path in ("/parquet", "/arrow"):
+        r = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in r.headers
+        assert len(r.content) == 3000
+
+
+def test_streamed_chunks_are_flushed():
+    chunks = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for part in (b"a" * 3000, b"b" * 3000):
+            await send({"type": "http.response.body", "body": part, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append(message["body"])
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=100)(scope, None, send))
+
+    # every chunk decodes on its own as it arrives
+    decoder = zlib.decompressobj(31)
+    assert decoder.decompress(chunks[0]) == b"a" * 3000
+    assert decoder.decompress(chunks[1]) == b"b" * 3000
+    assert gzip.decompress(b"".join(chunks)) == b"a" * 3000 + b"b" * 3000
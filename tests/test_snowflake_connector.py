@@ -0,0 +1,169 @@
+import threading
+import time
+import uuid
+
+import fakeredis
+import pandas as pd
+import pytest
+
+from backend.app.services import snowflake_connector
+
+
+class FakeConnection:
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def warehouse(monkeypatch):
+    """Fake warehouses: every query sleeps a bit; tracks connections and overlap."""
+    state = {"connections": [], "running": {}, "peak": {}, "fail": set()}
+    lock = threading.Lock()
+
+    def connect(dsn):
+        ctx = FakeConnection(dsn)
+        state["connections"].append(ctx)
+        return ctx
+
+    def fetch_batches(ctx, query, params=None):
+        with lock:
+            running = state["running"][ctx.dsn] = state["running"].get(ctx.dsn, 0) + 1
+            state["peak"][ctx.dsn] = max(state["peak"].get(ctx.dsn, 0), running)
+        try:
+            time.sleep(0.1)
+            if ctx.dsn in state["fail"]:
+                raise RuntimeError("warehouse unavailable")
+            # Snowflake hands back upper-case column names
+            yield pd.DataFrame([{"METRIC": "revenue", "VALUE": 1.0, "AS_OF": pd.Timestamp("2024-01-01")}])
+        finally:
+            with lock:
+                state["running"][ctx.dsn] -= 1
+
+    monkeypatch.delenv("SNOWFLAKE_DSN", raising=False)
+    monkeypatch.setattr(snowflake_connector, "_redis", fakeredis.FakeRedis())
+    monkeypatch.setattr(snowflake_connector, "_SLOT_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(snowflake_connector, "_connect", connect)
+    monkeypatch.setattr(snowflake_connector, "_fetch_batches", fetch_batches)
+    monkeypatch.setattr(snowflake_connector.settings, "KPI_EXTRACT_CONCURRENCY", 4)
+    monkeypatch.setattr(snowflake_connector.settings, "KPI_EXTRACT_PER_DSN", 2)
+    snowflake_connector.close_all()
+    yield state
+    snowflake_connector.close_all()
+
+
+def _companies(monkeypatch, dsns):
+    sources = [(str(cid), dsn, str(cid)) for cid, dsn in ((uuid.uuid4(), d) for d in dsns)]
+    monkeypatch.setattr(snowflake_connector, "extraction_sources", lambda only=None: sources)
+    return sources
+
+
+def test_companies_are_extracted_concurrently_within_per_warehouse_limits(warehouse, monkeypatch):
+    sources = _companies(monkeypatch, ["wh-a"] * 4 + ["wh-b", "wh-c"])
+
+    started = time.perf_counter()
+    rows, timings = snowflake_connector.extract_kpis()
+    elapsed = time.perf_counter() - started
+
+    assert len(rows) == 6
+    assert {r["company_id"] for r in rows} == {cid for _, _, cid in sources}
+    assert sorted(t["source"] for t in timings) == sorted(s for s, _, _ in sources)
+    assert all(t["seconds"] >= 0.1 and "wait" in t for t in timings)
+    assert warehouse["peak"]["wh-a"] == 2
+    assert elapsed < 0.5  # 6 × 0.1 s sequentially
+
+
+def test_warehouse_limit_holds_across_workers(warehouse, monkeypatch):
+    _companies(monkeypatch, ["wh-a"] * 4)
+    # every extraction in a pool of its own, as if each ran in another worker
+    monkeypatch.setattr(
+        snowflake_connector, "pool_for",
+        lambda dsn: snowflake_connector._DsnPool(dsn, snowflake_connector.settings.KPI_EXTRACT_PER_DSN),
+    )
+
+    rows, _ = snowflake_connector.extract_kpis()
+
+    assert len(rows) == 4
+    assert warehouse["peak"]["wh-a"] == 2
+    # every slot is released again
+    assert snowflake_connector._redis.keys("kpi-extract-slot:*") == []
+
+
+def test_connections_are_reused_across_runs_and_idle_ones_evicted(warehouse, monkeypatch):
+    _companies(monkeypatch, ["wh-a", "wh-b"])
+
+    snowflake_connector.extract_kpis()
+    snowflake_connector.extract_kpis()
+    assert len(warehouse["connections"]) == 2
+
+    monkeypatch.setattr(snowflake_connector.settings, "KPI_EXTRACT_IDLE_SECONDS", 0)
+    time.sleep(0.01)
+    assert snowflake_connector.close_idle() == 2
+    assert all(ctx.closed for ctx in warehouse["connections"])
+    snowflake_connector.extract_kpis()
+    assert len(warehouse["connections"]) == 4
+
+
+def test_a_failing_company_does_not_stop_the_others(warehouse, monkeypatch):
+    sources = _companies(monkeypatch, ["wh-a", "wh-broken"])
+    warehouse["fail"].add("wh-broken")
+
+    rows, timings = snowflake_connector.extract_kpis()
+
+    assert [r["source"] for r in rows] == [sources[0][0]]
+    failed = [t for t in timings if "error" in t]
+    assert [t["source"] for t in failed] == [sources[1][0]]
+    # the broken session is closed rather than returned to the pool
+    assert [ctx.closed for ctx in warehouse["connections"] if ctx.dsn == "wh-broken"] == [True]
+
+
+def test_clean_batch_normalises_warehouse_rows():
+    raw = pd.DataFrame({
+        "COMPANY_ID": [None, "c-2", "c-3", "c-4"],
+        "METRIC": ["revenue", "revenue", "churn", "churn"],
+        "VALUE": ["1.5", 2, None, "n/a"],
+        "AS_OF": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]),
+    })
+
+    batch = snowflake_connector.clean_batch(raw, "c-1")
+
+    assert batch["company_id"].tolist() == ["c-1", "c-2"]
+    assert batch["value"].tolist() == [1.5, 2.0]
+    assert [ts.isoformat() for ts in batch["as_of"]] == [
+        "2024-01-01T00:00:00+00:00", "2024-01-02T00:00:00+00:00",
+    ]
+
+
+def test_stream_is_bounded_and_stops_producers_when_abandoned(monkeypatch):
+    produced = []
+
+    def fetch_batches(ctx, query, params=None):
+        for i in range(100):
+            produced.append(i)
+            yield pd.DataFrame({"metric": ["m"] * 10, "value": [float(i)] * 10,
+                                "as_of": [pd.Timestamp("2024-01-01", tz="UTC")] * 10})
+
+    monkeypatch.setattr(snowflake_connector, "_redis", fakeredis.FakeRedis())
+    monkeypatch.setattr(snowflake_connector, "_connect", FakeConnection)
+    monkeypatch.setattr(snowflake_connector, "_fetch_batches", fetch_batches)
+    monkeypatch.setattr(snowflake_connector.settings, "KPI_EXTRACT_BATCH_SIZE", 4)
+    monkeypatch.setattr(snowflake_connector.settings, "KPI_EXTRACT_QUEUE_SIZE", 2)
+    _companies(monkeypatch, ["wh-a"])
+    snowflake_connector.close_all()
+
+    stream = snowflake_connector.stream_kpis()
+    first = [next(stream) for _ in range(3)]
+    time.sleep(0.2)
+    # 10-row warehouse batches re-cut to 4, 4, 2; the producer is held back by the queue
+    assert [len(batch) for _, batch in first] == [4, 4, 2]
+    assert len(produced) <= 3
+
+    stream.close()
+    assert len(produced) <= 3
+    snowflake_connector.close_all()
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from backend.app.services.sparkline import downsample, lttb
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50.0)
+    y[437] = 25.0  # a spike must survive downsampling
+
+    idx = lttb(x, y, 40)
+
+    assert len(idx) == 40
+    assert idx[0] == 0 and idx[-1] == 999
+    assert np.all(np.diff(idx) > 0)
+    assert 437 in idx
+
+
+def test_downsample_short_series_is_unchanged():
+    start = datetime(2024, 1, 1)
+    as_of = [start + timedelta(days=i) for i in range(5)]
+    assert downsample(as_of, [1, 2, 3, 4, 5], 24) == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_downsample_reads_naive_timestamps_as_utc(monkeypatch):
+    import time
+
+    from backend.app.services import sparkline
+
+    # hourly points across the New York DST switch, as SQLite returns them
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    seen = {}
+
+    def _lttb(x, y, n_out):
+        seen["x"] = x
+        return lttb(x, y, n_out)
+
+    monkeypatch.setattr(sparkline, "lttb", _lttb)
+    try:
+        as_of = [datetime(2024, 3, 10) + timedelta(hours=h) for h in range(6)]
+        downsample(as_of, range(6), 3)
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
+    assert np.all(np.diff(seen["x"]) == 3600)
+
+
+def test_short_hot_history_is_topped_up_from_the_archive(engine, tmp_path, monkeypatch):
+    import asyncio
+    import uuid
+
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from backend.app.models import Company, Kpi, KpiType
+    from backend.app.services import kpi_archive, sparkline
+    from backend.app.services.kpi_snapshot import KpiSnapshot
+
+    monkeypatch.setattr(kpi_archive.settings, "KPI_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(sparkline.settings, "SPARKLINE_MAX_RAW_POINTS", 30)
+    monkeypatch.setattr(sparkline.settings, "SPARKLINE_POINTS", 100)
+    company_id = uuid.uuid4()
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    points = [today - timedelta(days=40 - d) for d in range(40)]
+    snapshot = [KpiSnapshot(company_id, "revenue", 39.0, points[-1])]
+
+    async def _run():
+        async with AsyncSession(engine) as sess:
+            sess.add(Company(id=company_id, owner_id=uuid.uuid4(), name="ACME"))
+            await sess.execute(Kpi.__table__.insert(), [
+                {"company_id": company_id, "metric": "revenue", "value": float(i),
+                 "as_of": as_of, "type": KpiType.FINANCIAL}
+                for i, as_of in enumerate(points)
+            ])
+            await sess.commit()
+            monkeypatch.setattr(sparkline, "_cache", sparkline._SparkCache(10))
+            before = await sparkline.load_sparklines(sess, company_id, snapshot)
+            await sess.run_sync(lambda s: kpi_archive.archive_company(
+                s.connection(), company_id, today - timedelta(days=10)
+            ))
+            await sess.commit()
+            monkeypatch.setattr(sparkline, "_cache", sparkline._SparkCache(10))
+            after = await sparkline.load_sparklines(sess, company_id, snapshot)
+        return before, after
+
+    before, after = asyncio.run(_run())
+    assert before["revenue"] == [float(i) for i in range(10, 40)]
+    # 10 hot rows plus the newest 20 archived ones
+    assert after == before
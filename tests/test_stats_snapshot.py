@@ -0,0 +1,66 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.app.models import Company, Kpi, KpiType, News
+from backend.app.routers import dashboard
+from backend.app.services.kpi_latest import rebuild_latest
+from backend.app.services.kpi_rollup import rebuild_rollups
+from backend.app.services.news_counters import increment_source_counts
+from backend.app.services.stats_snapshot import StatsSnapshot
+
+
+def test_snapshot_counts_without_full_scans(engine):
+    now = datetime.utcnow()
+
+    async def _run():
+        async with AsyncSession(engine) as sess:
+            company_id = uuid.uuid4()
+            sess.add(Company(id=company_id, owner_id=uuid.uuid4(), name="ACME"))
+            for i in range(4):
+                sess.add(Kpi(company_id=company_id, metric="revenue", value=i,
+                             as_of=now - timedelta(days=i), type=KpiType.FINANCIAL))
+            for i, age in enumerate((1, 30, 72)):
+                sess.add(News(title=f"n{i}", url=f"urn:{i}", source="Reuters",
+                              published_at=now - timedelta(hours=age)))
+            await sess.run_sync(lambda s: increment_source_counts(s.connection(), ["Reuters"] * 3))
+            await sess.commit()
+
+        snapshot = StatsSnapshot(60, session_factory=async_sessionmaker(engine))
+        first = await snapshot.get()
+        second = await snapshot.get()
+        return first, second
+
+    first, second = asyncio.run(_run())
+    assert first["global_stats"] == {
+        "total_companies": 1, "total_kpis": 4, "total_news": 3, "news_last_24h": 1,
+    }
+    assert second["generated_at"] == first["generated_at"]  # served, not recomputed
+    assert "clients" not in first["websocket"]
+
+
+def test_company_stats_keep_total_kpis(engine):
+    now = datetime.utcnow()
+    company_id = uuid.uuid4()
+
+    async def _run():
+        async with AsyncSession(engine) as sess:
+            sess.add(Company(id=company_id, owner_id=uuid.uuid4(), name="ACME"))
+            for metric in ("revenue", "churn"):
+                for i in range(40):
+                    sess.add(Kpi(company_id=company_id, metric=metric, value=i,
+                                 as_of=now - timedelta(days=i), type=KpiType.FINANCIAL))
+            await sess.commit()
+        async with engine.begin() as conn:
+            await conn.run_sync(rebuild_latest)
+            await conn.run_sync(rebuild_rollups)
+        async with AsyncSession(engine) as sess:
+            approx = await dashboard._company_stats(sess, company_id)
+            exact = await dashboard._exact_dashboard_stats(sess, company_id)
+        return approx, exact["database"]["company_stats"]
+
+    approx, exact = asyncio.run(_run())
+    assert approx["total_kpis"] == exact["total_kpis"] == 80
+    assert approx["metrics"] == 2
@@ -0,0 +1,57 @@
+import asyncio
+
+from backend.app.services.warehouse import EngineRegistry
+
+
+def _dsn(tmp_path, name):
+    return f"sqlite+aiosqlite:///{tmp_path / name}.db"
+
+
+def test_registry_is_bounded_lru_and_instrumented(tmp_path):
+    registry = EngineRegistry(capacity=2, idle_seconds=3600)
+    a, b, c = (_dsn(tmp_path, n) for n in "abc")
+
+    async def _run():
+        async with registry.connect(a) as conn:
+            assert (await conn.exec_driver_sql("select 1")).scalar() == 1
+            assert registry.stats()["connections_in_use"] == 1
+        engine_a = registry.get(a)          # hit
+        registry.get(b)                     # miss
+        registry.get(a)                     # hit, b is now least recently used
+        registry.get(c)                     # miss, evicts b
+        await registry.drain()
+        stats = registry.stats()
+        same = registry.get(a) is engine_a
+        await registry.stop()
+        return stats, same, registry.stats()
+
+    stats, same, after = asyncio.run(_run())
+    assert same
+    assert stats["engines"] == 2 and stats["evictions"] == 1
+    assert (stats["hits"], stats["misses"]) == (2, 3)
+    assert stats["checkouts"] == 1 and stats["checkout_wait_max_ms"] >= 0
+    assert stats["connections_in_use"] == 0
+    assert after["engines"] == 0
+
+
+def test_idle_and_in_use_engines(tmp_path):
+    registry = EngineRegistry(capacity=1, idle_seconds=0)
+    a, b = _dsn(tmp_path, "a"), _dsn(tmp_path, "b")
+
+    async def _run():
+        async with registry.connect(a):
+            # a is busy: neither idle nor LRU eviction disposes it
+            registry.get(b)
+            kept = registry.stats()["engines"]
+            await asyncio.sleep(0.01)
+            idle_while_busy = await registry.evict_idle()
+        await asyncio.sleep(0.01)
+        idle = await registry.evict_idle()
+        await registry.stop()
+        return kept, idle_while_busy, idle, registry.stats()
+
+    kept, idle_while_busy, idle, stats = asyncio.run(_run())
+    assert kept == 2
+    assert idle_while_busy == 1     # b
+    assert idle == 1                # a, once released
+    assert stats["idle_evictions"] == 2 and stats["engines"] == 0